@@ -0,0 +1,88 @@
+"""
+bench_signers.py
+---
+Per-request signing cost of the per-credential signers against the previous per-call signing
+usage: python bench/bench_signers.py [iterations], also checks both produce the same signatures
+"""
+import os
+import sys
+import hmac
+import base64
+import hashlib
+import timeit
+import urllib.parse
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from kraken import KrakenCreds, KrakenSigner
+from nicehash import NicehashCreds, NicehashSigner
+from wos import WosCreds, WosSigner
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+# previous implementations, kept verbatim as the baseline
+def kraken_signature(urlpath, data, secret): # type: ignore
+    postdata = urllib.parse.urlencode(data)
+    encoded = (str(data['nonce']) + postdata).encode()
+    message = urlpath.encode() + hashlib.sha256(encoded).digest()
+    mac = hmac.new(base64.b64decode(secret), message, hashlib.sha512)
+    sigdigest = base64.b64encode(mac.digest())
+    return sigdigest.decode()
+
+def nicehash_signature(creds, xtime, xnonce, method, path, query, body_json): # type: ignore
+    message = bytearray(creds.api_key, 'utf-8')
+    message += bytearray('\x00', 'utf-8')
+    message += bytearray(str(xtime), 'utf-8')
+    message += bytearray('\x00', 'utf-8')
+    message += bytearray(xnonce, 'utf-8')
+    message += bytearray('\x00', 'utf-8')
+    message += bytearray('\x00', 'utf-8')
+    message += bytearray(creds.org_id, 'utf-8')
+    message += bytearray('\x00', 'utf-8')
+    message += bytearray('\x00', 'utf-8')
+    message += bytearray(method, 'utf-8')
+    message += bytearray('\x00', 'utf-8')
+    message += bytearray(path, 'utf-8')
+    message += bytearray('\x00', 'utf-8')
+    message += bytearray(query, 'utf-8')
+    if body_json:
+        message += bytearray('\x00', 'utf-8')
+        message += bytearray(body_json, 'utf-8')
+    digest = hmac.new(bytearray(creds.api_secret, 'utf-8'), message, hashlib.sha256).hexdigest()
+    return creds.api_key + ":" + digest
+
+def wos_signature(creds, ext, nonce, params): # type: ignore
+    m = f"/{ext}{nonce}{creds.api_key}{params}"
+    return hmac.new(creds.api_secret.encode("utf-8"), m.encode("utf-8"), digestmod=hashlib.sha256).hexdigest()
+
+def report(name: str, old: float, new: float) -> None:
+    print(f"{name:<9} old: {old / ITERATIONS * 1e6:6.2f}us  new: {new / ITERATIONS * 1e6:6.2f}us  {old / new:4.2f}x")
+
+def main() -> None:
+    kraken_creds = KrakenCreds("kraken-key", base64.b64encode(os.urandom(64)).decode(), "funding")
+    nicehash_creds = NicehashCreds("d3f1a3c0-nicehash-key", "8c2b0e4e-nicehash-secret-" + "x" * 40, "org-1234-5678", "funding")
+    wos_creds = WosCreds("wos-api-token", "wos-api-secret-" + "y" * 32, "", "", "")
+    kraken, nicehash, wos = KrakenSigner(kraken_creds), NicehashSigner(nicehash_creds), WosSigner(wos_creds)
+
+    uri_path = '0/private/WithdrawInfo'
+    data = {"nonce": "1700000000000", "asset": "XBT", "key": "funding", "amount": 0.01}
+    postdata = urllib.parse.urlencode(data)
+    nh_args = ("1700000000000", "0b0c4e9e-1b2a-4c1e-9f64-7d2f0e8a3b11", "POST", "/main/api/v2/accounting/withdrawal", "", '{"currency": "BTC", "amount": 0.01}')
+    wos_args = ("api/v1/wallet/payment", "1700000000000", '{"address":"bc1q","currency":"BTC","amount":1.0000000e-02}')
+
+    assert kraken.sign(uri_path, data["nonce"], postdata) == kraken_signature(uri_path, data, kraken_creds.api_secret)
+    assert nicehash.auth_prefix + nicehash.sign(*nh_args) == nicehash_signature(nicehash_creds, *nh_args)
+    assert nicehash.auth_prefix + nicehash.sign(*nh_args[:-1], None) == nicehash_signature(nicehash_creds, *nh_args[:-1], None)
+    assert wos.sign(*wos_args) == wos_signature(wos_creds, *wos_args)
+    print("signatures identical")
+
+    report("kraken",
+        timeit.timeit(lambda: kraken_signature(uri_path, data, kraken_creds.api_secret), number=ITERATIONS),
+        timeit.timeit(lambda: kraken.sign(uri_path, data["nonce"], urllib.parse.urlencode(data)), number=ITERATIONS))
+    report("nicehash",
+        timeit.timeit(lambda: nicehash_signature(nicehash_creds, *nh_args), number=ITERATIONS),
+        timeit.timeit(lambda: nicehash.auth_prefix + nicehash.sign(*nh_args), number=ITERATIONS))
+    report("wos",
+        timeit.timeit(lambda: wos_signature(wos_creds, *wos_args), number=ITERATIONS),
+        timeit.timeit(lambda: wos.sign(*wos_args), number=ITERATIONS))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""
+bench_swap_quoter.py
+---
+Compare sequential quoting with SwapQuoter against a local stub of the Kraken, Nicehash and WoS APIs
+    the quoter runs on the async services, once with Kraken requests serialized per key and once with a nonce window
+usage: python bench/bench_swap_quoter.py [latency_ms] [services]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import kraken
+import nicehash
+import wos
+import async_kraken
+import async_nicehash
+import async_wos
+from kraken import Kraken, KrakenCreds
+from nicehash import Nicehash, NicehashCreds
+from wos import Wos, WosCreds
+from async_kraken import AsyncKraken
+from async_nicehash import AsyncNicehash
+from async_wos import AsyncWos
+from trusted_swap_service import AsyncTrustedSwapService
+from swap_quoter import SwapQuoter
+from typing import List, Tuple
+
+LATENCY_SECS = (int(sys.argv[1]) if len(sys.argv) > 1 else 100) / 1000
+SERVICES = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self) -> None:
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        time.sleep(LATENCY_SECS)
+        if '/0/private/Balance' in self.path:
+            res = {"error": [], "result": {"XXBT": "0.2"}}
+        elif '/0/private/WithdrawInfo' in self.path:
+            res = {"error": [], "result": {"amount": "0.01", "fee": "0.00002"}}
+        elif 'fee/info' in self.path:
+            res = {"withdrawal": {"BITGO": {"rules": {"BTC": {"intervals": [{"element": {"sendValue": "0.00005"}}]}}}}}
+        elif 'account2' in self.path:
+            res = {"available": "0.1"}
+        else:
+            res = {"btc": 0.5, "btcFixedFee": 0.00001}
+        body = json.dumps(res).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_GET
+
+    def log_message(self, *args) -> None: # type: ignore
+        pass
+
+def async_services(nonce_window: bool) -> List[AsyncTrustedSwapService]:
+    services = [
+        [
+            lambda: AsyncKraken(KrakenCreds(f"kraken{i}", "c2VjcmV0", "funding", nonce_window=nonce_window)),
+            lambda: AsyncNicehash(NicehashCreds(f"nh{i}", "secret", "org", "funding")),
+            lambda: AsyncWos(WosCreds(f"wos{i}", "secret", "", "", "")),
+        ][i % 3]()
+        for i in range(SERVICES)
+    ]
+    for service in services:
+        service.log = lambda *args: None # type: ignore
+    return services
+
+async def run_quoter(nonce_window: bool) -> Tuple[float, float, list]:
+    """(first quote, cached quote) in seconds, the first includes opening the connections"""
+    quoter = SwapQuoter(async_services(nonce_window), lightning_fee_ppm=100)
+    quoter.log = lambda *args: None # type: ignore
+    start = time.perf_counter()
+    quotes = await quoter.quote(1_000_000)
+    concurrent = time.perf_counter() - start
+    start = time.perf_counter()
+    await quoter.quote(1_000_000)
+    cached = time.perf_counter() - start
+    await quoter.services[0].transport.close()
+    return concurrent, cached, quotes
+
+def main() -> None:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # the async modules import the urls by name, patch both copies
+    kraken.KRAKEN_API_URL = async_kraken.KRAKEN_API_URL = f"http://127.0.0.1:{server.server_port}/"
+    nicehash.NICEHASH_API_URL = async_nicehash.NICEHASH_API_URL = f"http://127.0.0.1:{server.server_port}"
+    wos.WOS_API_URL = async_wos.WOS_API_URL = f"http://127.0.0.1:{server.server_port}/"
+    services = [
+        [
+            lambda: Kraken(KrakenCreds(f"kraken{i}", "c2VjcmV0", "funding")),
+            lambda: Nicehash(NicehashCreds(f"nh{i}", "secret", "org", "funding")),
+            lambda: Wos(WosCreds(f"wos{i}", "secret", "", "", "")),
+        ][i % 3]()
+        for i in range(SERVICES)
+    ]
+    for service in services:
+        service.log = lambda *args: None # type: ignore
+
+    start = time.perf_counter()
+    for service in services:
+        service.get_balance()
+        service.get_onchain_fee(1_000_000)
+    sequential = time.perf_counter() - start
+
+    serialized, cached, _ = asyncio.run(run_quoter(nonce_window=False))
+    windowed, _, quotes = asyncio.run(run_quoter(nonce_window=True))
+
+    print(f"services: {SERVICES}, latency: {LATENCY_SECS * 1000:.0f}ms")
+    print(f"sequential: {sequential * 1000:.1f}ms, quoter: {serialized * 1000:.1f}ms, quoter with nonce window: {windowed * 1000:.1f}ms, cached: {cached * 1000:.2f}ms")
+    for quote in quotes:
+        print(quote)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""
+async_kraken.py
+---
+An asyncio implementation of Kraken Wallet API as an AsyncTrustedSwapService
+usage: add your kraken credentials, await calls alongside other async services
+"""
+import urllib.parse
+from trusted_swap_service import AsyncTrustedSwapService, AsyncHttpTransport
+from kraken import Kraken, KrakenCreds, KrakenSigner, KRAKEN_API_URL
+from nonce_source import NonceSource
+from const import COIN_SATS, LOG_INFO
+from typing import Dict
+from result import Result, Ok, Err
+from box import Box
+
+class AsyncKraken(AsyncTrustedSwapService):
+    def __init__(self, creds: KrakenCreds, transport: AsyncHttpTransport | None = None) -> None:
+        super().__init__(transport) # init logger and http transport from parent class
+        self.creds = creds
+        self.alias = f"kraken-{creds.api_key[:5]}"
+        # shared with a sync Kraken on the same key, both draw from one increasing sequence
+        self.nonce_source = NonceSource.shared("kraken", creds.api_key, creds.nonce_path)
+        self.signer = KrakenSigner(creds)
+
+    def get_nonce(self) -> str:
+        return str(self.nonce_source.next())
+
+    async def kraken_request(self, uri_path: str, data: Dict) -> Result[Box, str]: # type: ignore
+        # shares the sync client's lock, see Kraken.kraken_request
+        async with self.nonce_source.async_dispatch(not self.creds.nonce_window):
+            data = {"nonce": self.get_nonce(), **data}
+            # sent exactly as signed
+            postdata = urllib.parse.urlencode(data)
+            headers = {
+                'API-Key': self.creds.api_key,
+                'API-Sign': self.signer.sign(uri_path, str(data['nonce']), postdata),
+                'Content-Type': 'application/x-www-form-urlencoded'
+            }
+            _, body = await self.transport.request("POST", KRAKEN_API_URL + uri_path, headers=headers, data=postdata)
+        if body.get('error'):
+            return Err(str(body['error']))
+        return Ok(Kraken.to_box(body['result']))
+
+    async def get_address(self) -> Result[str, str]:
+        """AsyncTrustedSwapService"""
+        response = await self.kraken_request(
+            '0/private/DepositAddresses',
+            {
+                "asset": "XBT",
+                "method": "Bitcoin",
+            }
+        )
+        if isinstance(response, Err):
+            return Err(self.logs.get_address.err.format(self.alias, response.unwrap_err()))
+        addr: str = response.unwrap()[0].address
+        self.log(LOG_INFO, self.logs.get_address.ok.format(self.alias, addr))
+        return Ok(addr)
+
+    async def send_onchain(self, sats: int, fee: int) -> Result[None, str]:
+        """AsyncTrustedSwapService"""
+        response = await self.kraken_request(
+            '0/private/Withdraw',
+            {
+                "asset": "XBT",
+                "key": self.creds.funding_key,
+                "amount": sats / COIN_SATS
+            }
+        )
+        if isinstance(response, Err):
+            return Err(self.logs.send_onchain.err.format(self.alias, response.unwrap_err()))
+        self.log(LOG_INFO, self.logs.send_onchain.ok.format(self.alias, sats, fee))
+        return Ok(None)
+
+    async def get_onchain_fee(self, sats: int) -> Result[int, str]:
+        """AsyncTrustedSwapService"""
+        response = await self.kraken_request(
+            '0/private/WithdrawInfo',
+            {
+                "asset": "XBT",
+                "key": self.creds.funding_key,
+                "amount": float(sats / COIN_SATS)
+            }
+        )
+        if isinstance(response, Err):
+            return Err(self.logs.get_onchain_fee.err.format(self.alias, response.unwrap_err()))
+        fee = int(float(response.unwrap().fee) * COIN_SATS)
+        self.log(LOG_INFO, self.logs.get_onchain_fee.ok.format(self.alias, sats, fee))
+        return Ok(fee)
+
+    async def get_balance(self) -> Result[int, str]:
+        """AsyncTrustedSwapService"""
+        response = await self.kraken_request(
+            '0/private/Balance',
+            {}
+        )
+        if isinstance(response, Err):
+            return Err(self.logs.get_balance.err.format(self.alias, response.unwrap_err()))
+        balance = int(float(response.unwrap().XXBT) * COIN_SATS)
+        self.log(LOG_INFO, self.logs.get_balance.ok.format(self.alias, balance))
+        return Ok(balance)
+
+    async def get_invoice(self, sats: int) -> Result[str, str]:
+        """AsyncTrustedSwapService"""
+        response = await self.kraken_request(
+            '0/private/DepositAddresses',
+            {
+                "asset": "XBT",
+                "method": "Bitcoin Lightning",
+                "new": True,
+                "amount": sats / COIN_SATS
+            }
+        )
+        if isinstance(response, Err):
+            return Err(self.logs.get_invoice.err.format(self.alias, response.unwrap_err()))
+        invoice: str = response.unwrap()[0].address
+        self.log(LOG_INFO, self.logs.get_invoice.ok.format(self.alias, invoice, sats))
+        return Ok(invoice)
\ No newline at end of file
@@ -0,0 +1,233 @@
+"""
+async_lnd.py
+---
+An asyncio implementation of Lightning Network Daemon (LND) gRPC as an AsyncBitcoinLightningNode
+usage: add your lnd credentials, await connect(), then issue many calls concurrently over one channel
+"""
+import os
+import asyncio
+import grpc
+from grpc_generated import lightning_pb2_grpc, lightning_pb2 as ln
+from grpc_generated import router_pb2_grpc as routerrpc
+from const import LOG_ERROR, LOG_INFO
+from typing import Dict, List, Tuple
+from bitcoin_lightning_node import AsyncBitcoinLightningNode, OpenChannelRequest, CloseChannelRequest, PendingOpenChannel, ActiveOpenChannel, DecodedInvoice, PayInvoiceRequest, SendOnchainRequest
+from lnd import Lnd, LndCreds, CHANNEL_OPTIONS
+from bolt11 import Bolt11
+from unconfirmed_tracker import UnconfirmedBalanceTracker
+from result import Result, Ok, Err
+
+class AsyncLnd(AsyncBitcoinLightningNode):
+    def __init__(self, creds: LndCreds) -> None:
+        super().__init__() # init logger from parent class
+        self.creds = creds
+        self.grpc_channel: grpc.aio.Channel | None = None # built on first use, see open_grpc_channel()
+        self.stubs: Tuple[lightning_pb2_grpc.LightningStub, routerrpc.RouterStub] | None = None
+        self.unconfirmed_tracker = UnconfirmedBalanceTracker(self)
+        self.pubkey = ''
+        self.alias = creds.grpc_host # until connect() resolves the node alias
+
+    def open_grpc_channel(self) -> Tuple[lightning_pb2_grpc.LightningStub, routerrpc.RouterStub]:
+        """read the credentials and build the gRPC channel once, raises OSError for unreadable files"""
+        if self.stubs is None:
+            os.environ['GRPC_SSL_CIPHER_SUITES'] = 'HIGH+ECDSA'
+            combined_credentials = Lnd.get_credentials(
+                self.creds.tls_cert_path, self.creds.macaroon_path)
+            self.grpc_channel = grpc.aio.secure_channel(
+                self.creds.grpc_host, combined_credentials, CHANNEL_OPTIONS)
+            self.stubs = (lightning_pb2_grpc.LightningStub(self.grpc_channel), routerrpc.RouterStub(self.grpc_channel))  # type: ignore
+        return self.stubs
+
+    @property
+    def stub(self) -> lightning_pb2_grpc.LightningStub:
+        return self.open_grpc_channel()[0]
+
+    @property
+    def routerstub(self) -> routerrpc.RouterStub:
+        return self.open_grpc_channel()[1]
+
+    async def connect(self) -> Result[None, str]:
+        """read the credentials, then fetch own pubkey and alias, must run inside the event loop that issues calls"""
+        try:
+            self.open_grpc_channel()
+            pubkey = await self.get_own_pubkey()
+            alias = await self.get_alias(pubkey.unwrap())
+        except OSError as e:
+            return Err(f"unreadable credentials: {e}")
+        except grpc.aio.AioRpcError as e:
+            return Err(e.details())
+        self.pubkey = pubkey.unwrap()
+        self.alias = alias.unwrap()
+        return Ok(None)
+
+    @staticmethod
+    async def warmup(nodes: List['AsyncLnd']) -> Dict[str, Result[None, str]]:
+        """connect() many nodes concurrently, results keyed by grpc host"""
+        results = await asyncio.gather(*[node.connect() for node in nodes])
+        return dict(zip([node.creds.grpc_host for node in nodes], results))
+
+    async def close(self) -> None:
+        if self.grpc_channel is not None:
+            await self.grpc_channel.close()
+
+    async def is_peer_with(self, pubkey: str) -> Result[bool, str]:
+        list_peers_response: ln.ListPeersResponse = await self.stub.ListPeers(ln.ListPeersRequest())
+        return Ok(any(peer.pub_key == pubkey for peer in list_peers_response.peers))
+
+    async def add_peer(self, pubkey: str, address: str) -> Result[ln.ConnectPeerResponse, str]:
+        ln_addr = ln.LightningAddress(pubkey=pubkey, host=address)
+        connect_request = ln.ConnectPeerRequest(addr=ln_addr)
+        try:
+            res: ln.ConnectPeerResponse = await self.stub.ConnectPeer(connect_request)
+        except grpc.aio.AioRpcError as e:
+            return Err(e.debug_error_string())
+        return Ok(res)
+
+    async def get_txns(self, start_height: int, end_height: int) -> Result[ln.TransactionDetails, str]:
+        txns: ln.TransactionDetails = await self.stub.GetTransactions(ln.GetTransactionsRequest(
+            start_height=start_height,
+            end_height=end_height
+        ))
+        return Ok(txns)
+
+    async def open_channel(self, open_req: OpenChannelRequest) -> Result[None, str]:
+        """AsyncBitcoinLightningNode"""
+        is_peered = await self.is_peer_with(open_req.peer_pubkey)
+        if isinstance(is_peered, Err):
+            return is_peered
+        if not is_peered.unwrap():
+            await self.add_peer(open_req.peer_pubkey, open_req.peer_host)
+        try:
+            response = await self.stub.OpenChannelSync(Lnd.to_open_channel_request(open_req))
+        except grpc.aio.AioRpcError as e:
+            self.log(LOG_ERROR, self.logs.open_channel.err.format(self.alias, e.details(), open_req))
+            return Err(e.details())
+        self.log(LOG_INFO, self.logs.open_channel.ok.format(self.alias, open_req, response.funding_txid_bytes.hex()))
+        return Ok(response)
+
+    async def close_channel(self, close_channel_req: CloseChannelRequest) -> Result[str, str]:
+        """AsyncBitcoinLightningNode"""
+        txid = ''
+        try:
+            async for response in self.stub.CloseChannel(Lnd.to_close_channel_request(close_channel_req)):
+                if response.HasField('close_pending'):
+                    txid = response.close_pending.txid.hex()
+                    self.log(LOG_INFO, self.logs.close_channel.ok.format(self.alias, close_channel_req, txid))
+                    break
+        except grpc.aio.AioRpcError as e:
+            self.log(LOG_ERROR, self.logs.close_channel.err.format(self.alias, e.details(), close_channel_req))
+            return Err(e.details())
+        return Ok(txid)
+
+    async def get_pending_open_channels(self) -> Result[List[PendingOpenChannel], str]:
+        """AsyncBitcoinLightningNode"""
+        response: ln.PendingChannelsResponse = await self.stub.PendingChannels(ln.PendingChannelsRequest())
+        chans = [Lnd.to_pending_open_channel(chan) for chan in response.pending_open_channels]
+        self.log(LOG_INFO, self.logs.get_pending_open_channels.ok.format(self.alias, len(chans)))
+        return Ok(chans)
+
+    async def get_opened_channels(self) -> Result[List[ActiveOpenChannel], str]:
+        """AsyncBitcoinLightningNode"""
+        response: ln.ListChannelsResponse = await self.stub.ListChannels(ln.ListChannelsRequest())
+        chans = [Lnd.to_active_open_channel(chan) for chan in response.channels]
+        self.log(LOG_INFO, self.logs.get_opened_channels.ok.format(self.alias, len(chans)))
+        return Ok(chans)
+
+    async def get_invoice(self, sats: int) -> Result[str, str]:
+        """AsyncBitcoinLightningNode"""
+        invoice_response = await self.stub.AddInvoice(ln.Invoice(value=sats))
+        invoice: str = invoice_response.payment_request
+        self.log(LOG_INFO, self.logs.get_invoice.ok.format(self.alias, sats, invoice))
+        return Ok(invoice)
+
+    async def pay_invoice(self, pay_invoice_req: PayInvoiceRequest) -> Result[str, str]:
+        """AsyncBitcoinLightningNode"""
+        try:
+            async for payment in self.routerstub.SendPaymentV2(Lnd.to_send_payment_request(pay_invoice_req)):
+                if payment.status == ln.Payment.SUCCEEDED:
+                    self.log(LOG_INFO, self.logs.pay_invoice.ok.format(self.alias, pay_invoice_req, payment.payment_preimage))
+                    return Ok(payment.payment_preimage)
+                if payment.status == ln.Payment.FAILED:
+                    reason = ln.PaymentFailureReason.Name(payment.failure_reason)
+                    self.log(LOG_ERROR, self.logs.pay_invoice.err.format(self.alias, reason, pay_invoice_req))
+                    return Err(reason)
+        except grpc.aio.AioRpcError as e:
+            self.log(LOG_ERROR, self.logs.pay_invoice.err.format(self.alias, e.details(), pay_invoice_req))
+            return Err(e.details())
+        self.log(LOG_ERROR, self.logs.pay_invoice.err.format(self.alias, "payment stream ended without a final status", pay_invoice_req))
+        return Err("payment stream ended without a final status")
+
+    async def get_address(self) -> Result[str, str]:
+        """AsyncBitcoinLightningNode"""
+        new_address_request = ln.NewAddressRequest(type=ln.AddressType.UNUSED_TAPROOT_PUBKEY)
+        new_address_response = await self.stub.NewAddress(new_address_request)
+        address: str = new_address_response.address
+        self.log(LOG_INFO, self.logs.get_address.ok.format(self.alias, address))
+        return Ok(address)
+
+    async def send_onchain(self, send_onchain_req: SendOnchainRequest) -> Result[str, str]:
+        """AsyncBitcoinLightningNode"""
+        send_response = await self.stub.SendCoins(Lnd.to_send_coins_request(send_onchain_req))
+        txid: str = send_response.txid
+        self.log(LOG_INFO, self.logs.send_onchain.ok.format(self.alias, send_onchain_req, txid))
+        return Ok(txid)
+
+    async def get_unconfirmed_balance(self) -> Result[int, str]:
+        """AsyncBitcoinLightningNode"""
+        start_height = self.unconfirmed_tracker.begin_scan()
+        try:
+            info = await self.stub.GetInfo(ln.GetInfoRequest())
+            txns = await self.get_txns(start_height=start_height, end_height=-1)
+        except BaseException:
+            self.unconfirmed_tracker.end_scan()
+            raise
+        if isinstance(txns, Err):
+            self.unconfirmed_tracker.end_scan()
+            return txns
+        self.unconfirmed_tracker.apply_scan(txns.unwrap().transactions, info.block_height)
+        unconfirmed = self.unconfirmed_tracker.balance
+        self.log(LOG_INFO, self.logs.get_unconfirmed_balance.ok.format(self.alias, unconfirmed))
+        return Ok(unconfirmed)
+
+    async def get_confirmed_balance(self) -> Result[int, str]:
+        """AsyncBitcoinLightningNode"""
+        balance_response = await self.stub.WalletBalance(ln.WalletBalanceRequest())
+        confirmed = int(balance_response.confirmed_balance)
+        self.log(LOG_INFO, self.logs.get_confirmed_balance.ok.format(self.alias, confirmed))
+        return Ok(confirmed)
+
+    async def decode_invoice(self, invoice: str) -> Result[DecodedInvoice, str]:
+        """AsyncBitcoinLightningNode"""
+        cached = self.invoice_cache.get(invoice)
+        if cached is not None:
+            return Ok(cached)
+        local = Bolt11.decode(invoice)
+        if isinstance(local, Ok):
+            decoded = local.unwrap()
+        else: # let the node have the final word on anything the local parser rejects
+            decoded_req: ln.PayReq = await self.stub.DecodePayReq(ln.PayReqString(pay_req=invoice))
+            decoded = Lnd.to_decoded_invoice(decoded_req)
+        self.invoice_cache.put_decoded(invoice, decoded)
+        self.log(LOG_INFO, self.logs.decode_invoice.ok.format(self.alias, invoice, decoded))
+        return Ok(decoded)
+
+    async def sign_message(self, message: str) -> Result[str, str]:
+        """AsyncBitcoinLightningNode"""
+        response = await self.stub.SignMessage(ln.SignMessageRequest(msg=message.encode('utf-8')))
+        signed_message: str = response.signature
+        self.log(LOG_INFO, self.logs.sign_message.ok.format(self.alias, message, signed_message))
+        return Ok(signed_message)
+
+    async def get_own_pubkey(self) -> Result[str, str]:
+        """AsyncBitcoinLightningNode"""
+        info = await self.stub.GetInfo(ln.GetInfoRequest())
+        pubkey: str = info.identity_pubkey
+        self.log(LOG_INFO, self.logs.get_pubkey.ok.format(self.alias, pubkey))
+        return Ok(pubkey)
+
+    async def get_alias(self, pubkey: str) -> Result[str, str]:
+        """AsyncBitcoinLightningNode"""
+        node_info = await self.stub.GetNodeInfo(ln.NodeInfoRequest(pub_key=pubkey))
+        alias: str = node_info.node.alias
+        self.log(LOG_INFO, self.logs.get_alias.ok.format(self.alias, pubkey, alias))
+        return Ok(alias)
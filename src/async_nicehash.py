@@ -0,0 +1,108 @@
+"""
+async_nicehash.py
+---
+An asyncio implementation of Nicehash Wallet API as an AsyncTrustedSwapService
+usage: add your nicehash credentials, await calls alongside other async services
+"""
+import json
+from trusted_swap_service import AsyncTrustedSwapService, AsyncHttpTransport
+from nicehash import NicehashCreds, NicehashSigner, NICEHASH_API_URL
+from const import COIN_SATS, LOG_INFO
+from typing import Dict
+from result import Result, Ok, Err
+from box import Box
+
+class AsyncNicehash(AsyncTrustedSwapService):
+    def __init__(self, creds: NicehashCreds, transport: AsyncHttpTransport | None = None) -> None:
+        super().__init__(transport) # init logger and http transport from parent class
+        self.creds = creds
+        self.alias = f"NICEHASH-{creds.api_key[:5]}"
+        self.signer = NicehashSigner(creds)
+
+    async def nicehash_request(self, method: str, path: str, query: str, body: Dict | None) -> Box: # type: ignore
+        body_json = json.dumps(body) if body else None
+        headers = self.signer.headers(method, path, query, body_json)
+        url = NICEHASH_API_URL + path
+        if query:
+            url += '?' + query
+        _, res = await self.transport.request(method, url, headers=headers, data=body_json)
+        return Box(res)
+
+    async def get_address(self) -> Result[str, str]:
+        """AsyncTrustedSwapService"""
+        res = await self.nicehash_request("GET", '/main/api/v2/accounting/depositAddresses', 'currency=BTC&walletType=BITGO', None)
+        if hasattr(res, "content"):
+            return Err(self.logs.get_address.err.format(self.alias, res))
+        addr: str = res.list[0].address
+        self.log(LOG_INFO, self.logs.get_address.ok.format(self.alias, addr))
+        return Ok(addr)
+
+    async def send_onchain(self, sats: int, fee: int) -> Result[None, str]:
+        """AsyncTrustedSwapService"""
+        body = {
+            "currency": "BTC",
+            "amount": str(float(sats) / COIN_SATS),
+            "withdrawalAddressId": self.creds.funding_key
+        }
+        res = await self.nicehash_request("POST", "/main/api/v2/accounting/withdrawal", '', body)
+        if hasattr(res, "content"):
+            return Err(self.logs.send_onchain.err.format(self.alias, res))
+        self.log(LOG_INFO, self.logs.send_onchain.ok.format(self.alias, sats, fee))
+        return Ok(None)
+
+    async def get_onchain_fee(self, sats: int) -> Result[int, str]:
+        """AsyncTrustedSwapService"""
+        res = await self.nicehash_request("GET", "/main/api/v2/public/service/fee/info", '', None)
+        if hasattr(res, "content"):
+            return Err(self.logs.get_onchain_fee.err.format(self.alias, res))
+        fee = int(float(res.withdrawal.BITGO.rules.BTC.intervals[0].element.sendValue) * COIN_SATS)
+        self.log(LOG_INFO, self.logs.get_onchain_fee.ok.format(self.alias, sats, fee))
+        return Ok(fee)
+
+    async def get_balance(self) -> Result[int, str]:
+        """AsyncTrustedSwapService"""
+        res = await self.nicehash_request("GET", "/main/api/v2/accounting/account2/BTC", '', None)
+        if hasattr(res, 'content'):
+            return Err(self.logs.get_balance.err.format(self.alias, res))
+        balance = int(float(res.available) * COIN_SATS)
+        self.log(LOG_INFO, self.logs.get_balance.ok.format(self.alias, balance))
+        return Ok(balance)
+
+    async def get_invoice(self, sats: int) -> Result[str, str]:
+        """AsyncTrustedSwapService"""
+        res = await self.nicehash_request(
+            "GET",
+            "/main/api/v2/accounting/depositAddresses",
+            f'currency=BTC&walletType=LIGHTNING&amount={float(sats) / COIN_SATS}',
+            None
+        )
+        if hasattr(res, "content"):
+            return Err(self.logs.get_invoice.err.format(self.alias, res))
+        invoice: str = res.list[0].address.split(":")[1]
+        self.log(LOG_INFO, self.logs.get_invoice.ok.format(self.alias, invoice, sats))
+        return Ok(invoice)
+
+    async def pay_invoice(self, sats: int, invoice: str) -> Result[int, str]:
+        """AsyncTrustedSwapService"""
+        body1 = {
+            "address": invoice,
+            "currency": "BTC",
+            "name": "Lightning Invoice code",
+            "type": "LIGHTNING"
+        }
+        res1 = await self.nicehash_request("POST", "/main/api/v2/accounting/withdrawalAddress", '', body1)
+        if not hasattr(res1, 'id'):
+            return Err(self.logs.pay_invoice.err.format(self.alias, res1))
+        body2 = {
+            "currency": "BTC",
+            "amount": str(float(sats) / COIN_SATS),
+            "withdrawalAddressId": res1.id,
+            "walletType": "LIGHTNING"
+        }
+        res2 = await self.nicehash_request("POST", "/main/api/v2/accounting/withdrawal", '', body2)
+        if hasattr(res2, "content"):
+            return Err(self.logs.pay_invoice.err.format(self.alias, res2))
+        res3 = await self.nicehash_request("GET", f"/main/api/v2/accounting/withdrawal2/BTC/{res2.id}", "", None)
+        fee = int((res3.amount - res3.amountReceived) * COIN_SATS)
+        self.log(LOG_INFO, self.logs.pay_invoice.ok.format(self.alias, invoice, sats, fee))
+        return Ok(fee)
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+async_wos.py
+---
+An asyncio implementation of WoS API as an AsyncTrustedSwapService
+usage: add your wos credentials, await calls alongside other async services
+"""
+import json
+from trusted_swap_service import AsyncTrustedSwapService, AsyncHttpTransport
+from wos import WosCreds, WosSigner, WOS_API_URL
+from const import COIN_SATS, SAT_MSATS, LOG_INFO
+from box import Box
+from result import Result, Ok, Err
+
+class AsyncWos(AsyncTrustedSwapService):
+    def __init__(self, creds: WosCreds, transport: AsyncHttpTransport | None = None) -> None:
+        super().__init__(transport) # init logger and http transport from parent class
+        self.creds = creds
+        self.alias = f"WOS-{creds.api_key[:5]}"
+        self.signer = WosSigner(creds)
+
+    async def wos_request(self, method: str, ext: str, data_str: str = "", sign: bool = False) -> Result[Box, str]:
+        headers = {"api-token": self.creds.api_key}
+        if sign and data_str:
+            headers.update(self.signer.headers(ext, data_str))
+        args = {'headers': headers}
+        if data_str and method == "GET":
+            args['params'] = json.loads(data_str)
+        if data_str and method == "POST":
+            args['data'] = data_str.encode("utf-8") # type: ignore
+        status, res = await self.transport.request(method, WOS_API_URL + ext, **args)
+        if status != 200:
+            return Err(str(res))
+        return Ok(Box(res))
+
+    async def get_address(self) -> Result[str, str]:
+        """AsyncTrustedSwapService"""
+        addr = str(self.creds.onchain_address)
+        self.log(LOG_INFO, self.logs.get_address.ok.format(self.alias, addr))
+        return Ok(addr)
+
+    async def get_balance(self) -> Result[int, str]:
+        """AsyncTrustedSwapService"""
+        res = await self.wos_request("GET", "api/v1/wallet/walletData")
+        if isinstance(res, Err):
+            return Err(self.logs.get_balance.err.format(self.alias, res.unwrap_err()))
+        balance = int(res.unwrap().btc * COIN_SATS)
+        self.log(LOG_INFO, self.logs.get_balance.ok.format(self.alias, balance))
+        return Ok(balance)
+
+    async def get_invoice(self, sats: int) -> Result[str, str]:
+        """AsyncTrustedSwapService"""
+        user, url = self.creds.lightning_address.split('@')
+        _, res = await self.transport.request("GET", f"https://{url}/.well-known/lnurlp/{user}")
+        if not isinstance(res, dict) or 'callback' not in res:
+            return Err(self.logs.get_invoice.err.format(self.alias, res))
+        _, res2 = await self.transport.request("GET", f"{res['callback']}?amount={sats * SAT_MSATS}")
+        if 'pr' not in res2:
+            return Err(self.logs.get_invoice.err.format(self.alias, res2))
+        self.log(LOG_INFO, self.logs.get_invoice.ok.format(self.alias, res2['pr'], sats))
+        return Ok(res2['pr'])
+
+    async def get_onchain_fee(self, sats: int) -> Result[int, str]:
+        """AsyncTrustedSwapService"""
+        res = await self.wos_request(
+            "GET",
+            "api/v1/wallet/feeEstimate",
+            data_str=json.dumps({
+                "address": self.creds.external_onchain_address,
+                "amount": sats / COIN_SATS,
+            })
+        )
+        if isinstance(res, Err):
+            return Err(self.logs.get_onchain_fee.err.format(self.alias, res.unwrap_err()))
+        fee = int(round(res.unwrap().btcFixedFee * COIN_SATS))
+        self.log(LOG_INFO, self.logs.get_onchain_fee.ok.format(self.alias, sats, fee))
+        return Ok(fee)
+
+    async def send_onchain(self, sats: int, fee: int) -> Result[None, str]:
+        """AsyncTrustedSwapService"""
+        data_str = '{{"address":"{}","currency":"BTC","amount":{:.7e},"sendMaxLightning":false,"description":null}}'.format(self.creds.external_onchain_address, sats / COIN_SATS)
+        res = await self.wos_request("POST", "api/v1/wallet/payment", data_str, sign=True)
+        if isinstance(res, Err):
+            return Err(self.logs.send_onchain.err.format(self.alias, res.unwrap_err()))
+        self.log(LOG_INFO, self.logs.send_onchain.ok.format(self.alias, sats, fee))
+        return Ok(None)
+
+    async def pay_invoice(self, sats: int, invoice: str) -> Result[int, str]:
+        """AsyncTrustedSwapService"""
+        data_str = '{{"address":"{}","currency":"LIGHTNING","amount":{:.7e},"sendMaxLightning":false,"description":null}}'.format(invoice, 1000/COIN_SATS)
+        res = await self.wos_request("POST", "api/v1/wallet/payment", data_str, sign=True)
+        if isinstance(res, Err) or not hasattr(res.unwrap(), 'fees'):
+            return Err(self.logs.pay_invoice.err.format(self.alias, res))
+        fees = int(float(res.unwrap().fees) * COIN_SATS)
+        self.log(LOG_INFO, self.logs.pay_invoice.ok.format(self.alias, invoice, sats, fees))
+        return Ok(fees)
\ No newline at end of file
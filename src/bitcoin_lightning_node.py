@@ -4,11 +4,15 @@ bitcoin_lighting_node.py
 A lightning node with admin controls
 usage: a base class for lightning node implementation wrappers
 """
+import time
 from box import Box
-from result import Result
+from result import Result, Ok, Err
 from typing import List
 from console import console
-from const import LOG_GAP
+from const import LOG_GAP, MIN_CHANNEL_SATS
+from ttl_cache import TtlCache
+
+HEX_DIGITS = set('0123456789abcdef')
 
 class SendOnchainRequest:
     """
@@ -55,6 +59,17 @@ class OpenChannelRequest:
         self.is_spend_unconfirmed = is_spend_unconfirmed
         self.is_unannounced = is_unannounced
 
+    def validate(self) -> Result[None, str]:
+        if len(self.peer_pubkey) != 66 or not all(c in HEX_DIGITS for c in self.peer_pubkey):
+            return Err(f"peer_pubkey must be 33 bytes of hex, got {self.peer_pubkey}")
+        if self.capacity < MIN_CHANNEL_SATS:
+            return Err(f"capacity must be at least {MIN_CHANNEL_SATS} sats, got {self.capacity}")
+        if self.base_fee < 0 or self.ppm_fee < 0 or self.min_htlc_sats < 0:
+            return Err("base_fee, ppm_fee and min_htlc_sats must not be negative")
+        if self.vbyte_sats < 1:
+            return Err(f"vbyte_sats must be at least 1, got {self.vbyte_sats}")
+        return Ok(None)
+
     def __str__(self) -> str:
         return f"OpenChannelRequest(peer_pubkey={self.peer_pubkey}, peer_host={self.peer_host}, channel_capacity={self.capacity}, base_fee={self.base_fee}, ppm_fee={self.ppm_fee}, cltv_delta={self.cltv_delta}, min_htlc_sats={self.min_htlc_sats}, vbyte_sats={self.vbyte_sats}, is_spend_unconfirmed={self.is_spend_unconfirmed}, is_unannounced={self.is_unannounced})"
 
@@ -84,13 +99,17 @@ class PayInvoiceRequest:
             invoice: str,
             fee_limit_sats: int,
             outgoing_channel_id: int | None = None,
+            timeout_secs: int = 60,
+            max_parts: int = 1,
     ) -> None:
         self.outgoing_channel_id = outgoing_channel_id
         self.invoice = invoice
         self.fee_limit_sats = fee_limit_sats
+        self.timeout_secs = timeout_secs
+        self.max_parts = max_parts # > 1 allows multi-part payments
     
     def __str__(self) -> str:
-        return f"PayInvoiceRequest(outgoing_channel_id={self.outgoing_channel_id}, invoice={self.invoice}, fee_limit_sats={self.fee_limit_sats})"
+        return f"PayInvoiceRequest(outgoing_channel_id={self.outgoing_channel_id}, invoice={self.invoice}, fee_limit_sats={self.fee_limit_sats}, timeout_secs={self.timeout_secs}, max_parts={self.max_parts})"
 
 class PendingOpenChannel:
     """
@@ -132,6 +151,47 @@ class ActiveOpenChannel:
     def __str__(self) -> str:
         return f"ActiveOpenChannel(channel_id={self.channel_id}, peer_pubkey={self.peer_pubkey}, channel_point={self.channel_point}, capacity={self.capacity}, local_balance={self.local_balance})"
 
+class ChannelFeePolicy:
+    """
+    Type used in BitcoinLightningNode.update_fee_policies(), the fees a channel charges to forward
+        cltv_delta None keeps the channel's current value
+    """
+    def __init__(
+            self,
+            channel_point: str,
+            base_fee: int,
+            ppm_fee: int,
+            cltv_delta: int | None = None,
+    ) -> None:
+        self.channel_point = channel_point
+        self.base_fee = base_fee
+        self.ppm_fee = ppm_fee
+        self.cltv_delta = cltv_delta
+
+    def __str__(self) -> str:
+        return f"ChannelFeePolicy(channel_point={self.channel_point}, base_fee={self.base_fee}, ppm_fee={self.ppm_fee}, cltv_delta={self.cltv_delta})"
+
+class RouteHintHop:
+    """
+    Type used in DecodedInvoice.route_hints
+    """
+    def __init__(
+        self,
+        pubkey: str,
+        channel_id: int,
+        base_fee_msat: int,
+        ppm_fee: int,
+        cltv_delta: int,
+    ) -> None:
+        self.pubkey = pubkey
+        self.channel_id = channel_id
+        self.base_fee_msat = base_fee_msat
+        self.ppm_fee = ppm_fee
+        self.cltv_delta = cltv_delta
+
+    def __str__(self) -> str:
+        return f"RouteHintHop(pubkey={self.pubkey}, channel_id={self.channel_id}, base_fee_msat={self.base_fee_msat}, ppm_fee={self.ppm_fee}, cltv_delta={self.cltv_delta})"
+
 class DecodedInvoice:
     """
     Type used in BitcoinLightningNode.decode_invoice() 
@@ -142,14 +202,34 @@ class DecodedInvoice:
         payment_hash: str,
         amount_sats: int,
         description: str,
+        timestamp: int = 0,
+        expiry: int = 3600,
+        route_hints: List[List[RouteHintHop]] | None = None,
     ) -> None:
         self.dest_pubkey = dest_pubkey
         self.payment_hash = payment_hash
         self.amount_sats = amount_sats
         self.description = description
+        self.timestamp = timestamp
+        self.expiry = expiry
+        self.route_hints = route_hints or []
+
+    def expires_at(self) -> int:
+        return self.timestamp + self.expiry
 
     def __str__(self) -> str:
-        return f"DecodedInvoice(dest_pubkey={self.dest_pubkey}, payment_hash={self.payment_hash}, amount_sats={self.amount_sats}, description={self.description})"
+        return f"DecodedInvoice(dest_pubkey={self.dest_pubkey}, payment_hash={self.payment_hash}, amount_sats={self.amount_sats}, description={self.description}, timestamp={self.timestamp}, expiry={self.expiry}, route_hints={len(self.route_hints)})"
+
+class InvoiceCache(TtlCache[DecodedInvoice]):
+    """
+    Decoded invoices by payment request, each kept until the invoice expires
+        an invoice already expired when decoded stays invalid, it is kept for the default ttl
+    """
+    def put_decoded(self, invoice: str, decoded: DecodedInvoice) -> None:
+        expires_at = float(decoded.expires_at())
+        if expires_at <= time.time():
+            expires_at = time.time() + self.ttl_secs
+        self.put(invoice, decoded, expires_at)
 
 class BitcoinLightningNode:
     """
@@ -157,11 +237,17 @@ class BitcoinLightningNode:
     """
     def __init__(self) -> None:
         self.log = console.log
+        self.invoice_cache = InvoiceCache(max_size=10_000, ttl_secs=3600) # read by decode_invoice()
+        self.alias_cache: TtlCache[str] = TtlCache(max_size=100_000, ttl_secs=6 * 3600) # pubkey -> alias
         self.logs = Box({
             "open_channel": {
                 "ok": LOG_GAP.join(["{}", "open_channel", "response: {}, funding_txid: {}"]),
                 "err": LOG_GAP.join(["{}", "open_channel", "{}", "response: {}"])
             },
+            "open_channels": {
+                "ok": LOG_GAP.join(["{}", "open_channels", "response: {}, channel_point: {}"]),
+                "err": LOG_GAP.join(["{}", "open_channels", "{}"])
+            },
             "close_channel": {
                 "ok": LOG_GAP.join(["{}", "close_channel", "response: {}, closing_txid: {}"]),
                 "err": LOG_GAP.join(["{}", "close_channel", "{}"])
@@ -178,10 +264,24 @@ class BitcoinLightningNode:
                 "ok": LOG_GAP.join(["{}", "get_invoice", "sats: {}, invoice: {}"]),
                 "err": LOG_GAP.join(["{}", "get_invoice", "{}"])
             },
+            "wait_for_settlement": {
+                "ok": LOG_GAP.join(["{}", "wait_for_settlement", "payment_hash: {}, amount_paid_sats: {}"]),
+                "err": LOG_GAP.join(["{}", "wait_for_settlement", "payment_hash: {}, {}"])
+            },
             "pay_invoice": {
                 "ok": LOG_GAP.join(["{}", "pay_invoice", "response: {}, preimage: {}"]),
                 "err": LOG_GAP.join(["{}", "pay_invoice", "{}", "response: {}"])
             },
+            "payment_update": {
+                "ok": LOG_GAP.join(["{}", "payment_update", "payment_hash: {}, status: {}, htlcs: {}"]),
+            },
+            "get_fee_policies": {
+                "err": LOG_GAP.join(["{}", "get_fee_policies", "{}"])
+            },
+            "update_fee_policies": {
+                "ok": LOG_GAP.join(["{}", "update_fee_policies", "requested: {}, changed: {}, rpcs: {}"]),
+                "err": LOG_GAP.join(["{}", "update_fee_policies", "{}"])
+            },
             "get_address": {
                 "ok": LOG_GAP.join(["{}", "get_address", "address: {}"]),
                 "err": LOG_GAP.join(["{}", "get_address", "{}"])
@@ -190,6 +290,10 @@ class BitcoinLightningNode:
                 "ok": LOG_GAP.join(["{}", "send_onchain", "response: {}, txid: {}"]),
                 "err": LOG_GAP.join(["{}", "send_onchain", "{}"])
             },
+            "send_onchain_many": {
+                "ok": LOG_GAP.join(["{}", "send_onchain_many", "outputs: {}, txid: {}"]),
+                "err": LOG_GAP.join(["{}", "send_onchain_many", "{}"])
+            },
             "get_unconfirmed_balance": {
                 "ok": LOG_GAP.join(["{}", "get_unconfirmed_balance", "unconfirmed_balance_sats: {}"]),
                 "err": LOG_GAP.join(["{}", "get_unconfirmed_balance", "{}"])
@@ -219,6 +323,10 @@ class BitcoinLightningNode:
     def open_channel(self, req: OpenChannelRequest) -> Result[None, str]:
         """Ok(funding_txid)"""
         raise NotImplementedError
+
+    def open_channels(self, reqs: List[OpenChannelRequest]) -> Result[List[str], str]:
+        """Ok(channel_points) in the order of `reqs`, all funded by one transaction"""
+        raise NotImplementedError
     
     def close_channel(self, req: CloseChannelRequest) -> Result[str, str]:
         """Ok(closing_txid)"""
@@ -230,8 +338,16 @@ class BitcoinLightningNode:
     def get_opened_channels(self) -> Result[List[ActiveOpenChannel], str]:
         raise NotImplementedError
     
+    def update_fee_policies(self, policies: List[ChannelFeePolicy]) -> Result[int, str]:
+        """Ok(number of channels changed), channels already on their policy are left alone"""
+        raise NotImplementedError
+
     def get_invoice(self, sats: int) -> Result[str, str]:
         raise NotImplementedError
+
+    def wait_for_settlement(self, payment_hash: str, timeout: float | None = None) -> Result[int, str]:
+        """Ok(amount paid in sats) once the invoice with `payment_hash` settles"""
+        raise NotImplementedError
     
     def pay_invoice(self, req: PayInvoiceRequest) -> Result[str, str]:
         """Ok(preimage)"""
@@ -243,6 +359,10 @@ class BitcoinLightningNode:
     def send_onchain(self, req: SendOnchainRequest) -> Result[str, str]:
         """Ok(transaction_id)"""
         raise NotImplementedError
+
+    def send_onchain_many(self, reqs: List[SendOnchainRequest]) -> Result[str, str]:
+        """Ok(transaction_id) of the one transaction paying every request"""
+        raise NotImplementedError
     
     def get_unconfirmed_balance(self) -> Result[int, str]:
         raise NotImplementedError
@@ -252,7 +372,7 @@ class BitcoinLightningNode:
     
     def decode_invoice(self, invoice: str) -> Result[DecodedInvoice, str]:
         raise NotImplementedError
-    
+
     def sign_message(self, message: str) -> Result[str, str]:
         raise NotImplementedError
     
@@ -260,4 +380,60 @@ class BitcoinLightningNode:
         raise NotImplementedError
 
     def get_alias(self, pubkey: str) -> Result[str, str]:
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+class AsyncBitcoinLightningNode:
+    """
+    Extend with asyncio gRPC or API calls to a node
+        same surface as BitcoinLightningNode but every call is a coroutine
+    """
+    def __init__(self) -> None:
+        self.log = console.log
+        self.logs = BitcoinLightningNode().logs # share log formats with the sync nodes
+        self.invoice_cache = InvoiceCache(max_size=10_000, ttl_secs=3600) # read by decode_invoice()
+
+    async def open_channel(self, req: OpenChannelRequest) -> Result[None, str]:
+        """Ok(funding_txid)"""
+        raise NotImplementedError
+    
+    async def close_channel(self, req: CloseChannelRequest) -> Result[str, str]:
+        """Ok(closing_txid)"""
+        raise NotImplementedError
+    
+    async def get_pending_open_channels(self) -> Result[List[PendingOpenChannel], str]:
+        raise NotImplementedError
+    
+    async def get_opened_channels(self) -> Result[List[ActiveOpenChannel], str]:
+        raise NotImplementedError
+    
+    async def get_invoice(self, sats: int) -> Result[str, str]:
+        raise NotImplementedError
+    
+    async def pay_invoice(self, req: PayInvoiceRequest) -> Result[str, str]:
+        """Ok(preimage)"""
+        raise NotImplementedError
+    
+    async def get_address(self) -> Result[str, str]:
+        raise NotImplementedError
+    
+    async def send_onchain(self, req: SendOnchainRequest) -> Result[str, str]:
+        """Ok(transaction_id)"""
+        raise NotImplementedError
+    
+    async def get_unconfirmed_balance(self) -> Result[int, str]:
+        raise NotImplementedError
+
+    async def get_confirmed_balance(self) -> Result[int, str]:
+        raise NotImplementedError
+    
+    async def decode_invoice(self, invoice: str) -> Result[DecodedInvoice, str]:
+        raise NotImplementedError
+    
+    async def sign_message(self, message: str) -> Result[str, str]:
+        raise NotImplementedError
+    
+    async def get_own_pubkey(self) -> Result[str, str]:
+        raise NotImplementedError
+
+    async def get_alias(self, pubkey: str) -> Result[str, str]:
+        raise NotImplementedError
@@ -0,0 +1,296 @@
+"""
+bolt11.py
+---
+Decode BOLT11 lightning invoices locally, no node round trip
+usage: Bolt11.decode(invoice) -> Result[DecodedInvoice, str]
+"""
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from bitcoin_lightning_node import DecodedInvoice, RouteHintHop
+from typing import Dict, List, Tuple
+from result import Result, Ok, Err
+
+BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+BECH32_VALUES = {c: i for i, c in enumerate(BECH32_CHARSET)}
+BECH32_GENERATOR = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+# hrp amount multipliers as msats per unit, 1 btc = 10**11 msats
+AMOUNT_MSATS = {'m': 10**8, 'u': 10**5, 'n': 10**2}
+SIGNATURE_WORDS = 104 # 65 bytes: 64 byte compact signature + recovery id
+DEFAULT_EXPIRY = 3600
+
+# tagged field types, BOLT11 "Tagged Fields"
+TAG_PAYMENT_HASH = 1
+TAG_ROUTE_HINT = 3
+TAG_EXPIRY = 6
+TAG_DESCRIPTION = 13
+TAG_PAYEE = 19
+
+# secp256k1
+CURVE_P = 2**256 - 2**32 - 977
+CURVE_N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+CURVE_G = (
+    0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
+    0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8,
+    1
+)
+
+class Bolt11:
+    """
+    Pure-python BOLT11 parser producing the same DecodedInvoice as the node's DecodePayReq
+        the payee pubkey is recovered from the signature unless the invoice carries an `n` field,
+        with `verify` the signature is also checked against an explicit `n` field
+    """
+    @staticmethod
+    def decode(invoice: str, verify: bool = False) -> Result[DecodedInvoice, str]:
+        try:
+            return Ok(Bolt11.parse(invoice, verify))
+        except ValueError as e:
+            return Err(f"invalid bolt11 invoice: {e}")
+
+    @staticmethod
+    def decode_many(invoices: List[str], verify: bool = False, max_workers: int | None = None) -> List[Result[DecodedInvoice, str]]:
+        """decode a batch, spread over `max_workers` processes when given"""
+        if max_workers is None or len(invoices) < 2:
+            return [Bolt11.decode(invoice, verify) for invoice in invoices]
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(Bolt11.decode, invoices, [verify] * len(invoices), chunksize=64))
+
+    @staticmethod
+    def parse(invoice: str, verify: bool) -> DecodedInvoice:
+        hrp, data = Bolt11.bech32_decode(invoice)
+        if not hrp.startswith('ln'):
+            raise ValueError("missing ln prefix")
+        if len(data) < 7 + SIGNATURE_WORDS:
+            raise ValueError("too short")
+        amount_msats = Bolt11.parse_amount(hrp)
+        signature = bytes(Bolt11.convert_bits(data[-SIGNATURE_WORDS:], 5, 8, False))
+        words = data[:-SIGNATURE_WORDS]
+        timestamp = Bolt11.words_to_int(words[:7])
+        fields: Dict[int, List[List[int]]] = {}
+        i = 7
+        while i < len(words):
+            if i + 3 > len(words):
+                raise ValueError("truncated tagged field")
+            tag = words[i]
+            length = words[i + 1] * 32 + words[i + 2]
+            fields.setdefault(tag, []).append(words[i + 3:i + 3 + length])
+            i += 3 + length
+        payment_hash = Bolt11.field_bytes(fields, TAG_PAYMENT_HASH, 52)
+        if payment_hash is None:
+            raise ValueError("missing payment hash")
+        payee = Bolt11.field_bytes(fields, TAG_PAYEE, 53)
+        if payee is None or verify:
+            message = hashlib.sha256(hrp.encode() + bytes(Bolt11.convert_bits(words, 5, 8, True))).digest()
+            recovered = Bolt11.recover_pubkey(message, signature)
+            if payee is not None and recovered != payee:
+                raise ValueError("signature does not match payee")
+            payee = recovered
+        description = b''
+        if TAG_DESCRIPTION in fields:
+            description = bytes(Bolt11.convert_bits(fields[TAG_DESCRIPTION][0], 5, 8, False))
+        expiry = Bolt11.words_to_int(fields[TAG_EXPIRY][0]) if TAG_EXPIRY in fields else DEFAULT_EXPIRY
+        return DecodedInvoice(
+            payee.hex(),
+            payment_hash.hex(),
+            amount_msats // 1000,
+            description.decode('utf-8', 'replace'),
+            timestamp=timestamp,
+            expiry=expiry,
+            route_hints=[Bolt11.parse_route_hint(route) for route in fields.get(TAG_ROUTE_HINT, [])]
+        )
+
+    @staticmethod
+    def bech32_decode(invoice: str) -> Tuple[str, List[int]]:
+        # bolt11 strings exceed the 90 character bech32 limit, so no length check here
+        if invoice.lower() != invoice and invoice.upper() != invoice:
+            raise ValueError("mixed case")
+        invoice = invoice.lower()
+        if invoice.startswith('lightning:'):
+            invoice = invoice[len('lightning:'):]
+        separator = invoice.rfind('1')
+        if separator < 1 or separator + 7 > len(invoice):
+            raise ValueError("missing separator")
+        hrp = invoice[:separator]
+        try:
+            data = [BECH32_VALUES[c] for c in invoice[separator + 1:]]
+        except KeyError as e:
+            raise ValueError(f"invalid character {e}")
+        if Bech32.polymod(Bech32.hrp_expand(hrp) + data) != 1:
+            raise ValueError("bad checksum")
+        return hrp, data[:-6]
+
+    @staticmethod
+    def parse_amount(hrp: str) -> int:
+        """amount in msats, 0 for any-amount invoices"""
+        i = 2
+        while i < len(hrp) and not hrp[i].isdigit():
+            i += 1
+        amount = hrp[i:]
+        if not amount:
+            return 0
+        multiplier = amount[-1]
+        if multiplier.isdigit():
+            return int(amount) * 10**11
+        if not amount[:-1].isdigit():
+            raise ValueError(f"bad amount {amount}")
+        if multiplier == 'p':
+            if int(amount[:-1]) % 10:
+                raise ValueError("pico amount is not a whole msat")
+            return int(amount[:-1]) // 10
+        if multiplier not in AMOUNT_MSATS:
+            raise ValueError(f"bad multiplier {multiplier}")
+        return int(amount[:-1]) * AMOUNT_MSATS[multiplier]
+
+    @staticmethod
+    def parse_route_hint(words: List[int]) -> List[RouteHintHop]:
+        data = bytes(Bolt11.convert_bits(words, 5, 8, False))
+        hops = []
+        for i in range(0, len(data) - 50, 51):
+            hop = data[i:i + 51]
+            hops.append(RouteHintHop(
+                pubkey=hop[:33].hex(),
+                channel_id=int.from_bytes(hop[33:41], 'big'),
+                base_fee_msat=int.from_bytes(hop[41:45], 'big'),
+                ppm_fee=int.from_bytes(hop[45:49], 'big'),
+                cltv_delta=int.from_bytes(hop[49:51], 'big')
+            ))
+        return hops
+
+    @staticmethod
+    def field_bytes(fields: Dict[int, List[List[int]]], tag: int, words: int) -> bytes | None:
+        # readers must skip fields of unexpected length, the first well-formed one wins
+        for value in fields.get(tag, []):
+            if len(value) == words:
+                return bytes(Bolt11.convert_bits(value, 5, 8, False))
+        return None
+
+    @staticmethod
+    def words_to_int(words: List[int]) -> int:
+        value = 0
+        for word in words:
+            value = value * 32 + word
+        return value
+
+    @staticmethod
+    def convert_bits(data: List[int], from_bits: int, to_bits: int, pad: bool) -> List[int]:
+        acc = 0
+        bits = 0
+        out = []
+        maxv = (1 << to_bits) - 1
+        for value in data:
+            acc = (acc << from_bits) | value
+            bits += from_bits
+            while bits >= to_bits:
+                bits -= to_bits
+                out.append((acc >> bits) & maxv)
+        if pad and bits:
+            out.append((acc << (to_bits - bits)) & maxv)
+        return out
+
+    @staticmethod
+    def recover_pubkey(message: bytes, signature: bytes) -> bytes:
+        """compressed secp256k1 pubkey that produced the 64 byte compact signature + recovery id"""
+        r = int.from_bytes(signature[:32], 'big')
+        s = int.from_bytes(signature[32:64], 'big')
+        recovery_id = signature[64]
+        if recovery_id > 3 or not 0 < r < CURVE_N or not 0 < s < CURVE_N:
+            raise ValueError("bad signature")
+        x = r + CURVE_N if recovery_id & 2 else r
+        if x >= CURVE_P:
+            raise ValueError("bad signature")
+        alpha = (pow(x, 3, CURVE_P) + 7) % CURVE_P
+        y = pow(alpha, (CURVE_P + 1) // 4, CURVE_P)
+        if y * y % CURVE_P != alpha:
+            raise ValueError("bad signature")
+        if y & 1 != recovery_id & 1:
+            y = CURVE_P - y
+        e = int.from_bytes(message, 'big')
+        r_inv = pow(r, -1, CURVE_N)
+        # Q = r^-1 (sR - eG), both multiplications done in one pass
+        point = Secp256k1.double_mul(s * r_inv % CURVE_N, (x, y, 1), -e * r_inv % CURVE_N, CURVE_G)
+        affine = Secp256k1.to_affine(point)
+        if affine is None:
+            raise ValueError("bad signature")
+        return bytes([2 + (affine[1] & 1)]) + affine[0].to_bytes(32, 'big')
+
+class Bech32:
+    @staticmethod
+    def polymod(values: List[int]) -> int:
+        chk = 1
+        for value in values:
+            top = chk >> 25
+            chk = (chk & 0x1ffffff) << 5 ^ value
+            for i in range(5):
+                if (top >> i) & 1:
+                    chk ^= BECH32_GENERATOR[i]
+        return chk
+
+    @staticmethod
+    def hrp_expand(hrp: str) -> List[int]:
+        return [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+
+class Secp256k1:
+    """
+    Minimal jacobian-coordinate arithmetic, enough for public key recovery
+        points are (x, y, z) tuples, z == 0 is the point at infinity
+    """
+    @staticmethod
+    def double(point: Tuple[int, int, int]) -> Tuple[int, int, int]:
+        x, y, z = point
+        if z == 0 or y == 0:
+            return (0, 0, 0)
+        ysq = y * y % CURVE_P
+        s = 4 * x * ysq % CURVE_P
+        m = 3 * x * x % CURVE_P
+        nx = (m * m - 2 * s) % CURVE_P
+        ny = (m * (s - nx) - 8 * ysq * ysq) % CURVE_P
+        nz = 2 * y * z % CURVE_P
+        return (nx, ny, nz)
+
+    @staticmethod
+    def add(p: Tuple[int, int, int], q: Tuple[int, int, int]) -> Tuple[int, int, int]:
+        if p[2] == 0:
+            return q
+        if q[2] == 0:
+            return p
+        pz2 = p[2] * p[2] % CURVE_P
+        qz2 = q[2] * q[2] % CURVE_P
+        u1 = p[0] * qz2 % CURVE_P
+        u2 = q[0] * pz2 % CURVE_P
+        s1 = p[1] * qz2 * q[2] % CURVE_P
+        s2 = q[1] * pz2 * p[2] % CURVE_P
+        if u1 == u2:
+            return Secp256k1.double(p) if s1 == s2 else (0, 0, 0)
+        h = u2 - u1
+        r = s2 - s1
+        h2 = h * h % CURVE_P
+        h3 = h * h2 % CURVE_P
+        u1h2 = u1 * h2 % CURVE_P
+        nx = (r * r - h3 - 2 * u1h2) % CURVE_P
+        ny = (r * (u1h2 - nx) - s1 * h3) % CURVE_P
+        nz = h * p[2] * q[2] % CURVE_P
+        return (nx, ny, nz)
+
+    @staticmethod
+    def double_mul(a: int, p: Tuple[int, int, int], b: int, q: Tuple[int, int, int]) -> Tuple[int, int, int]:
+        """a*p + b*q with Shamir's trick"""
+        pq = Secp256k1.add(p, q)
+        result = (0, 0, 0)
+        for i in range(max(a.bit_length(), b.bit_length()) - 1, -1, -1):
+            result = Secp256k1.double(result)
+            bits = ((a >> i) & 1, (b >> i) & 1)
+            if bits == (1, 1):
+                result = Secp256k1.add(result, pq)
+            elif bits == (1, 0):
+                result = Secp256k1.add(result, p)
+            elif bits == (0, 1):
+                result = Secp256k1.add(result, q)
+        return result
+
+    @staticmethod
+    def to_affine(point: Tuple[int, int, int]) -> Tuple[int, int] | None:
+        if point[2] == 0:
+            return None
+        z_inv = pow(point[2], -1, CURVE_P)
+        z_inv2 = z_inv * z_inv % CURVE_P
+        return (point[0] * z_inv2 % CURVE_P, point[1] * z_inv2 * z_inv % CURVE_P)
@@ -0,0 +1,152 @@
+"""
+channel_cache.py
+---
+In-memory view of a node's channels kept current by SubscribeChannelEvents
+usage: Lnd.use_channel_cache() so channel reads stop re-downloading ListChannels
+"""
+import time
+import threading
+from grpc_generated import lightning_pb2 as ln
+from bitcoin_lightning_node import ActiveOpenChannel, PendingOpenChannel
+from subscription import Subscription
+from typing import Dict, List, TYPE_CHECKING
+from result import Result, Ok
+if TYPE_CHECKING:
+    from lnd import Lnd
+
+BALANCE_MAX_AGE_SECS = 60 # channel events don't carry balance changes, reload at least this often
+
+class ChannelCache:
+    """
+    Seeded from ListChannels and PendingChannels, then updated from channel events
+        lookups by chan_id, channel_point or peer pubkey are dict reads
+        local balances move with every HTLC and channel events don't carry them,
+        so a read reloads ListChannels once the snapshot is older than `max_age_secs`
+        (None serves the balances of the last reload until the stream reconnects)
+        a reload can run on a reader thread, events that land meanwhile are replayed over it
+    """
+    def __init__(self, node: 'Lnd', max_age_secs: float | None = BALANCE_MAX_AGE_SECS) -> None:
+        self.node = node
+        self.max_age_secs = max_age_secs
+        self.lock = threading.Lock()
+        self.by_chan_id: Dict[int, ActiveOpenChannel] = {}
+        self.by_channel_point: Dict[str, ActiveOpenChannel] = {}
+        self.by_peer: Dict[str, Dict[str, ActiveOpenChannel]] = {}
+        self.pending: Dict[str, PendingOpenChannel] = {}
+        self.synced_at = 0.0
+        self.resyncs_in_flight = 0
+        self.missed: List[ln.ChannelEventUpdate] = [] # events seen while a resync is in flight
+        self.subscription = Subscription(
+            f"{node.alias}-channel-events",
+            lambda: node.stub.SubscribeChannelEvents(ln.ChannelEventSubscription()),
+            self.on_event,
+            self.resync
+        )
+
+    def start(self, timeout: float | None = None) -> bool:
+        self.subscription.start()
+        return self.subscription.wait_synced(timeout)
+
+    def stop(self) -> None:
+        self.subscription.stop()
+
+    def resync(self) -> None:
+        """reload from ListChannels on any thread, channel events applied meanwhile are replayed over it"""
+        with self.lock:
+            self.resyncs_in_flight += 1
+        try:
+            channels = self.node.stub.ListChannels(ln.ListChannelsRequest()).channels
+            pending = self.node.stub.PendingChannels(ln.PendingChannelsRequest()).pending_open_channels
+        except BaseException:
+            with self.lock:
+                self.end_resync()
+            raise
+        with self.lock:
+            self.by_chan_id = {}
+            self.by_channel_point = {}
+            self.by_peer = {}
+            for chan in channels:
+                self.add(self.node.to_active_open_channel(chan))
+            self.pending = {chan.channel.channel_point: self.node.to_pending_open_channel(chan) for chan in pending}
+            is_pending_stale = False
+            for update in self.missed:
+                is_pending_stale |= self.apply_event(update)
+            self.synced_at = time.monotonic()
+            self.end_resync()
+        if is_pending_stale:
+            self.resync_pending()
+
+    def end_resync(self) -> None:
+        self.resyncs_in_flight -= 1
+        if self.resyncs_in_flight == 0:
+            self.missed = []
+
+    def resync_pending(self) -> None:
+        pending = self.node.stub.PendingChannels(ln.PendingChannelsRequest()).pending_open_channels
+        with self.lock:
+            self.pending = {chan.channel.channel_point: self.node.to_pending_open_channel(chan) for chan in pending}
+
+    def add(self, chan: ActiveOpenChannel) -> None:
+        self.by_chan_id[int(chan.channel_id)] = chan
+        self.by_channel_point[chan.channel_point] = chan
+        self.by_peer.setdefault(chan.peer_pubkey, {})[chan.channel_point] = chan
+
+    def remove(self, channel_point: str) -> None:
+        chan = self.by_channel_point.pop(channel_point, None)
+        if chan is None:
+            return
+        self.by_chan_id.pop(int(chan.channel_id), None)
+        peer_chans = self.by_peer.get(chan.peer_pubkey, {})
+        peer_chans.pop(channel_point, None)
+        if not peer_chans:
+            self.by_peer.pop(chan.peer_pubkey, None)
+
+    def apply_event(self, update: ln.ChannelEventUpdate) -> bool:
+        """apply one event with the lock held, True when the pending set must be fetched again"""
+        if update.type == ln.ChannelEventUpdate.OPEN_CHANNEL:
+            chan = self.node.to_active_open_channel(update.open_channel)
+            self.pending.pop(chan.channel_point, None)
+            self.add(chan)
+        elif update.type == ln.ChannelEventUpdate.CLOSED_CHANNEL:
+            self.remove(update.closed_channel.channel_point)
+            # a funding that never confirmed closes straight out of the pending set
+            self.pending.pop(update.closed_channel.channel_point, None)
+        elif update.type == ln.ChannelEventUpdate.PENDING_OPEN_CHANNEL:
+            # the event only carries the outpoint, fetch the pending set (small) for the rest
+            return True
+        return False
+
+    def on_event(self, update: ln.ChannelEventUpdate) -> None:
+        with self.lock:
+            is_pending_stale = self.apply_event(update)
+            if self.resyncs_in_flight:
+                self.missed.append(update)
+        if is_pending_stale:
+            self.resync_pending()
+
+    def check_age(self) -> None:
+        # a read before the first sync (stream not up yet) loads instead of returning nothing
+        if self.synced_at == 0 or (self.max_age_secs is not None and time.monotonic() - self.synced_at > self.max_age_secs):
+            self.resync()
+
+    def get_opened_channels(self) -> Result[List[ActiveOpenChannel], str]:
+        self.check_age()
+        with self.lock:
+            return Ok(list(self.by_chan_id.values()))
+
+    def get_pending_open_channels(self) -> Result[List[PendingOpenChannel], str]:
+        self.check_age()
+        with self.lock:
+            return Ok(list(self.pending.values()))
+
+    def get_by_chan_id(self, chan_id: int) -> ActiveOpenChannel | None:
+        with self.lock:
+            return self.by_chan_id.get(int(chan_id))
+
+    def get_by_channel_point(self, channel_point: str) -> ActiveOpenChannel | None:
+        with self.lock:
+            return self.by_channel_point.get(channel_point)
+
+    def get_by_peer(self, peer_pubkey: str) -> List[ActiveOpenChannel]:
+        with self.lock:
+            return list(self.by_peer.get(peer_pubkey, {}).values())
@@ -7,6 +7,7 @@ usage: for the things that never change
 COIN_SATS = 100_000_000
 MILLION = 1_000_000
 SAT_MSATS = 1_000
+MIN_CHANNEL_SATS = 20_000 # lnd default minchansize
 
 LOG_ERROR = "ERROR " # pad with space
 LOG_INFO = "INFO  " 
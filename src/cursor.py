@@ -0,0 +1,29 @@
+"""
+cursor.py
+---
+Persisted resume point for paged RPCs
+usage: FileCursor('payments.cursor') remembers the last index_offset a consumer fully processed
+"""
+import os
+import json
+
+class FileCursor:
+    """
+    One integer offset in a json file, replaced atomically on every save()
+        a missing or unreadable file starts from 0
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def load(self) -> int:
+        try:
+            with open(self.path) as f:
+                return int(json.load(f)["index_offset"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0
+
+    def save(self, index_offset: int) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"index_offset": index_offset}, f)
+        os.replace(tmp_path, self.path)
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+fee_optimizer.py
+---
+Tune the ppm fee of every channel from its balance and recent forwarding flow
+usage: FeeOptimizer(lnd, ForwardingHistory(lnd, 'forwards/')).run() on a schedule, is_dry_run=True to only log the proposals
+    every run appends new forwards to the history and reads balances at most `balance_max_age_secs` old
+"""
+import time
+import numpy as np
+import numpy.typing as npt
+from box import Box
+from bitcoin_lightning_node import ChannelFeePolicy
+from forwarding_history import ForwardingHistory
+from channel_cache import BALANCE_MAX_AGE_SECS
+from console import console
+from const import LOG_GAP, LOG_INFO
+from typing import List, TYPE_CHECKING
+from result import Result, Ok, Err
+if TYPE_CHECKING:
+    from lnd import Lnd
+
+class FeeOptimizer:
+    """
+    Balance-ratio model with a flow term, evaluated for all channels at once
+        a channel holding less local balance than `target_ratio` of its capacity gets pricier,
+        one holding more gets cheaper, by at most `step` (a fraction of the current ppm) per cycle
+        a channel with more local balance than the target that forwarded nothing out
+        during the last `window_secs` is discounted by another `step`
+        changes smaller than `min_change_ppm` are dropped so gossip isn't churned for noise
+        with a channel cache, balances are reloaded only once the cache is older than `balance_max_age_secs`
+    """
+    def __init__(
+            self,
+            node: 'Lnd',
+            history: ForwardingHistory,
+            window_secs: float = 7 * 24 * 3600,
+            target_ratio: float = 0.5,
+            step: float = 0.2,
+            min_ppm: int = 1,
+            max_ppm: int = 5000,
+            min_change_ppm: int = 5,
+            is_dry_run: bool = False,
+            balance_max_age_secs: float = BALANCE_MAX_AGE_SECS,
+    ) -> None:
+        self.node = node
+        self.history = history
+        self.window_secs = window_secs
+        self.target_ratio = target_ratio
+        self.step = step
+        self.min_ppm = min_ppm
+        self.max_ppm = max_ppm
+        self.min_change_ppm = min_change_ppm
+        self.is_dry_run = is_dry_run
+        self.balance_max_age_secs = balance_max_age_secs
+        self.log = console.log
+        self.logs = Box({
+            "propose": {
+                "ok": LOG_GAP.join(["{}", "propose_fee", "channel_point: {}, local_ratio: {:.2f}, out_msat: {}, ppm_fee: {} -> {}"]),
+            },
+            "run": {
+                "ok": LOG_GAP.join(["{}", "optimize_fees", "proposed: {}, dry_run: {}"]),
+            }
+        })
+
+    def model(self, ppm: npt.NDArray[np.int64], local_ratio: npt.NDArray[np.float64], out_msat: npt.NDArray[np.uint64]) -> npt.NDArray[np.int64]:
+        """new ppm per channel, all arguments are aligned per-channel arrays"""
+        # -1 (full) .. +1 (empty) relative to the target balance
+        pressure = np.clip((self.target_ratio - local_ratio) / max(self.target_ratio, 1 - self.target_ratio), -1, 1)
+        multiplier = 1 + self.step * pressure
+        is_idle = (out_msat == 0) & (local_ratio > self.target_ratio)
+        multiplier[is_idle] *= 1 - self.step
+        # a zero fee would never move, price it from min_ppm instead
+        new_ppm: npt.NDArray[np.int64] = np.clip(np.rint(np.maximum(ppm, self.min_ppm) * multiplier), self.min_ppm, self.max_ppm).astype(np.int64)
+        return new_ppm
+
+    def propose(self) -> Result[List[ChannelFeePolicy], str]:
+        # an empty or stale history would make every channel look idle and cut its fee
+        ingested = self.history.ingest()
+        if isinstance(ingested, Err):
+            return ingested
+        cache = self.node.channel_cache
+        # channel events don't carry balances, don't reprice from a snapshot older than the bound
+        if cache is not None and time.monotonic() - cache.synced_at > self.balance_max_age_secs:
+            cache.resync()
+        chans = self.node.get_opened_channels()
+        if isinstance(chans, Err):
+            return chans
+        chans_list = chans.unwrap()
+        policies_res = self.node.get_fee_policies()
+        if isinstance(policies_res, Err):
+            return Err(policies_res.unwrap_err())
+        policies = policies_res.unwrap()
+        chans_list = [chan for chan in chans_list if chan.channel_point in policies]
+        if not chans_list:
+            return Ok([])
+        chan_ids = np.array([int(chan.channel_id) for chan in chans_list], dtype=np.uint64)
+        capacity = np.array([chan.capacity for chan in chans_list], dtype=np.float64)
+        local = np.array([chan.local_balance for chan in chans_list], dtype=np.float64)
+        ppm = np.array([policies[chan.channel_point][1] for chan in chans_list], dtype=np.int64)
+        # outgoing volume over the window, aligned to chan_ids
+        flow_ids, flow_msat = self.history.aggregate("amt_out_msat", "chan_id_out", time.time() - self.window_secs)
+        out_msat = np.zeros(len(chans_list), dtype=np.uint64)
+        if len(flow_ids):
+            pos = np.clip(np.searchsorted(flow_ids, chan_ids), 0, len(flow_ids) - 1)
+            has_flow = flow_ids[pos] == chan_ids
+            out_msat[has_flow] = flow_msat[pos[has_flow]]
+        local_ratio = local / np.maximum(capacity, 1)
+        new_ppm = self.model(ppm, local_ratio, out_msat)
+        proposals = []
+        for i in np.flatnonzero(np.abs(new_ppm - ppm) >= self.min_change_ppm):
+            chan = chans_list[i]
+            base_fee, _, cltv_delta = policies[chan.channel_point]
+            self.log(LOG_INFO, self.logs.propose.ok.format(self.node.alias, chan.channel_point, local_ratio[i], out_msat[i], ppm[i], new_ppm[i]))
+            proposals.append(ChannelFeePolicy(chan.channel_point, base_fee, int(new_ppm[i]), cltv_delta))
+        return Ok(proposals)
+
+    def run(self) -> Result[int, str]:
+        """Ok(number of channels changed), or proposed when dry running"""
+        proposals = self.propose()
+        if isinstance(proposals, Err):
+            return proposals
+        self.log(LOG_INFO, self.logs.run.ok.format(self.node.alias, len(proposals.unwrap()), self.is_dry_run))
+        if self.is_dry_run or not proposals.unwrap():
+            return Ok(len(proposals.unwrap()))
+        return self.node.update_fee_policies(proposals.unwrap())
\ No newline at end of file
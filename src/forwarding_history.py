@@ -0,0 +1,192 @@
+"""
+forwarding_history.py
+---
+Incremental ForwardingHistory ingest into an append-only columnar store
+usage: ForwardingHistory(lnd, 'forwards/').ingest() on a schedule, then revenue()/volume() over any window
+"""
+import os
+import re
+import grpc
+import numpy as np
+import numpy.typing as npt
+from box import Box
+from grpc_generated import lightning_pb2 as ln
+from console import console
+from const import LOG_GAP, LOG_ERROR, LOG_INFO
+from typing import Dict, List, Tuple, TYPE_CHECKING
+from result import Result, Ok, Err
+if TYPE_CHECKING:
+    from lnd import Lnd
+
+COLUMNS: Dict[str, type] = {
+    "timestamp_ns": np.uint64,
+    "chan_id_in": np.uint64,
+    "chan_id_out": np.uint64,
+    "amt_in_msat": np.uint64,
+    "amt_out_msat": np.uint64,
+    "fee_msat": np.uint64,
+}
+MAX_PAGE_SIZE = 50_000 # LND returns at most this many events per ForwardingHistory call
+CHUNK_NAME = re.compile(r"^forwards-(\d{12})-(\d{12})\.npz$")
+
+class ForwardingHistory:
+    """
+    Page through ForwardingHistory by index offset, `page_size` events per call,
+        and append them to `directory` as chunks of up to `chunk_rows` events
+        `page_size` is capped at MAX_PAGE_SIZE, a shorter page then reliably means the end
+        chunk files are named by the offsets they cover, so the next ingest() resumes
+        after the newest chunk and a crash mid-write never leaves a partial chunk behind
+        new events are appended to the newest chunk until it holds `chunk_rows`, the grown
+        chunk replaces it under its new name, so frequent ingests don't pile up tiny files
+        loaded columns are extended in place (capacity doubles), never reread from disk
+    """
+    def __init__(self, node: 'Lnd', directory: str, page_size: int = 50_000, chunk_rows: int = 1_000_000) -> None:
+        self.node = node
+        self.directory = directory
+        self.page_size = min(page_size, MAX_PAGE_SIZE)
+        self.chunk_rows = chunk_rows
+        self.buffers: Dict[str, npt.NDArray[np.uint64]] | None = None # every chunk concatenated plus spare capacity, built on first read
+        self.rows = 0 # rows of `buffers` in use
+        os.makedirs(directory, exist_ok=True)
+        self.log = console.log
+        self.logs = Box({
+            "ingest": {
+                "ok": LOG_GAP.join(["{}", "ingest_forwards", "events: {}, index_offset: {}"]),
+                "err": LOG_GAP.join(["{}", "ingest_forwards", "{}"])
+            }
+        })
+
+    def chunks(self) -> List[Tuple[int, int, str]]:
+        """(first offset, end offset, path) of every chunk, oldest first"""
+        found: Dict[int, Tuple[int, int, str]] = {}
+        for name in os.listdir(self.directory):
+            match = CHUNK_NAME.match(name)
+            if match:
+                chunk = (int(match.group(1)), int(match.group(2)), os.path.join(self.directory, name))
+                # a crash between writing a grown tail and removing the old one leaves both
+                previous = found.get(chunk[0])
+                if previous is not None:
+                    os.remove(min(previous, chunk)[2])
+                    chunk = max(previous, chunk)
+                found[chunk[0]] = chunk
+        return sorted(found.values())
+
+    def index_offset(self) -> int:
+        chunks = self.chunks()
+        return chunks[-1][1] if chunks else 0
+
+    def write_chunk(self, first_offset: int, end_offset: int, pages: List[Dict[str, npt.NDArray[np.uint64]]], replaces: str | None = None) -> None:
+        path = os.path.join(self.directory, f"forwards-{first_offset:012d}-{end_offset:012d}.npz")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **{name: np.concatenate([page[name] for page in pages]) for name in COLUMNS})
+        os.replace(tmp_path, path)
+        if replaces is not None and replaces != path:
+            os.remove(replaces)
+
+    def extend(self, pages: List[Dict[str, npt.NDArray[np.uint64]]]) -> None:
+        """append rows just written to the loaded columns, nothing to do before the first load()"""
+        if self.buffers is None:
+            return
+        new_rows = sum(len(page["timestamp_ns"]) for page in pages)
+        capacity = len(self.buffers["timestamp_ns"])
+        if self.rows + new_rows > capacity:
+            capacity = max(2 * capacity, self.rows + new_rows)
+            for name, buffer in self.buffers.items():
+                grown = np.empty(capacity, dtype=buffer.dtype)
+                grown[:self.rows] = buffer[:self.rows]
+                self.buffers[name] = grown
+        for page in pages:
+            rows = len(page["timestamp_ns"])
+            for name in COLUMNS:
+                self.buffers[name][self.rows:self.rows + rows] = page[name]
+            self.rows += rows
+
+    @staticmethod
+    def to_columns(events: List[ln.ForwardingEvent]) -> Dict[str, npt.NDArray[np.uint64]]:
+        return {name: np.fromiter((getattr(event, name) for event in events), dtype=dtype, count=len(events)) for name, dtype in COLUMNS.items()}
+
+    def ingest(self) -> Result[int, str]:
+        """Ok(number of new events), fetches everything after the newest chunk"""
+        first_offset = offset = 0
+        pages: List[Dict[str, npt.NDArray[np.uint64]]] = [] # rows of the chunk being built, stored ones included
+        new_pages: List[Dict[str, npt.NDArray[np.uint64]]] = []
+        rows = 0
+        tail_path: str | None = None
+        chunks = self.chunks()
+        if chunks:
+            offset = chunks[-1][1]
+            first_offset = offset
+            if chunks[-1][1] - chunks[-1][0] < self.chunk_rows:
+                first_offset, _, tail_path = chunks[-1]
+                with np.load(tail_path) as tail:
+                    pages.append({name: tail[name] for name in COLUMNS})
+                rows = len(pages[0]["timestamp_ns"])
+        ingested = 0
+        try:
+            while True:
+                res = self.node.stub.ForwardingHistory(ln.ForwardingHistoryRequest(
+                    start_time=0,
+                    index_offset=offset,
+                    num_max_events=self.page_size
+                ))
+                if res.forwarding_events:
+                    page = self.to_columns(res.forwarding_events)
+                    pages.append(page)
+                    new_pages.append(page)
+                    rows += len(res.forwarding_events)
+                    offset = res.last_offset_index
+                if new_pages and (rows >= self.chunk_rows or len(res.forwarding_events) < self.page_size):
+                    self.write_chunk(first_offset, offset, pages, tail_path)
+                    self.extend(new_pages)
+                    ingested += sum(len(page["timestamp_ns"]) for page in new_pages)
+                    first_offset, pages, new_pages, rows, tail_path = offset, [], [], 0, None
+                if len(res.forwarding_events) < self.page_size:
+                    break
+        except grpc.RpcError as e:
+            # whole chunks already written are kept, the next ingest() resumes after them
+            self.log(LOG_ERROR, self.logs.ingest.err.format(self.node.alias, e.details()))
+            return Err(e.details())
+        self.log(LOG_INFO, self.logs.ingest.ok.format(self.node.alias, ingested, offset))
+        return Ok(ingested)
+
+    def load(self) -> Dict[str, npt.NDArray[np.uint64]]:
+        """all stored events as one array per column, in offset order"""
+        if self.buffers is None:
+            parts: Dict[str, List[npt.NDArray[np.uint64]]] = {name: [np.empty(0, dtype=dtype)] for name, dtype in COLUMNS.items()}
+            for _, _, path in self.chunks():
+                with np.load(path) as chunk:
+                    for name in COLUMNS:
+                        parts[name].append(chunk[name])
+            self.buffers = {name: np.concatenate(arrays) for name, arrays in parts.items()}
+            self.rows = len(self.buffers["timestamp_ns"])
+        return {name: buffer[:self.rows] for name, buffer in self.buffers.items()}
+
+    def aggregate(self, value: str, key: str, start_secs: float = 0, end_secs: float | None = None) -> Tuple[npt.NDArray[np.uint64], npt.NDArray[np.uint64]]:
+        """(channel ids, summed `value`) of events in [start_secs, end_secs) grouped by channel column `key`"""
+        columns = self.load()
+        timestamps = columns["timestamp_ns"]
+        in_window = timestamps >= np.uint64(start_secs * 1e9)
+        if end_secs is not None:
+            in_window &= timestamps < np.uint64(end_secs * 1e9)
+        keys = columns[key][in_window]
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        if len(keys) == 0:
+            return keys, np.empty(0, dtype=np.uint64)
+        # sort by channel and sum each run, exact in uint64 unlike a float bincount
+        starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+        return keys[starts], np.add.reduceat(columns[value][in_window][order], starts)
+
+    def revenue(self, start_secs: float = 0, end_secs: float | None = None) -> Dict[int, int]:
+        """fee_msat earned per outgoing channel"""
+        chan_ids, sums = self.aggregate("fee_msat", "chan_id_out", start_secs, end_secs)
+        return dict(zip(chan_ids.tolist(), sums.tolist()))
+
+    def volume(self, start_secs: float = 0, end_secs: float | None = None, is_outgoing: bool = True) -> Dict[int, int]:
+        """msat forwarded per outgoing (or incoming) channel"""
+        if is_outgoing:
+            chan_ids, sums = self.aggregate("amt_out_msat", "chan_id_out", start_secs, end_secs)
+        else:
+            chan_ids, sums = self.aggregate("amt_in_msat", "chan_id_in", start_secs, end_secs)
+        return dict(zip(chan_ids.tolist(), sums.tolist()))
\ No newline at end of file
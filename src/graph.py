@@ -0,0 +1,310 @@
+"""
+graph.py
+---
+Compact in-memory lightning network graph
+usage: Lnd.use_graph() loads it once (from a snapshot when possible) and keeps it current from SubscribeChannelGraph
+"""
+import os
+import struct
+import time
+import threading
+from array import array
+from grpc_generated import lightning_pb2 as ln
+from subscription import Subscription
+from typing import Any, Callable, Dict, List, Sequence, TYPE_CHECKING
+if TYPE_CHECKING:
+    from lnd import Lnd
+
+POLICY_KNOWN = 1
+POLICY_DISABLED = 2
+
+class EdgePolicy:
+    """
+    Type used in GraphChannel, the routing policy one side advertises for a channel
+    """
+    def __init__(
+            self,
+            base_fee_msat: int,
+            ppm_fee: int,
+            cltv_delta: int,
+            min_htlc_msat: int,
+            max_htlc_msat: int,
+            is_disabled: bool,
+    ) -> None:
+        self.base_fee_msat = base_fee_msat
+        self.ppm_fee = ppm_fee
+        self.cltv_delta = cltv_delta
+        self.min_htlc_msat = min_htlc_msat
+        self.max_htlc_msat = max_htlc_msat
+        self.is_disabled = is_disabled
+
+    def __str__(self) -> str:
+        return f"EdgePolicy(base_fee_msat={self.base_fee_msat}, ppm_fee={self.ppm_fee}, cltv_delta={self.cltv_delta}, min_htlc_msat={self.min_htlc_msat}, max_htlc_msat={self.max_htlc_msat}, is_disabled={self.is_disabled})"
+
+class GraphChannel:
+    """
+    Type used in ChannelGraph.get_channels(), seen from the side of the queried node
+    """
+    def __init__(
+            self,
+            channel_id: int,
+            peer_pubkey: str,
+            capacity: int,
+            outgoing_policy: EdgePolicy | None,
+            incoming_policy: EdgePolicy | None,
+    ) -> None:
+        self.channel_id = channel_id
+        self.peer_pubkey = peer_pubkey
+        self.capacity = capacity
+        self.outgoing_policy = outgoing_policy # set by the queried node
+        self.incoming_policy = incoming_policy # set by the peer
+
+    def __str__(self) -> str:
+        return f"GraphChannel(channel_id={self.channel_id}, peer_pubkey={self.peer_pubkey}, capacity={self.capacity}, outgoing_policy={self.outgoing_policy}, incoming_policy={self.incoming_policy})"
+
+class GraphTables:
+    """
+    Read-side queries shared by every holder of the node/edge/policy tables
+        subclasses provide find_node() and edges_of()
+    """
+    pubkeys: Sequence[str]
+    aliases: Sequence[str]
+    addresses: Sequence[str]
+    chan_ids: Sequence[int]
+    node1: Sequence[int]
+    node2: Sequence[int]
+    capacity: Sequence[int]
+    is_open: Sequence[int]
+    base_fee_msat: Sequence[int]
+    ppm_fee: Sequence[int]
+    cltv_delta: Sequence[int]
+    min_htlc_msat: Sequence[int]
+    max_htlc_msat: Sequence[int]
+    policy_flags: Sequence[int]
+    lock: Any
+
+    def find_node(self, pubkey: str) -> int | None:
+        raise NotImplementedError
+
+    def edges_of(self, node_id: int) -> Sequence[int]:
+        raise NotImplementedError
+
+    def get_policy(self, slot: int) -> EdgePolicy | None:
+        if not self.policy_flags[slot] & POLICY_KNOWN:
+            return None
+        return EdgePolicy(
+            base_fee_msat=self.base_fee_msat[slot],
+            ppm_fee=self.ppm_fee[slot],
+            cltv_delta=self.cltv_delta[slot],
+            min_htlc_msat=self.min_htlc_msat[slot],
+            max_htlc_msat=self.max_htlc_msat[slot],
+            is_disabled=bool(self.policy_flags[slot] & POLICY_DISABLED)
+        )
+
+    def get_channels(self, pubkey: str) -> List[GraphChannel]:
+        """open channels of `pubkey` with the policies of both sides"""
+        with self.lock:
+            node_id = self.find_node(pubkey)
+            if node_id is None:
+                return []
+            chans = []
+            for edge_id in self.edges_of(node_id):
+                if not self.is_open[edge_id]:
+                    continue
+                is_node1 = self.node1[edge_id] == node_id
+                peer = self.node2[edge_id] if is_node1 else self.node1[edge_id]
+                own_slot = 2 * edge_id + int(not is_node1)
+                peer_slot = 2 * edge_id + int(is_node1)
+                chans.append(GraphChannel(
+                    channel_id=self.chan_ids[edge_id],
+                    peer_pubkey=self.pubkeys[peer],
+                    capacity=self.capacity[edge_id],
+                    outgoing_policy=self.get_policy(own_slot),
+                    incoming_policy=self.get_policy(peer_slot)
+                ))
+            return chans
+
+    def get_alias(self, pubkey: str) -> str | None:
+        node_id = self.find_node(pubkey)
+        return None if node_id is None else self.aliases[node_id]
+
+    def get_address(self, pubkey: str) -> str | None:
+        node_id = self.find_node(pubkey)
+        return None if node_id is None else self.addresses[node_id]
+
+class ChannelGraph(GraphTables):
+    """
+    Node and edge tables backed by typed arrays, nodes are referred to by integer id
+        edge e connects node1[e] < node2[e] (pubkey order, as in BOLT7)
+        policy arrays hold two slots per edge: 2*e is node1's policy, 2*e+1 is node2's
+        closed channels are tombstoned in `is_open` rather than moved
+    """
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # node table
+        self.pubkeys: List[str] = []
+        self.aliases: List[str] = []
+        self.addresses: List[str] = []
+        self.node_ids: Dict[str, int] = {}
+        self.node_edges: List[array[int]] = [] # node id -> edge ids
+        # edge table
+        self.chan_ids: array[int] = array('Q')
+        self.node1: array[int] = array('I')
+        self.node2: array[int] = array('I')
+        self.capacity: array[int] = array('q')
+        self.is_open: array[int] = array('B')
+        self.edge_ids: Dict[int, int] = {}
+        # policy table, two slots per edge
+        self.base_fee_msat: array[int] = array('q')
+        self.ppm_fee: array[int] = array('q')
+        self.cltv_delta: array[int] = array('I')
+        self.min_htlc_msat: array[int] = array('q')
+        self.max_htlc_msat: array[int] = array('Q')
+        self.policy_flags: array[int] = array('B')
+        self.synced_at = 0.0
+        self.subscription: Subscription | None = None
+        self.node_listeners: List[Callable[[str, str], None]] = [] # (pubkey, alias) of every node announcement
+        self.sync_listeners: List[Callable[[], None]] = [] # called after every (re)sync with the stream
+
+    def add_node(self, pubkey: str, alias: str = '', address: str = '') -> int:
+        node_id = self.node_ids.get(pubkey)
+        if node_id is None:
+            node_id = len(self.pubkeys)
+            self.node_ids[pubkey] = node_id
+            self.pubkeys.append(pubkey)
+            self.aliases.append(alias)
+            self.addresses.append(address)
+            self.node_edges.append(array('I'))
+        else:
+            if alias:
+                self.aliases[node_id] = alias
+            if address:
+                self.addresses[node_id] = address
+        return node_id
+
+    def add_edge(self, chan_id: int, node1_pub: str, node2_pub: str, capacity: int) -> int:
+        edge_id = self.edge_ids.get(chan_id)
+        if edge_id is not None:
+            self.is_open[edge_id] = 1
+            if capacity:
+                self.capacity[edge_id] = capacity
+            return edge_id
+        if node2_pub < node1_pub:
+            node1_pub, node2_pub = node2_pub, node1_pub
+        node1, node2 = self.add_node(node1_pub), self.add_node(node2_pub)
+        edge_id = len(self.chan_ids)
+        self.edge_ids[chan_id] = edge_id
+        self.chan_ids.append(chan_id)
+        self.node1.append(node1)
+        self.node2.append(node2)
+        self.capacity.append(capacity)
+        self.is_open.append(1)
+        self.node_edges[node1].append(edge_id)
+        self.node_edges[node2].append(edge_id)
+        for policies in [self.base_fee_msat, self.ppm_fee, self.min_htlc_msat]:
+            policies.extend([0, 0])
+        self.cltv_delta.extend([0, 0])
+        self.max_htlc_msat.extend([0, 0])
+        self.policy_flags.extend([0, 0])
+        return edge_id
+
+    def set_policy(self, slot: int, policy: ln.RoutingPolicy) -> None:
+        self.base_fee_msat[slot] = policy.fee_base_msat
+        self.ppm_fee[slot] = policy.fee_rate_milli_msat
+        self.cltv_delta[slot] = policy.time_lock_delta
+        self.min_htlc_msat[slot] = policy.min_htlc
+        self.max_htlc_msat[slot] = policy.max_htlc_msat
+        self.policy_flags[slot] = POLICY_KNOWN | (POLICY_DISABLED if policy.disabled else 0)
+
+    def load(self, graph: ln.ChannelGraph) -> None:
+        """replace everything with a DescribeGraph response"""
+        fresh = ChannelGraph()
+        for node in graph.nodes:
+            fresh.add_node(node.pub_key, node.alias, node.addresses[0].addr if node.addresses else '')
+        for edge in graph.edges:
+            edge_id = fresh.add_edge(edge.channel_id, edge.node1_pub, edge.node2_pub, edge.capacity)
+            is_swapped = edge.node2_pub < edge.node1_pub
+            if edge.HasField('node1_policy'):
+                fresh.set_policy(2 * edge_id + int(is_swapped), edge.node1_policy)
+            if edge.HasField('node2_policy'):
+                fresh.set_policy(2 * edge_id + int(not is_swapped), edge.node2_policy)
+        fresh.synced_at = time.time()
+        with self.lock:
+            self.__dict__.update({k: v for k, v in fresh.__dict__.items() if k not in ['lock', 'subscription', 'node_listeners', 'sync_listeners']})
+
+    def on_update(self, update: ln.GraphTopologyUpdate) -> None:
+        with self.lock:
+            for node in update.node_updates:
+                address = node.node_addresses[0].addr if node.node_addresses else ''
+                self.add_node(node.identity_key, node.alias, address)
+                for listener in self.node_listeners:
+                    listener(node.identity_key, node.alias)
+            for chan in update.channel_updates:
+                edge_id = self.add_edge(chan.chan_id, chan.advertising_node, chan.connecting_node, chan.capacity)
+                is_node2 = chan.advertising_node > chan.connecting_node
+                self.set_policy(2 * edge_id + int(is_node2), chan.routing_policy)
+            for closed in update.closed_chans:
+                closed_id = self.edge_ids.get(closed.chan_id)
+                if closed_id is not None:
+                    self.is_open[closed_id] = 0
+
+    def find_node(self, pubkey: str) -> int | None:
+        return self.node_ids.get(pubkey)
+
+    def edges_of(self, node_id: int) -> Sequence[int]:
+        return self.node_edges[node_id]
+
+    def current_as_of(self) -> float:
+        """time up to which the graph is known complete, now while the stream is synced"""
+        if self.subscription is not None and self.subscription.is_synced.is_set():
+            return time.time()
+        return self.synced_at
+
+    def save(self, path: str) -> None:
+        from graph_snapshot import GraphSnapshot
+        GraphSnapshot.write(path, self)
+
+    def restore(self, path: str) -> bool:
+        from graph_snapshot import GraphSnapshot
+        if not os.path.exists(path):
+            return False
+        try:
+            snapshot = GraphSnapshot(path) # checks the section table against the file size
+        except (ValueError, struct.error, OSError):
+            return False # unreadable, older or foreign format, resync rebuilds it
+        try:
+            fresh = snapshot.to_channel_graph()
+        except (ValueError, IndexError):
+            return False # corrupt offsets or text inside a well-formed table
+        finally:
+            snapshot.close()
+        with self.lock:
+            self.__dict__.update({k: v for k, v in fresh.__dict__.items() if k not in ['lock', 'subscription', 'node_listeners', 'sync_listeners']})
+        return True
+
+    def start(self, node: 'Lnd', max_age_secs: float = 6 * 3600, timeout: float | None = None) -> bool:
+        """
+        follow SubscribeChannelGraph, on the first connect DescribeGraph is only pulled when
+            the restored snapshot was written more than `max_age_secs` ago,
+            every reconnect pulls it since updates sent while disconnected are lost
+        """
+        is_first_sync = True
+        def resync() -> None:
+            nonlocal is_first_sync
+            if not is_first_sync or time.time() - self.synced_at > max_age_secs:
+                self.load(node.stub.DescribeGraph(ln.ChannelGraphRequest()))
+            is_first_sync = False
+            for listener in self.sync_listeners:
+                listener()
+        self.subscription = Subscription(
+            f"{node.alias}-channel-graph",
+            lambda: node.stub.SubscribeChannelGraph(ln.GraphTopologySubscription()),
+            self.on_update,
+            resync
+        )
+        self.subscription.start()
+        return self.subscription.wait_synced(timeout)
+
+    def stop(self) -> None:
+        if self.subscription is not None:
+            self.subscription.stop()
@@ -0,0 +1,266 @@
+"""
+graph_snapshot.py
+---
+Versioned, memory-mappable on-disk format for the lightning network graph
+usage: GraphSnapshot.write(path, graph) after a sync, GraphSnapshot(path) to query it zero-copy at startup
+"""
+import os
+import sys
+import mmap
+import struct
+from array import array
+from grpc_generated import lightning_pb2 as ln
+from graph import ChannelGraph, GraphTables
+from typing import Any, Dict, Iterator, List, Sequence, Tuple, overload
+
+MAGIC = b'RAINGRPH'
+VERSION = 1
+PUBKEY_BYTES = 33
+ALIGN = 8
+# magic, version, little-endian flag, synced_at, node count, edge count
+HEADER = struct.Struct('<8sIId2Q')
+# name, typecode, fixed-width columns are laid out in this order, each 8-byte aligned
+SECTIONS: List[Tuple[str, str]] = [
+    # node table, sorted by pubkey so lookups are a binary search over the map
+    ("pubkeys", 'B'), # PUBKEY_BYTES per node
+    ("alias_offsets", 'I'), # nodes + 1 offsets into alias_blob
+    ("alias_blob", 'B'),
+    ("address_offsets", 'I'), # nodes + 1 offsets into address_blob
+    ("address_blob", 'B'),
+    ("node_edge_offsets", 'I'), # nodes + 1 offsets into node_edge_ids (CSR adjacency)
+    ("node_edge_ids", 'I'),
+    # edge table
+    ("chan_ids", 'Q'),
+    ("node1", 'I'),
+    ("node2", 'I'),
+    ("capacity", 'q'),
+    ("is_open", 'B'),
+    # policy table, two slots per edge as in ChannelGraph
+    ("base_fee_msat", 'q'),
+    ("ppm_fee", 'q'),
+    ("cltv_delta", 'I'),
+    ("min_htlc_msat", 'q'),
+    ("max_htlc_msat", 'Q'),
+    ("policy_flags", 'B'),
+]
+# offset and length in bytes of every section
+SECTION_TABLE = struct.Struct(f"<{2 * len(SECTIONS)}Q")
+
+class NoLock:
+    """
+    Stand-in for ChannelGraph.lock, a snapshot is read-only
+    """
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *args: Any) -> None:
+        return None
+
+class PubkeyTable(Sequence[str]):
+    """
+    Hex view over the packed pubkey column
+    """
+    def __init__(self, raw: memoryview) -> None:
+        self.raw = raw
+
+    def __len__(self) -> int:
+        return len(self.raw) // PUBKEY_BYTES
+
+    @overload
+    def __getitem__(self, node_id: int) -> str: ...
+    @overload
+    def __getitem__(self, node_id: slice) -> List[str]: ...
+    def __getitem__(self, node_id: int | slice) -> str | List[str]:
+        if isinstance(node_id, slice):
+            return [self[i] for i in range(*node_id.indices(len(self)))]
+        start = node_id * PUBKEY_BYTES
+        return self.raw[start:start + PUBKEY_BYTES].hex()
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[node_id] for node_id in range(len(self)))
+
+class StringTable(Sequence[str]):
+    """
+    utf-8 strings packed into one blob, string i is blob[offsets[i]:offsets[i + 1]]
+    """
+    def __init__(self, offsets: memoryview, blob: memoryview) -> None:
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @overload
+    def __getitem__(self, i: int) -> str: ...
+    @overload
+    def __getitem__(self, i: slice) -> List[str]: ...
+    def __getitem__(self, i: int | slice) -> str | List[str]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[i] for i in range(len(self)))
+
+class GraphSnapshot(GraphTables):
+    """
+    Read-only graph served straight from an mmap of a snapshot file
+        columns are memoryviews over the map, nothing is parsed or copied on open,
+        so it answers the same queries as ChannelGraph (and feeds PeerScorer) right away
+        node ids are pubkey order and differ from the ChannelGraph the file was written from
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = NoLock()
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.sections: Dict[str, memoryview] = {}
+        try:
+            self.open_sections()
+        except ValueError:
+            self.close()
+            raise
+        for name in ["chan_ids", "node1", "node2", "capacity", "is_open", "base_fee_msat", "ppm_fee", "cltv_delta", "min_htlc_msat", "max_htlc_msat", "policy_flags"]:
+            setattr(self, name, self.sections[name])
+        self.pubkeys = PubkeyTable(self.sections["pubkeys"])
+        self.aliases = StringTable(self.sections["alias_offsets"], self.sections["alias_blob"])
+        self.addresses = StringTable(self.sections["address_offsets"], self.sections["address_blob"])
+
+    def open_sections(self) -> None:
+        """check the header and section table against the file, ValueError for anything truncated or corrupt"""
+        path = self.path
+        if len(self.mm) < HEADER.size + SECTION_TABLE.size:
+            raise ValueError(f"{path} is too short for a graph snapshot")
+        magic, version, is_little_endian, self.synced_at, self.num_nodes, self.num_edges = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a graph snapshot")
+        if version != VERSION:
+            raise ValueError(f"{path} has snapshot version {version}, expected {VERSION}")
+        if bool(is_little_endian) != (sys.byteorder == 'little'):
+            raise ValueError(f"{path} was written on a host with different byte order")
+        table = SECTION_TABLE.unpack_from(self.mm, HEADER.size)
+        with memoryview(self.mm) as view: # released even on error, so close() can unmap
+            for i, (name, typecode) in enumerate(SECTIONS):
+                offset, length = table[2 * i], table[2 * i + 1]
+                itemsize = array(typecode).itemsize
+                if offset + length > len(self.mm) or offset % itemsize or length % itemsize:
+                    raise ValueError(f"{path} section {name} ({offset}+{length}) is out of bounds or misaligned")
+                self.sections[name] = view[offset:offset + length].cast(typecode) # type: ignore
+        # row counts must agree with the header, or lookups index past the end of a column
+        expected_rows = {"pubkeys": self.num_nodes * PUBKEY_BYTES, "chan_ids": self.num_edges, "node1": self.num_edges, "node2": self.num_edges, "capacity": self.num_edges, "is_open": self.num_edges}
+        expected_rows.update({name: self.num_nodes + 1 for name in ["alias_offsets", "address_offsets", "node_edge_offsets"]})
+        expected_rows.update({name: 2 * self.num_edges for name, _ in SECTIONS[12:]})
+        for name, rows in expected_rows.items():
+            if len(self.sections[name]) != rows:
+                raise ValueError(f"{path} section {name} has {len(self.sections[name])} rows, expected {rows}")
+        for offsets, blob in [("alias_offsets", "alias_blob"), ("address_offsets", "address_blob"), ("node_edge_offsets", "node_edge_ids")]:
+            if self.sections[offsets][-1] != len(self.sections[blob]):
+                raise ValueError(f"{path} section {offsets} does not end at the length of {blob}")
+
+    def find_node(self, pubkey: str) -> int | None:
+        try:
+            key = bytes.fromhex(pubkey)
+        except ValueError:
+            return None
+        raw = self.sections["pubkeys"]
+        lo, hi = 0, self.num_nodes
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(raw[mid * PUBKEY_BYTES:(mid + 1) * PUBKEY_BYTES]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.num_nodes and raw[lo * PUBKEY_BYTES:(lo + 1) * PUBKEY_BYTES] == key:
+            return lo
+        return None
+
+    def edges_of(self, node_id: int) -> Sequence[int]:
+        offsets = self.sections["node_edge_offsets"]
+        return self.sections["node_edge_ids"][offsets[node_id]:offsets[node_id + 1]]
+
+    def to_channel_graph(self) -> ChannelGraph:
+        """mutable copy, one memcpy per column plus the lookup dicts"""
+        graph = ChannelGraph()
+        graph.pubkeys = list(self.pubkeys)
+        graph.aliases = list(self.aliases)
+        graph.addresses = list(self.addresses)
+        graph.node_ids = {pubkey: node_id for node_id, pubkey in enumerate(graph.pubkeys)}
+        edge_ids = self.sections["node_edge_ids"]
+        offsets = self.sections["node_edge_offsets"]
+        graph.node_edges = [array('I', edge_ids[offsets[i]:offsets[i + 1]]) for i in range(self.num_nodes)]
+        for name, typecode in SECTIONS[7:]:
+            column = array(typecode)
+            column.frombytes(self.sections[name].cast('B'))
+            setattr(graph, name, column)
+        graph.edge_ids = {chan_id: edge_id for edge_id, chan_id in enumerate(graph.chan_ids)}
+        graph.synced_at = self.synced_at
+        return graph
+
+    def close(self) -> None:
+        for section in self.sections.values():
+            section.release()
+        self.sections.clear()
+        self.mm.close()
+
+    @staticmethod
+    def string_table(strings: List[str]) -> Tuple['array[int]', bytes]:
+        offsets = array('I', [0])
+        encoded = [s.encode('utf-8') for s in strings]
+        total = 0
+        for s in encoded:
+            total += len(s)
+            offsets.append(total)
+        return offsets, b''.join(encoded)
+
+    @staticmethod
+    def write(path: str, graph: ChannelGraph) -> None:
+        """renumber nodes into pubkey order and write every column, atomically replacing `path`"""
+        with graph.lock:
+            order = sorted(range(len(graph.pubkeys)), key=graph.pubkeys.__getitem__)
+            new_id = array('I', bytes(4 * len(order)))
+            for node_id, old_id in enumerate(order):
+                new_id[old_id] = node_id
+            alias_offsets, alias_blob = GraphSnapshot.string_table([graph.aliases[i] for i in order])
+            address_offsets, address_blob = GraphSnapshot.string_table([graph.addresses[i] for i in order])
+            node_edge_offsets = array('I', [0])
+            node_edge_ids = array('I')
+            for old_id in order:
+                node_edge_ids.extend(graph.node_edges[old_id])
+                node_edge_offsets.append(len(node_edge_ids))
+            columns: Dict[str, Any] = {
+                "pubkeys": b''.join(bytes.fromhex(graph.pubkeys[i]) for i in order),
+                "alias_offsets": alias_offsets,
+                "alias_blob": alias_blob,
+                "address_offsets": address_offsets,
+                "address_blob": address_blob,
+                "node_edge_offsets": node_edge_offsets,
+                "node_edge_ids": node_edge_ids,
+                # pubkey order is kept, so node1 < node2 still holds after renumbering
+                "node1": array('I', [new_id[n] for n in graph.node1]),
+                "node2": array('I', [new_id[n] for n in graph.node2]),
+            }
+            for name, _ in SECTIONS[7:]:
+                columns.setdefault(name, getattr(graph, name))
+            header = HEADER.pack(MAGIC, VERSION, int(sys.byteorder == 'little'), graph.current_as_of(), len(order), len(graph.chan_ids))
+            blobs = [bytes(columns[name]) for name, _ in SECTIONS]
+        table = []
+        offset = HEADER.size + SECTION_TABLE.size
+        for blob in blobs:
+            offset += -offset % ALIGN
+            table.extend([offset, len(blob)])
+            offset += len(blob)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.write(SECTION_TABLE.pack(*table))
+            for i, blob in enumerate(blobs):
+                f.write(bytes(table[2 * i] - f.tell()))
+                f.write(blob)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def write_describe_graph(path: str, response: ln.ChannelGraph) -> None:
+        """snapshot a DescribeGraph response"""
+        graph = ChannelGraph()
+        graph.load(response)
+        GraphSnapshot.write(path, graph)
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+invoice_watcher.py
+---
+Wait for many invoices to settle over one SubscribeInvoices stream
+usage: Lnd.wait_for_settlement(payment_hash, timeout) after get_invoice(), no polling
+"""
+import time
+import threading
+import grpc
+from concurrent.futures import Future, TimeoutError
+from grpc_generated import lightning_pb2 as ln
+from subscription import Subscription
+from typing import Dict, List, TYPE_CHECKING
+from result import Result, Ok, Err
+if TYPE_CHECKING:
+    from lnd import Lnd
+
+RESYNC_PAGE_SIZE = 1000
+
+class InvoiceWatcher:
+    """
+    Waiters register a future per payment hash, settle and cancel events from the shared stream resolve them
+        every waiter costs one LookupInvoice when registering (it may already be settled)
+        after each reconnect one ListInvoices pass from the oldest open waiter's add index
+        catches what settled while disconnected
+    """
+    def __init__(self, node: 'Lnd') -> None:
+        self.node = node
+        self.lock = threading.Lock()
+        self.waiters: Dict[str, List[Future[Result[int, str]]]] = {} # payment_hash -> futures
+        self.add_indexes: Dict[str, int] = {} # payment_hash -> add_index, of waited invoices
+        self.subscription: Subscription | None = None
+
+    def start(self, timeout: float | None = None) -> bool:
+        with self.lock:
+            if self.subscription is None:
+                self.subscription = Subscription(
+                    f"{self.node.alias}-invoices",
+                    lambda: self.node.stub.SubscribeInvoices(ln.InvoiceSubscription()),
+                    self.on_event,
+                    self.resync
+                )
+                self.subscription.start()
+        return self.subscription.wait_synced(timeout)
+
+    def stop(self) -> None:
+        if self.subscription is not None:
+            self.subscription.stop()
+
+    def resolve(self, invoice: ln.Invoice) -> None:
+        if invoice.state == ln.Invoice.SETTLED:
+            res: Result[int, str] = Ok(invoice.amt_paid_sat)
+        elif invoice.state == ln.Invoice.CANCELED:
+            res = Err("invoice canceled")
+        else:
+            return
+        self.settle_waiters(invoice.r_hash.hex(), res)
+
+    def settle_waiters(self, payment_hash: str, res: Result[int, str]) -> None:
+        with self.lock:
+            futures = self.waiters.pop(payment_hash, [])
+            self.add_indexes.pop(payment_hash, None)
+        for future in futures:
+            if not future.done():
+                future.set_result(res)
+
+    def on_event(self, invoice: ln.Invoice) -> None:
+        self.resolve(invoice)
+
+    def lookup(self, payment_hash: str) -> None:
+        try:
+            invoice = self.node.stub.LookupInvoice(ln.PaymentHash(r_hash=bytes.fromhex(payment_hash)))
+        except grpc.RpcError as e:
+            # unknown invoice, no event will ever settle it
+            if e.code() == grpc.StatusCode.NOT_FOUND:
+                self.settle_waiters(payment_hash, Err(e.details()))
+                return
+            raise
+        with self.lock:
+            if payment_hash in self.waiters:
+                self.add_indexes[payment_hash] = invoice.add_index
+        self.resolve(invoice)
+
+    def resync(self) -> None:
+        with self.lock:
+            unindexed = [payment_hash for payment_hash in self.waiters if payment_hash not in self.add_indexes]
+            index_offset = min(self.add_indexes.values(), default=0) - 1
+        if index_offset >= 0:
+            while True:
+                res = self.node.stub.ListInvoices(ln.ListInvoiceRequest(index_offset=index_offset, num_max_invoices=RESYNC_PAGE_SIZE))
+                for invoice in res.invoices:
+                    self.resolve(invoice)
+                if len(res.invoices) < RESYNC_PAGE_SIZE:
+                    break
+                index_offset = res.last_index_offset
+        # only waiters whose registering lookup failed
+        for payment_hash in unindexed:
+            self.lookup(payment_hash)
+
+    def wait(self, payment_hash: str, timeout: float | None = None) -> Result[int, str]:
+        """Ok(amount paid in sats) once settled, Err when canceled or not settled within `timeout`"""
+        try:
+            bytes.fromhex(payment_hash)
+        except ValueError:
+            return Err(f"invalid payment hash: {payment_hash}")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self.start(timeout):
+            return Err(f"invoice stream not synced after {timeout}s")
+        future: Future[Result[int, str]] = Future()
+        with self.lock:
+            self.waiters.setdefault(payment_hash, []).append(future)
+        # registered before the lookup, so a settle in between is caught by either
+        try:
+            self.lookup(payment_hash)
+        except grpc.RpcError as e:
+            self.settle_waiters(payment_hash, Err(e.details()))
+        try:
+            return future.result(None if deadline is None else max(deadline - time.monotonic(), 0))
+        except TimeoutError:
+            with self.lock:
+                futures = self.waiters.get(payment_hash, [])
+                if future in futures:
+                    futures.remove(future)
+                if not futures:
+                    self.waiters.pop(payment_hash, None)
+                    self.add_indexes.pop(payment_hash, None)
+            return Err(f"not settled after {timeout}s")
\ No newline at end of file
@@ -4,18 +4,16 @@ kraken.py
 An implementation of Kraken Wallet API as a TrustedSwapService
 usage: add your kraken credentials
 """
-import sys
-import time
-import requests # type: ignore
 import urllib.parse
 import hashlib
 import hmac
 import base64
-from trusted_swap_service import TrustedSwapService
+from trusted_swap_service import TrustedSwapService, HttpTransport
+from nonce_source import NonceSource
 from const import COIN_SATS, LOG_ERROR, LOG_INFO
-from typing import Dict
+from typing import Any, Dict, List
 from result import Result, Ok, Err
-from box import Box
+from box import Box, BoxList
 
 KRAKEN_API_URL = "https://api.kraken.com/"
 
@@ -25,65 +23,88 @@ class KrakenCreds:
         go to the onchain bitcoin widthdraw page on kraken.com and 
         add a new withdraw address, give it a description/name and use that 
         same description/name for the `funding_key` below
+        set `nonce_window` only if the key has a nonce window configured on kraken.com,
+        requests on the key are then sent in parallel instead of one at a time
     """
-    def __init__(self, api_key: str, api_secret: str, funding_key: str):
+    def __init__(self, api_key: str, api_secret: str, funding_key: str, nonce_path: str | None = None, nonce_window: bool = False):
         self.api_key = api_key
         self.api_secret = api_secret
         self.funding_key = funding_key
+        self.nonce_path = nonce_path # optional file keeping nonces increasing across restarts
+        self.nonce_window = nonce_window
 
-class Kraken(TrustedSwapService):
+class KrakenSigner:
+    """
+    API-Sign for one credential, the secret is base64 decoded once
+        and an hmac keyed with it is kept per uri path with the path already fed in,
+        so signing a request is a copy() and one update with the hash of nonce + postdata
+    """
     def __init__(self, creds: KrakenCreds) -> None:
-        super().__init__() # init logger from parent class
+        self.mac = hmac.new(base64.b64decode(creds.api_secret), digestmod=hashlib.sha512)
+        self.path_macs: Dict[str, 'hmac.HMAC'] = {}
+
+    def sign(self, uri_path: str, nonce: str, postdata: str) -> str:
+        """`postdata` is the urlencoded request body, nonce included"""
+        path_mac = self.path_macs.get(uri_path)
+        if path_mac is None:
+            path_mac = self.mac.copy()
+            path_mac.update(uri_path.encode())
+            self.path_macs[uri_path] = path_mac
+        mac = path_mac.copy()
+        mac.update(hashlib.sha256((nonce + postdata).encode()).digest())
+        return base64.b64encode(mac.digest()).decode()
+
+class Kraken(TrustedSwapService):
+    def __init__(self, creds: KrakenCreds, transport: HttpTransport | None = None) -> None:
+        super().__init__(transport) # init logger and http transport from parent class
         self.creds = creds
         self.alias = f"kraken-{creds.api_key[:5]}"
+        self.nonce_source = NonceSource.shared("kraken", creds.api_key, creds.nonce_path)
+        self.signer = KrakenSigner(creds)
 
-    @staticmethod
-    def get_kraken_signature(urlpath: str, data: Dict, secret: str) -> str: # type: ignore
-        postdata = urllib.parse.urlencode(data)
-        encoded = (str(data['nonce']) + postdata).encode()
-        message = urlpath.encode() + hashlib.sha256(encoded).digest()
-        mac = hmac.new(base64.b64decode(secret), message, hashlib.sha512)
-        sigdigest = base64.b64encode(mac.digest())
-        return sigdigest.decode()
+    def get_nonce(self) -> str:
+        # unique and increasing per api key across threads, async tasks and (with nonce_path) restarts
+        return str(self.nonce_source.next())
 
     @staticmethod
-    def get_nonce() -> str:
-        return str(int(1000 * time.time()))
+    def to_box(result: Dict | List) -> Any: # type: ignore
+        # some endpoints (DepositAddresses) return a list
+        return BoxList(result) if isinstance(result, list) else Box(result)
 
-    def check_errors(self, response: Dict, payload: Dict, endpoint: str) -> None: # type: ignore
-        if response['error']:
-            for err in response['error']:
-                self.log(LOG_ERROR, f"kraken responded with error: {err}\nendpoint: {endpoint}\npayload: {payload}")
-            sys.exit()
-
-    def kraken_request(self, uri_path: str, data: Dict) -> Box: # type: ignore
-        headers = {}
-        headers['API-Key'] = self.creds.api_key
-        headers['API-Sign'] = self.get_kraken_signature(
-            uri_path,
-            data,
-            self.creds.api_secret
-        )
-        res = requests.post(
-            (KRAKEN_API_URL + uri_path),
-            headers=headers,
-            data=data
-        ).json()['result']
-        return Box(res)
+    def kraken_request(self, uri_path: str, data: Dict) -> Result[Box, str]: # type: ignore
+        # without a nonce window kraken rejects a nonce below the last one it received,
+        # so requests on a key take their nonce and are answered one at a time
+        with self.nonce_source.dispatch(not self.creds.nonce_window):
+            data = {"nonce": self.get_nonce(), **data}
+            headers = {}
+            headers['API-Key'] = self.creds.api_key
+            headers['API-Sign'] = self.signer.sign(
+                uri_path,
+                str(data['nonce']),
+                urllib.parse.urlencode(data)
+            )
+            body = self.transport.post(
+                (KRAKEN_API_URL + uri_path),
+                headers=headers,
+                data=data
+            ).json()
+        if body.get('error'):
+            self.log(LOG_ERROR, f"kraken responded with error: {body['error']}\nendpoint: {uri_path}")
+            return Err(str(body['error']))
+        return Ok(self.to_box(body['result']))
 
     def get_address(self) -> Result[str, str]:
         """TrustedSwapService"""
         response = self.kraken_request(
             '0/private/DepositAddresses', 
             {
-                "nonce": self.get_nonce(),
                 "asset": "XBT",
                 "method": "Bitcoin",
             }
         )
-        if response.error:
-            return Err(self.logs.get_address.err.format(self.alias, response))
-        addr: str = response[0].address
+        if isinstance(response, Err):
+            return Err(self.logs.get_address.err.format(self.alias, response.unwrap_err()))
+        addr: str = response.unwrap()[0].address
         self.log(LOG_INFO, self.logs.get_address.ok.format(self.alias, addr))
         return Ok(addr)
 
@@ -92,14 +113,13 @@ class Kraken(TrustedSwapService):
         response = self.kraken_request(
             '0/private/Withdraw', 
             {
-                "nonce": self.get_nonce(),
                 "asset": "XBT",
                 "key": self.creds.funding_key,
                 "amount": sats / COIN_SATS
             }
         )
-        if response.error:
-            return Err(self.logs.send_onchain.err.format(self.alias, response))
+        if isinstance(response, Err):
+            return Err(self.logs.send_onchain.err.format(self.alias, response.unwrap_err()))
         self.log(LOG_INFO, self.logs.send_onchain.ok.format(self.alias, sats, fee))
         return Ok(None)
 
@@ -108,16 +128,15 @@ class Kraken(TrustedSwapService):
         response = self.kraken_request(
             '0/private/WithdrawInfo', 
             {
-                "nonce": self.get_nonce(),
                 "asset": "XBT",
                 "key": self.creds.funding_key,
                 "amount": float(sats / COIN_SATS)
             }
         )
-        if response.error:
-            return Err(self.logs.get_onchain_fee.err.format(self.alias, response))
-        sats = int(float(response.amount) * COIN_SATS)
-        fee = int(float(response.fee) * COIN_SATS)
+        if isinstance(response, Err):
+            return Err(self.logs.get_onchain_fee.err.format(self.alias, response.unwrap_err()))
+        sats = int(float(response.unwrap().amount) * COIN_SATS)
+        fee = int(float(response.unwrap().fee) * COIN_SATS)
         self.log(LOG_INFO, self.logs.get_onchain_fee.ok.format(self.alias, sats, fee))
         return Ok(fee)
 
@@ -125,12 +144,12 @@ class Kraken(TrustedSwapService):
         """TrustedSwapService"""
         response = self.kraken_request(
             '0/private/Balance', 
-            {"nonce": self.get_nonce()}
+            {}
         )
-        if response.error:
-            return Err(self.logs.get_balance.err.format(self.alias, response))
-        balance = int(float(response.XXBT) * COIN_SATS)
-        self.log(LOG_INFO, self.logs.get_balance.format(self.alias, balance))
+        if isinstance(response, Err):
+            return Err(self.logs.get_balance.err.format(self.alias, response.unwrap_err()))
+        balance = int(float(response.unwrap().XXBT) * COIN_SATS)
+        self.log(LOG_INFO, self.logs.get_balance.ok.format(self.alias, balance))
         return Ok(balance)
 
     def get_invoice(self, sats: int) -> Result[str, str]:
@@ -138,16 +157,15 @@ class Kraken(TrustedSwapService):
         response = self.kraken_request(
             '0/private/DepositAddresses', 
             {
-                "nonce": self.get_nonce(),
                 "asset": "XBT",
                 "method": "Bitcoin Lightning",
                 "new": True,
                 "amount": sats / COIN_SATS
             }
         )
-        if response.error:
-            return Err(self.logs.get_invoice.err.format(self.alias, response))
-        invoice: str = response[0].address
+        if isinstance(response, Err):
+            return Err(self.logs.get_invoice.err.format(self.alias, response.unwrap_err()))
+        invoice: str = response.unwrap()[0].address
         self.log(LOG_INFO, self.logs.get_invoice.ok.format(self.alias, invoice, sats))
         return Ok(invoice)
     
\ No newline at end of file
@@ -6,14 +6,31 @@ usage: add your lnd credentials
 """
 import os
 import codecs
+import threading
 import grpc
+from concurrent.futures import ThreadPoolExecutor
 from grpc_generated import lightning_pb2_grpc, lightning_pb2 as ln
 from grpc_generated import router_pb2_grpc as routerrpc, router_pb2 as router
 from const import SAT_MSATS, LOG_ERROR, LOG_INFO
-from typing import List
-from bitcoin_lightning_node import BitcoinLightningNode, OpenChannelRequest, CloseChannelRequest, PendingOpenChannel, ActiveOpenChannel, DecodedInvoice, PayInvoiceRequest, SendOnchainRequest
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple, TypeVar
+from bitcoin_lightning_node import BitcoinLightningNode, OpenChannelRequest, CloseChannelRequest, PendingOpenChannel, ActiveOpenChannel, DecodedInvoice, PayInvoiceRequest, SendOnchainRequest, RouteHintHop, ChannelFeePolicy
+from bolt11 import Bolt11
+from channel_cache import ChannelCache, BALANCE_MAX_AGE_SECS
+from unconfirmed_tracker import UnconfirmedBalanceTracker
+from peer_index import PeerIndex
+from graph import ChannelGraph
+from cursor import FileCursor
+from invoice_watcher import InvoiceWatcher
 from result import Result, Ok, Err
 
+MESSAGE_SIZE_MB = 50 * 1024 * 1024
+CHANNEL_OPTIONS = [
+    ('grpc.max_message_length', MESSAGE_SIZE_MB),
+    ('grpc.max_receive_message_length', MESSAGE_SIZE_MB)
+]
+
+T = TypeVar('T')
+
 class LndCreds:
     """
     connect an LND node using an admin macaroon, tls cert, and grpc host:port
@@ -25,21 +42,74 @@ class LndCreds:
         self.tls_cert_path = tls_cert_path
 
 class Lnd(BitcoinLightningNode):
+    """
+    Construction does no I/O: the cert and macaroon are read and the gRPC channel is built
+        by connect() or the first call that needs a stub, whichever comes first
+        own pubkey is fetched on first use and cached, the alias only by connect()
+        (or Lnd.warmup() for many nodes), until then logs show host:port
+    """
     def __init__(self, creds: LndCreds) -> None:
         super().__init__() # init logger from parent class
-        MESSAGE_SIZE_MB = 50 * 1024 * 1024
-        os.environ['GRPC_SSL_CIPHER_SUITES'] = 'HIGH+ECDSA'
-        combined_credentials = self.get_credentials(
-            creds.tls_cert_path, creds.macaroon_path)
-        channel_options = [
-            ('grpc.max_message_length', MESSAGE_SIZE_MB),
-            ('grpc.max_receive_message_length', MESSAGE_SIZE_MB)
-        ]
-        grpc_channel = grpc.secure_channel(
-            creds.grpc_host, combined_credentials, channel_options)
-        self.stub = lightning_pb2_grpc.LightningStub(grpc_channel)  # type: ignore
-        self.routerstub = routerrpc.RouterStub(grpc_channel)  # type: ignore
-        self.alias = self.get_alias(self.get_pubkey().unwrap()).unwrap()
+        self.creds = creds
+        self.stubs_lock = threading.Lock()
+        self.stubs: Tuple[lightning_pb2_grpc.LightningStub, routerrpc.RouterStub] | None = None
+        self.channel_cache: ChannelCache | None = None
+        self.unconfirmed_tracker = UnconfirmedBalanceTracker(self)
+        self.peer_index = PeerIndex(self)
+        self.invoice_watcher = InvoiceWatcher(self)
+        self.graph: ChannelGraph | None = None
+        self.cached_pubkey: str | None = None
+        self.cached_alias: str | None = None
+
+    def open_grpc_channel(self) -> Tuple[lightning_pb2_grpc.LightningStub, routerrpc.RouterStub]:
+        """read the credentials and build the gRPC channel once, raises OSError for unreadable files"""
+        with self.stubs_lock:
+            if self.stubs is None:
+                os.environ['GRPC_SSL_CIPHER_SUITES'] = 'HIGH+ECDSA'
+                combined_credentials = self.get_credentials(
+                    self.creds.tls_cert_path, self.creds.macaroon_path)
+                grpc_channel = grpc.secure_channel(
+                    self.creds.grpc_host, combined_credentials, CHANNEL_OPTIONS)
+                self.stubs = (lightning_pb2_grpc.LightningStub(grpc_channel), routerrpc.RouterStub(grpc_channel))  # type: ignore
+            return self.stubs
+
+    @property
+    def stub(self) -> lightning_pb2_grpc.LightningStub:
+        return self.open_grpc_channel()[0]
+
+    @property
+    def routerstub(self) -> routerrpc.RouterStub:
+        return self.open_grpc_channel()[1]
+
+    @property
+    def pubkey(self) -> str:
+        if self.cached_pubkey is None:
+            self.cached_pubkey = self.get_pubkey().unwrap()
+        return self.cached_pubkey
+
+    @property
+    def alias(self) -> str:
+        # read by every log line, so never an RPC: host:port until connect() succeeds
+        return self.cached_alias if self.cached_alias is not None else self.creds.grpc_host
+
+    def connect(self) -> Result[None, str]:
+        """read the credentials, then fetch and cache own pubkey and alias"""
+        try:
+            self.open_grpc_channel()
+            self.cached_alias = self.get_alias(self.pubkey).unwrap()
+        except OSError as e:
+            return Err(f"unreadable credentials: {e}")
+        except grpc.RpcError as e:
+            return Err(e.details())
+        return Ok(None)
+
+    @staticmethod
+    def warmup(nodes: List['Lnd']) -> Dict[str, Result[None, str]]:
+        """connect() many nodes concurrently, results keyed by grpc host"""
+        if not nodes:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(nodes)) as pool:
+            return dict(zip([node.creds.grpc_host for node in nodes], pool.map(lambda node: node.connect(), nodes)))
 
     @staticmethod
     def get_credentials(tls_cert_path: str, macaroon_path: str) -> grpc.ChannelCredentials:
@@ -52,10 +122,171 @@ class Lnd(BitcoinLightningNode):
             ssl_credentials, auth_credentials)
         return combined_credentials
 
+    def use_channel_cache(self, max_age_secs: float | None = BALANCE_MAX_AGE_SECS, timeout: float | None = None) -> ChannelCache:
+        """serve channel reads from memory, kept current by SubscribeChannelEvents"""
+        if self.channel_cache is None:
+            self.channel_cache = ChannelCache(self, max_age_secs)
+            self.channel_cache.start(timeout)
+        return self.channel_cache
+
+    def use_unconfirmed_tracker(self, timeout: float | None = None) -> UnconfirmedBalanceTracker:
+        """keep the unconfirmed balance current from SubscribeTransactions"""
+        if self.unconfirmed_tracker.subscription is None:
+            self.unconfirmed_tracker.start(timeout)
+        return self.unconfirmed_tracker
+
+    def use_peer_index(self, timeout: float | None = None) -> PeerIndex:
+        """keep the set of connected peers current from SubscribePeerEvents"""
+        if self.peer_index.subscription is None:
+            self.peer_index.start(timeout)
+        return self.peer_index
+
+    def use_graph(self, snapshot_path: str | None = None, max_age_secs: float = 6 * 3600, timeout: float | None = None) -> ChannelGraph:
+        """hold the network graph in memory, restored from `snapshot_path` when it exists"""
+        if self.graph is None:
+            self.graph = ChannelGraph()
+            if snapshot_path is not None:
+                self.graph.restore(snapshot_path)
+            self.graph.node_listeners.append(self.cache_alias)
+            # bulk load once the graph is synced, however long after `timeout` that is
+            self.graph.sync_listeners.append(self.cache_graph_aliases)
+            self.graph.start(self, max_age_secs, timeout)
+        return self.graph
+
+    def cache_alias(self, pubkey: str, alias: str) -> None:
+        # an empty alias means no node announcement yet, keep looking it up
+        if alias:
+            self.alias_cache.put(pubkey, alias)
+
+    def cache_graph_aliases(self) -> None:
+        if self.graph is None:
+            return
+        with self.graph.lock:
+            for pubkey, alias in zip(self.graph.pubkeys, self.graph.aliases):
+                self.cache_alias(pubkey, alias)
+
+    @staticmethod
+    def to_open_channel_request(open_req: OpenChannelRequest) -> ln.OpenChannelRequest:
+        return ln.OpenChannelRequest(
+            node_pubkey_string=open_req.peer_pubkey,
+            local_funding_amount=open_req.capacity,
+            sat_per_vbyte=open_req.vbyte_sats,
+            min_htlc_msat=open_req.min_htlc_sats * SAT_MSATS,
+            spend_unconfirmed=open_req.is_spend_unconfirmed,
+            use_base_fee=True,
+            use_fee_rate=True,
+            base_fee=open_req.base_fee,
+            fee_rate=open_req.ppm_fee
+        )
+
+    @staticmethod
+    def to_batch_open_channel(open_req: OpenChannelRequest) -> ln.BatchOpenChannel:
+        return ln.BatchOpenChannel(
+            node_pubkey=bytes.fromhex(open_req.peer_pubkey),
+            local_funding_amount=open_req.capacity,
+            min_htlc_msat=open_req.min_htlc_sats * SAT_MSATS,
+            private=open_req.is_unannounced,
+            use_base_fee=True,
+            use_fee_rate=True,
+            base_fee=open_req.base_fee,
+            fee_rate=open_req.ppm_fee
+        )
+
+    @staticmethod
+    def to_channel_point(pending: ln.PendingUpdate) -> str:
+        # txid bytes are in internal byte order, channel point strings are reversed
+        return f"{pending.txid[::-1].hex()}:{pending.output_index}"
+
+    @staticmethod
+    def to_close_channel_request(close_channel_req: CloseChannelRequest) -> ln.CloseChannelRequest:
+        funding_txid_str, output_index = close_channel_req.channel_point.split(':')
+        args = {'channel_point': ln.ChannelPoint(funding_txid_str=funding_txid_str, output_index=int(output_index)), 'max_fee_per_vbyte': 1000}
+        if close_channel_req.is_force:
+            args['force'] = True 
+        else:
+            args['sat_per_vbyte'] = close_channel_req.vbyte_sats
+            args['force'] = False
+        return ln.CloseChannelRequest(**args) # type: ignore
+
+    @staticmethod
+    def to_send_payment_request(pay_invoice_req: PayInvoiceRequest, is_inflight_updates: bool = False) -> router.SendPaymentRequest:
+        args = {
+            'payment_request': pay_invoice_req.invoice,
+            'fee_limit_sat': pay_invoice_req.fee_limit_sats,
+            'timeout_seconds': pay_invoice_req.timeout_secs,
+            'max_parts': pay_invoice_req.max_parts,
+            'no_inflight_updates': not is_inflight_updates
+        }
+        if pay_invoice_req.outgoing_channel_id:
+            args['outgoing_chan_ids'] = [pay_invoice_req.outgoing_channel_id]
+        return router.SendPaymentRequest(**args) # type: ignore
+
+    @staticmethod
+    def to_policy_update_request(base_fee: int, ppm_fee: int, cltv_delta: int, channel_point: str | None = None) -> ln.PolicyUpdateRequest:
+        """scoped to `channel_point`, or every channel of the node when None"""
+        args = {
+            'base_fee_msat': base_fee,
+            'fee_rate_ppm': ppm_fee,
+            'time_lock_delta': cltv_delta
+        }
+        if channel_point is None:
+            args['global'] = True
+        else:
+            txid, output_index = channel_point.split(':')
+            args['chan_point'] = ln.ChannelPoint(funding_txid_str=txid, output_index=int(output_index))
+        return ln.PolicyUpdateRequest(**args) # type: ignore
+
+    @staticmethod
+    def to_send_coins_request(send_onchain_req: SendOnchainRequest) -> ln.SendCoinsRequest:
+        return ln.SendCoinsRequest(
+            addr=send_onchain_req.dest_addr,
+            amount=send_onchain_req.amount_sats,
+            sat_per_vbyte=send_onchain_req.vbyte_sats
+        )
+
+    @staticmethod
+    def to_pending_open_channel(chan: ln.PendingChannelsResponse.PendingOpenChannel) -> PendingOpenChannel:
+        return PendingOpenChannel(
+            peer_pubkey=chan.channel.remote_node_pub,
+            channel_point=chan.channel.channel_point,
+            capacity=chan.channel.capacity,
+            local_balance=chan.channel.local_balance
+        )
+
+    @staticmethod
+    def to_active_open_channel(chan: ln.Channel) -> ActiveOpenChannel:
+        return ActiveOpenChannel(
+            channel_id=str(chan.chan_id),
+            peer_pubkey=chan.remote_pubkey,
+            channel_point=chan.channel_point,
+            capacity=chan.capacity,
+            local_balance=chan.local_balance,
+        )
+
+    @staticmethod
+    def to_decoded_invoice(decoded_req: ln.PayReq) -> DecodedInvoice:
+        return DecodedInvoice(
+            decoded_req.destination,
+            decoded_req.payment_hash,
+            decoded_req.num_satoshis,
+            decoded_req.description,
+            timestamp=decoded_req.timestamp,
+            expiry=decoded_req.expiry,
+            route_hints=[[RouteHintHop(
+                pubkey=hop.node_id,
+                channel_id=hop.chan_id,
+                base_fee_msat=hop.fee_base_msat,
+                ppm_fee=hop.fee_proportional_millionths,
+                cltv_delta=hop.cltv_expiry_delta
+            ) for hop in route_hint.hop_hints] for route_hint in decoded_req.route_hints]
+        )
+
     def is_peer_with(self,pubkey:str) -> Result[bool,str]:
-        list_peers_response:ln.ListPeersResponse = self.stub.ListPeers(ln.ListPeersRequest())
-        peers = list_peers_response.peers
-        return Ok(pubkey in peers)
+        return Ok(self.peer_index.is_peer_with(pubkey))
+
+    def ensure_peers(self, peers: Dict[str, str]) -> Dict[str, Result[None, str]]:
+        """connect every pubkey -> host we are not already peered with, concurrently"""
+        return self.peer_index.ensure_peers(peers)
 
     def add_peer(self, pubkey: str, address: str) -> Result[ln.ConnectPeerResponse, str]:
         ln_addr = ln.LightningAddress(pubkey=pubkey, host=address)
@@ -79,22 +310,10 @@ class Lnd(BitcoinLightningNode):
         if isinstance(is_peered, Err):
             return is_peered
         if not is_peered.unwrap():
-            self.add_peer(open_req.peer_pubkey, open_req.peer_host)
+            self.peer_index.connect(open_req.peer_pubkey, open_req.peer_host)
         response = None
         try:
-            response = self.stub.OpenChannelSync(
-                ln.OpenChannelRequest(
-                    node_pubkey_string=open_req.peer_pubkey,
-                    local_funding_amount=open_req.capacity,
-                    sat_per_vbyte=open_req.vbyte_sats,
-                    min_htlc_msat=open_req.min_htlc_sats * SAT_MSATS,
-                    spend_unconfirmed=open_req.is_spend_unconfirmed,
-                    use_base_fee=True,
-                    use_fee_rate=True,
-                    base_fee=open_req.base_fee,
-                    fee_rate=open_req.ppm_fee
-                )
-            )
+            response = self.stub.OpenChannelSync(self.to_open_channel_request(open_req))
         except Exception as e:
             if e.details: # type: ignore
                 self.log(LOG_ERROR, self.logs.open_channel.err.format(self.alias, e.details(), open_req)) # type: ignore
@@ -104,18 +323,45 @@ class Lnd(BitcoinLightningNode):
         self.log(LOG_INFO, self.logs.open_channel.ok.format(self.alias, open_req, response.funding_txid_bytes.hex()))
         return Ok(response)
     
+    def open_channels(self, open_reqs: List[OpenChannelRequest]) -> Result[List[str], str]:
+        """BitcoinLightingNode"""
+        # every channel is checked before anything is sent, the batch is all-or-nothing
+        errors = []
+        for open_req in open_reqs:
+            valid = open_req.validate()
+            if isinstance(valid, Err):
+                errors.append(f"{open_req}: {valid.unwrap_err()}")
+        if not open_reqs:
+            errors.append("no channels requested")
+        if errors:
+            self.log(LOG_ERROR, self.logs.open_channels.err.format(self.alias, errors))
+            return Err("; ".join(errors))
+        peered = self.ensure_peers({open_req.peer_pubkey: open_req.peer_host for open_req in open_reqs})
+        unreachable = [f"{pubkey}: {res.unwrap_err()}" for pubkey, res in peered.items() if isinstance(res, Err)]
+        if unreachable:
+            self.log(LOG_ERROR, self.logs.open_channels.err.format(self.alias, unreachable))
+            return Err("; ".join(unreachable))
+        # one transaction pays one feerate, use the highest requested so no channel is underpaid
+        batch_req = ln.BatchOpenChannelRequest(
+            channels=[self.to_batch_open_channel(open_req) for open_req in open_reqs],
+            sat_per_vbyte=max(open_req.vbyte_sats for open_req in open_reqs),
+            spend_unconfirmed=all(open_req.is_spend_unconfirmed for open_req in open_reqs)
+        )
+        try:
+            response: ln.BatchOpenChannelResponse = self.stub.BatchOpenChannel(batch_req)
+        except grpc.RpcError as e:
+            self.log(LOG_ERROR, self.logs.open_channels.err.format(self.alias, e.details()))
+            return Err(e.details())
+        channel_points = [self.to_channel_point(pending) for pending in response.pending_channels]
+        for open_req, channel_point in zip(open_reqs, channel_points):
+            self.log(LOG_INFO, self.logs.open_channels.ok.format(self.alias, open_req, channel_point))
+        return Ok(channel_points)
+
     def close_channel(self, close_channel_req: CloseChannelRequest) -> Result[str, str]:
         """BitcoinLightingNode"""
-        funding_txid_str, output_index = close_channel_req.channel_point.split(':')
-        args = {'channel_point': ln.ChannelPoint(funding_txid_str=funding_txid_str, output_index=int(output_index)), 'max_fee_per_vbyte': 1000}
-        if close_channel_req.is_force:
-            args['force'] = True 
-        else:
-            args['sat_per_vbyte'] = close_channel_req.vbyte_sats
-            args['force'] = False
         txid = ''
         try:
-            for response in self.stub.CloseChannel(ln.CloseChannelRequest(**args)): # type: ignore
+            for response in self.stub.CloseChannel(self.to_close_channel_request(close_channel_req)):
                 txid = response.close_pending.txid.hex()
                 self.log(LOG_INFO, self.logs.close_channel.ok.format(self.alias, close_channel_req, txid))
         except Exception as e:
@@ -128,35 +374,99 @@ class Lnd(BitcoinLightningNode):
       
     def get_pending_open_channels(self) -> Result[List[PendingOpenChannel], str]:
         """BitcoinLightingNode"""
+        if self.channel_cache is not None:
+            return self.channel_cache.get_pending_open_channels()
         request = ln.PendingChannelsRequest()
         response: ln.PendingChannelsResponse = self.stub.PendingChannels(request)
-        chans = []
-        for chan in response.pending_open_channels:
-            chans.append(PendingOpenChannel(
-                peer_pubkey=chan.channel.remote_node_pub,
-                channel_point=chan.channel.channel_point,
-                capacity=chan.channel.capacity,
-                local_balance=chan.channel.local_balance
-            ))
+        chans = [self.to_pending_open_channel(chan) for chan in response.pending_open_channels]
         self.log(LOG_INFO, self.logs.get_pending_open_channels.ok.format(self.alias, len(chans)))
         return Ok(chans)
 
     def get_opened_channels(self) -> Result[List[ActiveOpenChannel], str]:
         """BitcoinLightingNode"""
+        if self.channel_cache is not None:
+            return self.channel_cache.get_opened_channels()
         request = ln.ListChannelsRequest()
         response: ln.ListChannelsResponse = self.stub.ListChannels(request)
-        chans = []
-        for chan in response.channels:
-            chans.append(ActiveOpenChannel(
-                channel_id=chan.chan_id,
-                peer_pubkey=chan.remote_pubkey,
-                channel_point=chan.channel_point,
-                capacity=chan.capacity,
-                local_balance=chan.local_balance,
-            ))
+        chans = [self.to_active_open_channel(chan) for chan in response.channels]
         self.log(LOG_INFO, self.logs.get_opened_channels.ok.format(self.alias, len(chans)))
         return Ok(chans)
 
+    def get_fee_policies(self) -> Result[Dict[str, Tuple[int, int, int]], str]:
+        """Ok(channel_point -> (base_fee, ppm_fee, cltv_delta)) of every own channel, two RPCs for all of them"""
+        try:
+            fees = self.stub.FeeReport(ln.FeeReportRequest()).channel_fees
+            cltv_deltas: Dict[str, int] = {}
+            node_info = self.stub.GetNodeInfo(ln.NodeInfoRequest(pub_key=self.pubkey, include_channels=True))
+            for edge in node_info.channels:
+                own_policy = edge.node1_policy if edge.node1_pub == self.pubkey else edge.node2_policy
+                cltv_deltas[edge.chan_point] = own_policy.time_lock_delta
+            policies = {}
+            for fee in fees:
+                cltv_delta = cltv_deltas.get(fee.channel_point)
+                if cltv_delta is None:
+                    # not in the public graph (private channel), ask for the edge itself
+                    edge = self.stub.GetChanInfo(ln.ChanInfoRequest(chan_id=fee.chan_id))
+                    cltv_delta = (edge.node1_policy if edge.node1_pub == self.pubkey else edge.node2_policy).time_lock_delta
+                policies[fee.channel_point] = (fee.base_fee_msat, fee.fee_per_mil, cltv_delta)
+        except grpc.RpcError as e:
+            self.log(LOG_ERROR, self.logs.get_fee_policies.err.format(self.alias, e.details()))
+            return Err(e.details())
+        return Ok(policies)
+
+    def update_fee_policies(self, policies: List[ChannelFeePolicy], max_workers: int = 16) -> Result[int, str]:
+        """
+        BitcoinLightingNode
+            UpdateChannelPolicy is scoped to one channel or to all of them, so when every channel changes
+            to the same policy a single global update is sent, otherwise one update per changed channel
+            updates are not atomic, on a partial failure the Err names the channels already applied
+        """
+        current_res = self.get_fee_policies()
+        if isinstance(current_res, Err):
+            return Err(current_res.unwrap_err())
+        current = current_res.unwrap()
+        unknown = [policy.channel_point for policy in policies if policy.channel_point not in current]
+        if unknown:
+            self.log(LOG_ERROR, self.logs.update_fee_policies.err.format(self.alias, f"unknown channels: {unknown}"))
+            return Err(f"unknown channels: {unknown}")
+        targets = dict(current)
+        for policy in policies:
+            cltv_delta = current[policy.channel_point][2] if policy.cltv_delta is None else policy.cltv_delta
+            targets[policy.channel_point] = (policy.base_fee, policy.ppm_fee, cltv_delta)
+        changed = {channel_point: target for channel_point, target in targets.items() if current[channel_point] != target}
+        if not changed:
+            self.log(LOG_INFO, self.logs.update_fee_policies.ok.format(self.alias, len(policies), 0, 0))
+            return Ok(0)
+        # global only when it touches nothing but changed channels, a global update re-announces every channel
+        if len(changed) > 1 and len(changed) == len(targets) and len(set(targets.values())) == 1:
+            batches = [(self.to_policy_update_request(*next(iter(changed.values()))), list(changed))]
+        else:
+            batches = [(self.to_policy_update_request(*target, channel_point), [channel_point]) for channel_point, target in changed.items()]
+        def send(req: ln.PolicyUpdateRequest) -> Result[ln.PolicyUpdateResponse, str]:
+            try:
+                return Ok(self.stub.UpdateChannelPolicy(req))
+            except grpc.RpcError as e:
+                return Err(e.details())
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+            responses = list(pool.map(send, [req for req, _ in batches]))
+        applied: List[str] = []
+        failed: List[str] = []
+        for (_, channel_points), res in zip(batches, responses):
+            if isinstance(res, Err):
+                failed.extend(f"{channel_point}: {res.unwrap_err()}" for channel_point in channel_points)
+                continue
+            errors = {f"{update.outpoint.txid_str}:{update.outpoint.output_index}": update.update_error for update in res.unwrap().failed_updates}
+            for channel_point in channel_points:
+                if channel_point in errors:
+                    failed.append(f"{channel_point}: {errors[channel_point]}")
+                else:
+                    applied.append(channel_point)
+        if failed:
+            self.log(LOG_ERROR, self.logs.update_fee_policies.err.format(self.alias, f"failed: {failed}, applied: {applied}"))
+            return Err(f"failed updates: {failed}, applied: {applied}")
+        self.log(LOG_INFO, self.logs.update_fee_policies.ok.format(self.alias, len(policies), len(changed), len(batches)))
+        return Ok(len(changed))
+
     def get_invoice(self, sats: int) -> Result[str, str]:
         """BitcoinLightingNode"""
         invoice_response = self.stub.AddInvoice(ln.Invoice(value=sats))
@@ -164,26 +474,104 @@ class Lnd(BitcoinLightningNode):
         self.log(LOG_INFO, self.logs.get_invoice.ok.format(self.alias, sats, invoice))
         return Ok(invoice)
 
+    def wait_for_settlement(self, payment_hash: str, timeout: float | None = None) -> Result[int, str]:
+        """BitcoinLightingNode"""
+        res = self.invoice_watcher.wait(payment_hash, timeout)
+        if isinstance(res, Ok):
+            self.log(LOG_INFO, self.logs.wait_for_settlement.ok.format(self.alias, payment_hash, res.unwrap()))
+        else:
+            self.log(LOG_ERROR, self.logs.wait_for_settlement.err.format(self.alias, payment_hash, res.unwrap_err()))
+        return res
+
+    @staticmethod
+    def page_with_cursor(
+            fetch: Callable[[int], Tuple[Sequence[T], int]],
+            page_size: int,
+            cursor_path: str | None,
+            index_of: Callable[[T], int],
+            is_final: Callable[[T], bool],
+    ) -> Iterator[T]:
+        """
+        yield every item of fetch(index_offset) -> (items, last_index_offset) until a short page
+            the cursor advances once a whole page has been consumed, so a stopped run repeats at most one page
+            but never past an item that can still change state (state changes keep the index),
+            the next run starts again at the first one that wasn't final, so its outcome is yielded too
+        """
+        cursor = FileCursor(cursor_path) if cursor_path is not None else None
+        index_offset = cursor.load() if cursor is not None else 0
+        held_at: int | None = None # offset just before the first item that wasn't final
+        while True:
+            items, last_index_offset = fetch(index_offset)
+            for item in items:
+                if held_at is None and not is_final(item):
+                    held_at = index_of(item) - 1
+                yield item
+            if items:
+                index_offset = last_index_offset
+                if cursor is not None:
+                    cursor.save(index_offset if held_at is None else held_at)
+            if len(items) < page_size:
+                return
+
+    def iter_invoices(self, page_size: int = 1000, cursor_path: str | None = None, is_pending_only: bool = False) -> Iterator[ln.Invoice]:
+        """every invoice after the cursor, oldest first, see page_with_cursor() for how the cursor moves"""
+        def fetch(index_offset: int) -> Tuple[Sequence[ln.Invoice], int]:
+            res = self.stub.ListInvoices(ln.ListInvoiceRequest(
+                pending_only=is_pending_only,
+                index_offset=index_offset,
+                num_max_invoices=page_size
+            ))
+            return res.invoices, res.last_index_offset
+        is_final = lambda invoice: invoice.state in [ln.Invoice.SETTLED, ln.Invoice.CANCELED]
+        return self.page_with_cursor(fetch, page_size, cursor_path, lambda invoice: invoice.add_index, is_final)
+
+    def iter_payments(self, page_size: int = 1000, cursor_path: str | None = None, is_include_incomplete: bool = True) -> Iterator[ln.Payment]:
+        """every payment after the cursor, oldest first, in-flight payments hold the cursor like open invoices"""
+        def fetch(index_offset: int) -> Tuple[Sequence[ln.Payment], int]:
+            res = self.stub.ListPayments(ln.ListPaymentsRequest(
+                include_incomplete=is_include_incomplete,
+                index_offset=index_offset,
+                max_payments=page_size
+            ))
+            return res.payments, res.last_index_offset
+        is_final = lambda payment: payment.status in [ln.Payment.SUCCEEDED, ln.Payment.FAILED]
+        return self.page_with_cursor(fetch, page_size, cursor_path, lambda payment: payment.payment_index, is_final)
+
     def pay_invoice(self, pay_invoice_req: PayInvoiceRequest) -> Result[str, str]:
         """BitcoinLightingNode"""
-        args = {'payment_request': pay_invoice_req.invoice, 'fee_limit': ln.FeeLimit(fixed=pay_invoice_req.fee_limit_sats)}
-        if pay_invoice_req.outgoing_channel_id:
-            args['outgoing_chan_id'] = pay_invoice_req.outgoing_channel_id
-        response = None
+        return self.send_payment(pay_invoice_req)
+
+    def send_payment(self, pay_invoice_req: PayInvoiceRequest, on_update: Callable[[ln.Payment], None] | None = None) -> Result[str, str]:
+        """Ok(preimage), streams in-flight updates to `on_update` when given"""
+        payment_stream = self.routerstub.SendPaymentV2(self.to_send_payment_request(pay_invoice_req, on_update is not None))
+        return self.await_payment(payment_stream, pay_invoice_req, on_update)
+
+    def track_payment(self, payment_hash: str, on_update: Callable[[ln.Payment], None] | None = None) -> Result[str, str]:
+        """Ok(preimage) of a payment already sent, e.g. one still in flight after a restart"""
+        payment_stream = self.routerstub.TrackPaymentV2(router.TrackPaymentRequest(
+            payment_hash=bytes.fromhex(payment_hash),
+            no_inflight_updates=on_update is None
+        ))
+        return self.await_payment(payment_stream, payment_hash, on_update)
+
+    def await_payment(self, payment_stream: Iterator[ln.Payment], pay_invoice_req: PayInvoiceRequest | str, on_update: Callable[[ln.Payment], None] | None) -> Result[str, str]:
         try:
-            response = self.stub.SendPaymentSync(ln.SendRequest(**args)) # type: ignore
-        except Exception as e:
-            if e.details: # type: ignore
-                self.log(LOG_ERROR, msg.err.format(self.alias, e.details(), pay_invoice_req)) # type: ignore
-                return Err(e.details()) # type: ignore
-            self.log(LOG_ERROR, self.logs.pay_invoice.err.format(self.alias, e, pay_invoice_req))
-            return Err(str(e))
-        if response.payment_error:
-            self.log(LOG_ERROR, self.logs.pay_invoice.err.format(self.alias, response.payment_error, pay_invoice_req))
-            return Err(response.payment_error)
-        preimage = response.payment_preimage.hex()
-        self.log(LOG_INFO, self.logs.pay_invoice.ok.format(self.alias, pay_invoice_req, preimage))
-        return Ok(preimage)
+            for payment in payment_stream:
+                if on_update is not None:
+                    on_update(payment)
+                self.log(LOG_INFO, self.logs.payment_update.ok.format(self.alias, payment.payment_hash, ln.Payment.PaymentStatus.Name(payment.status), len(payment.htlcs)))
+                if payment.status == ln.Payment.SUCCEEDED:
+                    self.log(LOG_INFO, self.logs.pay_invoice.ok.format(self.alias, pay_invoice_req, payment.payment_preimage))
+                    return Ok(payment.payment_preimage)
+                if payment.status == ln.Payment.FAILED:
+                    reason = ln.PaymentFailureReason.Name(payment.failure_reason)
+                    self.log(LOG_ERROR, self.logs.pay_invoice.err.format(self.alias, reason, pay_invoice_req))
+                    return Err(reason)
+        except grpc.RpcError as e:
+            self.log(LOG_ERROR, self.logs.pay_invoice.err.format(self.alias, e.details(), pay_invoice_req))
+            return Err(e.details())
+        self.log(LOG_ERROR, self.logs.pay_invoice.err.format(self.alias, "payment stream ended without a final status", pay_invoice_req))
+        return Err("payment stream ended without a final status")
 
     def get_address(self) -> Result[str, str]:
         """BitcoinLightingNode"""
@@ -195,23 +583,35 @@ class Lnd(BitcoinLightningNode):
 
     def send_onchain(self, send_onchain_req: SendOnchainRequest) -> Result[str, str]:
         """BitcoinLightingNode"""
-        send_request = ln.SendCoinsRequest(
-            addr=send_onchain_req.dest_addr,
-            amount=send_onchain_req.amount_sats,
-            sat_per_vbyte=send_onchain_req.vbyte_sats
-        )
-        send_response = self.stub.SendCoins(send_request)
+        send_response = self.stub.SendCoins(self.to_send_coins_request(send_onchain_req))
         txid: str = send_response.txid
         self.log(LOG_INFO, self.logs.send_onchain.ok.format(self.alias, send_onchain_req, txid))
         return Ok(txid)
 
+    def send_onchain_many(self, send_onchain_reqs: List[SendOnchainRequest]) -> Result[str, str]:
+        """BitcoinLightingNode"""
+        if not send_onchain_reqs:
+            return Err("no outputs requested")
+        outputs: Dict[str, int] = {}
+        for send_onchain_req in send_onchain_reqs:
+            # one output per address, repeated addresses are summed
+            outputs[send_onchain_req.dest_addr] = outputs.get(send_onchain_req.dest_addr, 0) + send_onchain_req.amount_sats
+        send_many_request = ln.SendManyRequest(
+            AddrToAmount=outputs,
+            sat_per_vbyte=max(send_onchain_req.vbyte_sats for send_onchain_req in send_onchain_reqs)
+        )
+        try:
+            send_many_response = self.stub.SendMany(send_many_request)
+        except grpc.RpcError as e:
+            self.log(LOG_ERROR, self.logs.send_onchain_many.err.format(self.alias, e.details()))
+            return Err(e.details())
+        txid: str = send_many_response.txid
+        self.log(LOG_INFO, self.logs.send_onchain_many.ok.format(self.alias, outputs, txid))
+        return Ok(txid)
+
     def get_unconfirmed_balance(self) -> Result[int, str]:
         """BitcoinLightingNode"""
-        unconfirmed = 0
-        txs = self.get_txns(start_height=0, end_height=-1).unwrap().transactions
-        txns = list(filter(lambda x: x.num_confirmations == 0, txs))
-        for tx in txns:
-            unconfirmed += tx.amount
+        unconfirmed = self.unconfirmed_tracker.get_unconfirmed_balance().unwrap()
         self.log(LOG_INFO, self.logs.get_unconfirmed_balance.ok.format(self.alias, unconfirmed))
         return Ok(unconfirmed)
 
@@ -225,14 +625,17 @@ class Lnd(BitcoinLightningNode):
 
     def decode_invoice(self, invoice: str) -> Result[DecodedInvoice, str]:
         """BitcoinLightingNode"""
-        request = ln.PayReqString(pay_req=invoice)
-        decoded_req:ln.PayReq = self.stub.DecodePayReq(request)
-        decoded = DecodedInvoice(
-            decoded_req.destination,
-            decoded_req.payment_hash,
-            decoded_req.num_satoshis,
-            decoded_req.description
-        )
+        cached = self.invoice_cache.get(invoice)
+        if cached is not None:
+            return Ok(cached)
+        local = Bolt11.decode(invoice)
+        if isinstance(local, Ok):
+            decoded = local.unwrap()
+        else: # let the node have the final word on anything the local parser rejects
+            request = ln.PayReqString(pay_req=invoice)
+            decoded_req:ln.PayReq = self.stub.DecodePayReq(request)
+            decoded = self.to_decoded_invoice(decoded_req)
+        self.invoice_cache.put_decoded(invoice, decoded)
         self.log(LOG_INFO, self.logs.decode_invoice.ok.format(self.alias, invoice, decoded))
         return Ok(decoded)
 
@@ -252,8 +655,22 @@ class Lnd(BitcoinLightningNode):
         self.log(LOG_INFO, self.logs.get_pubkey.ok.format('LND', info.identity_pubkey))
         return Ok(info.identity_pubkey)
 
+    def get_own_pubkey(self) -> Result[str, str]:
+        """BitcoinLightningNode"""
+        try:
+            return Ok(self.pubkey)
+        except grpc.RpcError as e:
+            return Err(e.details())
+
     def get_alias(self, pubkey: str) -> Result[str, str]:
         """BitcoinLightingNode"""
-        alias = self.stub.GetNodeInfo(ln.NodeInfoRequest(pub_key=pubkey)).node.alias
-        self.log(LOG_INFO, self.logs.get_alias.ok.format(alias, pubkey, alias))
+        # alias_cache first, then the in-memory graph, GetNodeInfo only for nodes neither knows
+        alias = self.alias_cache.get(pubkey)
+        if alias is not None:
+            return Ok(alias)
+        alias = self.graph.get_alias(pubkey) if self.graph is not None else None
+        if not alias:
+            alias = self.stub.GetNodeInfo(ln.NodeInfoRequest(pub_key=pubkey)).node.alias
+            self.log(LOG_INFO, self.logs.get_alias.ok.format(alias, pubkey, alias))
+        self.cache_alias(pubkey, alias)
         return Ok(alias)
\ No newline at end of file
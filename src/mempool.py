@@ -4,11 +4,11 @@ mempool.py
 An implementation of Mempool.space API as a TrustedSwapService
 usage: add your mempool credentials to use a self-hosted instance
 """
-import requests # type: ignore
 from box import Box
 from result import Result, Ok, Err
 from const import LOG_GAP, LOG_INFO
 from console import console
+from trusted_swap_service import HttpTransport
 
 MEMPOOL_API_URL = "https://mempool.space/"
 
@@ -21,7 +21,8 @@ class MempoolCreds:
         self.api_url = api_url
 
 class Mempool:
-    def __init__(self, creds: MempoolCreds) -> None:
+    def __init__(self, creds: MempoolCreds, transport: HttpTransport | None = None) -> None:
+        self.transport = transport or HttpTransport.shared()
         self.api_url = f"{creds.api_url}api/v1/"
         self.alias = "MEMPOOL"
         self.log = console.log
@@ -36,7 +37,7 @@ class Mempool:
         })
 
     def mempool_request(self, uri_path: str) -> Result[Box, str]:
-        res = Box(requests.get(
+        res = Box(self.transport.get(
             self.api_url + uri_path,
         ).json())
         # TODO: handle error
@@ -4,14 +4,12 @@ nicehash.py
 An implementation of Nicehash Wallet API as a TrustedSwapService
 usage: add your nicehash credentials
 """
-from datetime import datetime
-from time import mktime
+import time
 import uuid
 import hmac
-import requests # type: ignore
 import json
 from hashlib import sha256
-from trusted_swap_service import TrustedSwapService
+from trusted_swap_service import TrustedSwapService, HttpTransport
 from const import COIN_SATS, LOG_ERROR, LOG_INFO
 from typing import Any, Dict
 from result import Result, Ok, Err
@@ -33,64 +31,57 @@ class NicehashCreds:
         self.org_id = org_id
         self.funding_key = funding_key
 
-class Nicehash(TrustedSwapService):
+class NicehashSigner:
+    """
+    X-Auth headers for one credential, the hmac is keyed once with `api_key\\0` already fed in
+        and the constant `\\0\\0org_id\\0\\0` middle of the message is prebuilt,
+        so signing a request is a copy() and one update of the joined variable parts
+    """
     def __init__(self, creds: NicehashCreds) -> None:
-        super().__init__() # init logger from parent class
-        self.creds = creds 
-        self.alias = f"NICEHASH-{creds.api_key[:5]}"
+        self.org_id = creds.org_id
+        self.auth_prefix = creds.api_key + ":"
+        self.mac = hmac.new(creds.api_secret.encode(), creds.api_key.encode() + b"\x00", sha256)
+        self.org_part = b"\x00\x00" + creds.org_id.encode() + b"\x00\x00"
 
-    def nicehash_request(self, method: str, path: str, query: str, body: Dict | None) -> Box: # type: ignore
-        xtime = self.get_epoch_ms_from_now()
-        xnonce = str(uuid.uuid4())
-        message = bytearray(self.creds.api_key, 'utf-8')
-        message += bytearray('\x00', 'utf-8')
-        message += bytearray(str(xtime), 'utf-8')
-        message += bytearray('\x00', 'utf-8')
-        message += bytearray(xnonce, 'utf-8')
-        message += bytearray('\x00', 'utf-8')
-        message += bytearray('\x00', 'utf-8')
-        message += bytearray(self.creds.org_id, 'utf-8')
-        message += bytearray('\x00', 'utf-8')
-        message += bytearray('\x00', 'utf-8')
-        message += bytearray(method, 'utf-8')
-        message += bytearray('\x00', 'utf-8')
-        message += bytearray(path, 'utf-8')
-        message += bytearray('\x00', 'utf-8')
-        message += bytearray(query, 'utf-8')
-        if body:
-            body_json = json.dumps(body)
-            message += bytearray('\x00', 'utf-8')
-            message += bytearray(body_json, 'utf-8')
+    def sign(self, xtime: str, xnonce: str, method: str, path: str, query: str, body_json: str | None) -> str:
+        mac = self.mac.copy()
+        parts = [xtime.encode(), b"\x00", xnonce.encode(), self.org_part, method.encode(), b"\x00", path.encode(), b"\x00", query.encode()]
+        if body_json:
+            parts += [b"\x00", body_json.encode()]
+        mac.update(b"".join(parts))
+        return mac.hexdigest()
 
-        digest = hmac.new(bytearray(self.creds.api_secret,
-                          'utf-8'), message, sha256).hexdigest()
-        xauth = self.creds.api_key + ":" + digest
-        headers: dict[str, Any] = {
-            'X-Time': str(xtime),
+    def headers(self, method: str, path: str, query: str, body_json: str | None) -> Dict[str, Any]:
+        xtime = str(int(time.time() * 1000))
+        xnonce = str(uuid.uuid4())
+        return {
+            'X-Time': xtime,
             'X-Nonce': xnonce,
-            'X-Auth': xauth,
+            'X-Auth': self.auth_prefix + self.sign(xtime, xnonce, method, path, query, body_json),
             'Content-Type': 'application/json',
-            'X-Organization-Id': self.creds.org_id,
+            'X-Organization-Id': self.org_id,
             'X-Request-Id': str(uuid.uuid4())
         }
-        s = requests.Session()
-        s.headers = headers
+
+class Nicehash(TrustedSwapService):
+    def __init__(self, creds: NicehashCreds, transport: HttpTransport | None = None) -> None:
+        super().__init__(transport) # init logger and http transport from parent class
+        self.creds = creds 
+        self.alias = f"NICEHASH-{creds.api_key[:5]}"
+        self.signer = NicehashSigner(creds)
+
+    def nicehash_request(self, method: str, path: str, query: str, body: Dict | None) -> Box: # type: ignore
+        body_json = json.dumps(body) if body else None
+        headers = self.signer.headers(method, path, query, body_json)
         url = NICEHASH_API_URL + path
         if query:
             url += '?' + query
         if body:
-            response = s.request(method, url, data=body_json)
+            response = self.transport.request(method, url, headers=headers, data=body_json)
         else:
-            response = s.request(method, url)
+            response = self.transport.request(method, url, headers=headers)
         return Box(response.json())
     
-    @staticmethod
-    def get_epoch_ms_from_now() -> int:
-        now = datetime.now()
-        now_ec_since_epoch = mktime(
-            now.timetuple()) + now.microsecond / 1000000.0
-        return int(now_ec_since_epoch * 1000)
-
     def get_address(self) -> Result[str, str]:
         """TrustedSwapService"""
         res = self.nicehash_request(
@@ -166,7 +157,7 @@ class Nicehash(TrustedSwapService):
         self.log(LOG_INFO, self.logs.get_invoice.ok.format(self.alias, invoice, sats))
         return Ok(invoice)
   
-    def pay_invoice(self, sats: int, invoice: str) -> Result[str, str]:
+    def pay_invoice(self, sats: int, invoice: str) -> Result[int, str]:
         """TrustedSwapService"""
         body1 = {
             "address": invoice,
@@ -195,4 +186,4 @@ class Nicehash(TrustedSwapService):
         res3 = self.nicehash_request("GET", f"/main/api/v2/accounting/withdrawal2/BTC/{res2.id}", "", {})
         fee = int((res3.amount - res3.amountReceived) * COIN_SATS)
         self.log(LOG_INFO, self.logs.pay_invoice.ok.format(self.alias, invoice, sats, fee))
-        return Ok(None)
\ No newline at end of file
+        return Ok(fee)
\ No newline at end of file
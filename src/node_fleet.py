@@ -0,0 +1,124 @@
+"""
+node_fleet.py
+---
+Run the same call against many lightning nodes at once
+usage: wrap every configured BitcoinLightningNode, read fleet-wide snapshots keyed by node pubkey
+"""
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from box import Box
+from bitcoin_lightning_node import BitcoinLightningNode, ActiveOpenChannel, PendingOpenChannel
+from console import console
+from const import LOG_GAP, LOG_ERROR
+from typing import Any, Callable, Dict, List, TypeVar
+from result import Result, Ok, Err
+
+T = TypeVar('T')
+
+class NodeFleet:
+    """
+    Fan a call out to every node on a thread pool
+        a fleet-wide call takes about as long as the slowest node
+        one node failing (Err, exception or `timeout_secs`) never hides the other results
+        results are keyed by `keys`, by default each node's pubkey: resolved once inside the
+        node's first task and cached, so a node never reached so far is keyed by its grpc host
+        (or its position) rather than blocking the caller on an RPC
+        a node whose call outlived the timeout gets no new task until that call returns,
+        so a hung node holds at most one worker and can't starve the others
+    """
+    def __init__(self, nodes: List[BitcoinLightningNode], timeout_secs: float | None = None, keys: List[str] | None = None) -> None:
+        self.nodes = nodes
+        self.keys = keys
+        self.pubkeys: List[str | None] = [None] * len(nodes)
+        self.timeout_secs = timeout_secs
+        self.lock = threading.Lock()
+        self.running: List[Future[Result[Any, str]] | None] = [None] * len(nodes) # a node's call still running past its timeout
+        self.pool = ThreadPoolExecutor(max_workers=max(len(nodes), 1), thread_name_prefix="fleet")
+        self.log = console.log
+        self.logs = Box({
+            "fan_out": {
+                "err": LOG_GAP.join(["{}", "fan_out", "call: {}, node: {}, error: {}"])
+            }
+        })
+
+    def node_key(self, index: int) -> str:
+        """explicit key, else the cached pubkey, else the grpc host (or position) until the pubkey resolves"""
+        if self.keys is not None:
+            return self.keys[index]
+        pubkey = self.pubkeys[index]
+        if pubkey is not None:
+            return pubkey
+        creds = getattr(self.nodes[index], 'creds', None)
+        return getattr(creds, 'grpc_host', None) or f"node-{index}"
+
+    def call_node(self, index: int, call: Callable[[BitcoinLightningNode], Result[T, str]]) -> Result[T, str]:
+        node = self.nodes[index]
+        if self.keys is None and self.pubkeys[index] is None:
+            try:
+                pubkey = node.get_own_pubkey()
+                if isinstance(pubkey, Ok):
+                    self.pubkeys[index] = pubkey.unwrap()
+            except Exception:
+                pass # stays keyed by host, retried on the next call
+        try:
+            return call(node)
+        except Exception as e:
+            return Err(str(e) or type(e).__name__)
+
+    def submit(self, index: int, call: Callable[[BitcoinLightningNode], Result[T, str]]) -> Future[Result[T, str]] | None:
+        with self.lock:
+            running = self.running[index]
+            if running is not None and not running.done():
+                return None
+            self.running[index] = None
+            return self.pool.submit(self.call_node, index, call)
+
+    def fan_out(self, name: str, call: Callable[[BitcoinLightningNode], Result[T, str]]) -> Dict[str, Result[T, str]]:
+        futures = [self.submit(i, call) for i in range(len(self.nodes))]
+        deadline = None if self.timeout_secs is None else time.monotonic() + self.timeout_secs
+        results: Dict[str, Result[T, str]] = {}
+        for i, future in enumerate(futures):
+            if future is None:
+                res: Result[T, str] = Err(f"previous call still running after {self.timeout_secs}s timeout")
+            else:
+                try:
+                    res = future.result(None if deadline is None else max(deadline - time.monotonic(), 0))
+                except TimeoutError:
+                    # a task still queued never runs, a running one blocks new tasks for its node
+                    if not future.cancel():
+                        with self.lock:
+                            self.running[i] = future
+                    res = Err(f"timed out after {self.timeout_secs}s")
+            key = self.node_key(i)
+            if isinstance(res, Err):
+                self.log(LOG_ERROR, self.logs.fan_out.err.format("fleet", name, key, res.unwrap_err()))
+            results[key] = res
+        return results
+
+    def get_confirmed_balance(self) -> Dict[str, Result[int, str]]:
+        return self.fan_out("get_confirmed_balance", lambda node: node.get_confirmed_balance())
+
+    def get_unconfirmed_balance(self) -> Dict[str, Result[int, str]]:
+        return self.fan_out("get_unconfirmed_balance", lambda node: node.get_unconfirmed_balance())
+
+    def get_opened_channels(self) -> Dict[str, Result[List[ActiveOpenChannel], str]]:
+        return self.fan_out("get_opened_channels", lambda node: node.get_opened_channels())
+
+    def get_pending_open_channels(self) -> Dict[str, Result[List[PendingOpenChannel], str]]:
+        return self.fan_out("get_pending_open_channels", lambda node: node.get_pending_open_channels())
+
+    def snapshot(self) -> Dict[str, Result[Box, str]]:
+        """balances and channels of every node, each node fetched in one task"""
+        def node_snapshot(node: BitcoinLightningNode) -> Result[Box, str]:
+            snapshot = Box()
+            for name in ["get_confirmed_balance", "get_unconfirmed_balance", "get_opened_channels", "get_pending_open_channels"]:
+                res = getattr(node, name)()
+                if isinstance(res, Err):
+                    return res
+                snapshot[name[len("get_"):]] = res.unwrap()
+            return Ok(snapshot)
+        return self.fan_out("snapshot", node_snapshot)
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=False)
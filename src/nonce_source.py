@@ -0,0 +1,97 @@
+"""
+nonce_source.py
+---
+Strictly increasing nonces for signed exchange requests
+usage: NonceSource.shared("kraken", creds.api_key, creds.nonce_path).next() for every signed call
+"""
+import os
+import time
+import asyncio
+import threading
+import contextlib
+from console import console
+from const import LOG_ERROR
+from typing import AsyncIterator, ContextManager, Dict, Tuple
+
+RESERVE_MS = 60_000 # nonces handed out before the persisted high-water mark is moved again
+
+class NonceSource:
+    """
+    Millisecond nonces that never repeat or go backwards, even when called
+        from many threads (or async tasks) within the same millisecond:
+        next() returns max(now_ms, last + 1) under a lock, it never sleeps
+        with `path` set, a high-water mark `RESERVE_MS` ahead of the last nonce is persisted,
+        so after a restart (or a clock step back) nonces continue above anything already used
+        one source per (service, api key), exchanges only require nonces to increase per key
+    unique nonces alone don't make parallel requests safe: Kraken rejects a nonce lower than
+        the last one it received, and two requests can arrive out of order, so a client either
+        sends inside dispatch() / async_dispatch(), which share one lock across threads, tasks
+        and event loops, or the key has a nonce window configured on the exchange and the
+        client passes is_serialized=False to send in parallel
+    """
+    sources: Dict[Tuple[str, str], 'NonceSource'] = {}
+    sources_lock = threading.Lock()
+
+    def __init__(self, path: str | None = None) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.dispatch_lock = threading.Lock() # held from taking a nonce until its request is answered
+        self.last = 0
+        self.reserved = 0
+        if path is not None:
+            self.last = self.reserved = self.load()
+
+    @staticmethod
+    def shared(service: str, key: str, path: str | None = None) -> 'NonceSource':
+        """process-wide source for `key` of `service`, `path` is fixed by the first call"""
+        with NonceSource.sources_lock:
+            source = NonceSource.sources.get((service, key))
+            if source is None:
+                source = NonceSource.sources[(service, key)] = NonceSource(path)
+            elif path is not None and path != source.path:
+                console.log(LOG_ERROR, f"nonce source for {service}-{key[:5]} already persists to {source.path}, ignoring {path}")
+            return source
+
+    def dispatch(self, is_serialized: bool = True) -> ContextManager[object]:
+        """hold `dispatch_lock` around taking a nonce and sending its request, a no-op when not serialized"""
+        return self.dispatch_lock if is_serialized else contextlib.nullcontext()
+
+    @contextlib.asynccontextmanager
+    async def async_dispatch(self, is_serialized: bool = True) -> AsyncIterator[None]:
+        """dispatch() for coroutines: the same lock, waited for on an executor thread so the loop keeps running"""
+        if not is_serialized:
+            yield
+            return
+        if not self.dispatch_lock.acquire(blocking=False):
+            acquired = asyncio.get_running_loop().run_in_executor(None, self.dispatch_lock.acquire)
+            try:
+                await asyncio.shield(acquired)
+            except asyncio.CancelledError:
+                # the executor still takes the lock, hand it straight back
+                acquired.add_done_callback(lambda _: self.dispatch_lock.release())
+                raise
+        try:
+            yield
+        finally:
+            self.dispatch_lock.release()
+
+    def load(self) -> int:
+        try:
+            with open(self.path) as f: # type: ignore
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return 0
+
+    def save(self, reserved: int) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(str(reserved))
+        os.replace(tmp_path, self.path) # type: ignore
+
+    def next(self) -> int:
+        with self.lock:
+            self.last = max(int(time.time() * 1000), self.last + 1)
+            if self.path is not None and self.last >= self.reserved:
+                self.reserved = self.last + RESERVE_MS
+                self.save(self.reserved)
+            return self.last
\ No newline at end of file
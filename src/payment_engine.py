@@ -0,0 +1,36 @@
+"""
+payment_engine.py
+---
+Keep many lightning payments in flight at once through the LND router
+usage: submit PayInvoiceRequests, collect the Ok(preimage)/Err(reason) futures
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from grpc_generated import lightning_pb2 as ln
+from bitcoin_lightning_node import PayInvoiceRequest
+from lnd import Lnd
+from typing import Callable, List
+from result import Result
+
+class PaymentEngine:
+    """
+    Every payment is one SendPaymentV2 stream on the node's shared HTTP/2 channel,
+        `max_in_flight` bounds how many streams are open at once
+        `on_update` receives each streamed lnrpc.Payment (htlc attempts, status changes)
+    """
+    def __init__(self, node: Lnd, max_in_flight: int = 32, on_update: Callable[[ln.Payment], None] | None = None) -> None:
+        self.node = node
+        self.on_update = on_update
+        self.pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=f"{node.alias}-payments")
+
+    def submit(self, req: PayInvoiceRequest) -> Future[Result[str, str]]:
+        return self.pool.submit(self.node.send_payment, req, self.on_update)
+
+    def track(self, payment_hash: str) -> Future[Result[str, str]]:
+        return self.pool.submit(self.node.track_payment, payment_hash, self.on_update)
+
+    def pay_all(self, reqs: List[PayInvoiceRequest]) -> List[Result[str, str]]:
+        """pay concurrently, results in the order of `reqs`"""
+        return [future.result() for future in [self.submit(req) for req in reqs]]
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.pool.shutdown(wait=wait)
@@ -0,0 +1,75 @@
+"""
+payout_batcher.py
+---
+Collect onchain payouts over a time window and pay them in one transaction
+usage: submit SendOnchainRequests from anywhere, each caller gets the shared txid
+"""
+import threading
+from concurrent.futures import Future
+from box import Box
+from bitcoin_lightning_node import BitcoinLightningNode, SendOnchainRequest
+from console import console
+from const import LOG_GAP, LOG_INFO
+from typing import Dict, List, Tuple
+from result import Result, Ok
+
+class PayoutBatcher:
+    """
+    The first submit opens a window of `window_secs`, when it closes (or `max_outputs` is reached)
+        everything collected is flushed through node.send_onchain_many() as a single transaction
+        and the Result is fanned back to every caller's future
+    """
+    def __init__(self, node: BitcoinLightningNode, window_secs: float = 60, max_outputs: int = 100) -> None:
+        self.node = node
+        self.window_secs = window_secs
+        self.max_outputs = max_outputs
+        self.lock = threading.Lock()
+        self.pending: List[Tuple[SendOnchainRequest, Future[Result[str, str]]]] = []
+        self.timer: threading.Timer | None = None
+        self.sent_sats: Dict[str, int] = {} # dest_addr -> sats paid out through this batcher
+        self.log = console.log
+        self.logs = Box({
+            "flush": {
+                "ok": LOG_GAP.join(["{}", "flush", "outputs: {}, sats: {}"]),
+            }
+        })
+
+    def submit(self, req: SendOnchainRequest) -> Future[Result[str, str]]:
+        future: Future[Result[str, str]] = Future()
+        with self.lock:
+            self.pending.append((req, future))
+            is_full = len(self.pending) >= self.max_outputs
+            if self.timer is None and not is_full:
+                self.timer = threading.Timer(self.window_secs, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+        if is_full:
+            self.flush()
+        return future
+
+    def flush(self) -> None:
+        with self.lock:
+            batch, self.pending = self.pending, []
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not batch:
+            return
+        reqs = [req for req, _ in batch]
+        self.log(LOG_INFO, self.logs.flush.ok.format("payout_batcher", len(reqs), sum(req.amount_sats for req in reqs)))
+        try:
+            res = self.node.send_onchain_many(reqs)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        if isinstance(res, Ok):
+            with self.lock:
+                for req in reqs:
+                    self.sent_sats[req.dest_addr] = self.sent_sats.get(req.dest_addr, 0) + req.amount_sats
+        for _, future in batch:
+            future.set_result(res)
+
+    def close(self) -> None:
+        """pay out whatever is still waiting"""
+        self.flush()
@@ -0,0 +1,80 @@
+"""
+peer_index.py
+---
+Set of connected peer pubkeys for an LND node
+usage: Lnd.is_peer_with() and Lnd.ensure_peers() read from it, Lnd.use_peer_index() makes it event driven
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from grpc_generated import lightning_pb2 as ln
+from subscription import Subscription
+from typing import Dict, Set, TYPE_CHECKING
+from result import Result, Ok, Err
+if TYPE_CHECKING:
+    from lnd import Lnd
+
+class PeerIndex:
+    """
+    Hashed set of connected peers, seeded from ListPeers
+        once started, SubscribePeerEvents keeps it current and lookups cost no RPC
+        until then every lookup or batch does a single ListPeers
+    """
+    def __init__(self, node: 'Lnd') -> None:
+        self.node = node
+        self.lock = threading.Lock()
+        self.peers: Set[str] = set()
+        self.subscription: Subscription | None = None
+
+    def start(self, timeout: float | None = None) -> bool:
+        self.subscription = Subscription(
+            f"{self.node.alias}-peer-events",
+            lambda: self.node.stub.SubscribePeerEvents(ln.PeerEventSubscription()),
+            self.on_event,
+            self.resync
+        )
+        self.subscription.start()
+        return self.subscription.wait_synced(timeout)
+
+    def stop(self) -> None:
+        if self.subscription is not None:
+            self.subscription.stop()
+
+    def resync(self) -> None:
+        peers = self.node.stub.ListPeers(ln.ListPeersRequest()).peers
+        with self.lock:
+            self.peers = {peer.pub_key for peer in peers}
+
+    def on_event(self, event: ln.PeerEvent) -> None:
+        with self.lock:
+            if event.type == ln.PeerEvent.PEER_ONLINE:
+                self.peers.add(event.pub_key)
+            elif event.type == ln.PeerEvent.PEER_OFFLINE:
+                self.peers.discard(event.pub_key)
+
+    def is_synced(self) -> bool:
+        return self.subscription is not None and self.subscription.is_synced.is_set()
+
+    def is_peer_with(self, pubkey: str) -> bool:
+        if not self.is_synced():
+            self.resync()
+        return pubkey in self.peers
+
+    def connect(self, pubkey: str, host: str) -> Result[None, str]:
+        res = self.node.add_peer(pubkey, host)
+        if isinstance(res, Err) and 'already connected' not in res.unwrap_err():
+            return res
+        with self.lock:
+            self.peers.add(pubkey)
+        return Ok(None)
+
+    def ensure_peers(self, peers: Dict[str, str], max_workers: int = 16) -> Dict[str, Result[None, str]]:
+        """connect every missing pubkey -> host concurrently, results keyed by pubkey"""
+        if not self.is_synced():
+            self.resync()
+        results: Dict[str, Result[None, str]] = {pubkey: Ok(None) for pubkey in peers if pubkey in self.peers}
+        missing = [pubkey for pubkey in peers if pubkey not in results]
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+                for pubkey, res in zip(missing, pool.map(lambda pubkey: self.connect(pubkey, peers[pubkey]), missing)):
+                    results[pubkey] = res
+        return results
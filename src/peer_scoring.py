@@ -0,0 +1,178 @@
+"""
+peer_scoring.py
+---
+Rank every node of the network graph as a channel-open candidate
+usage: PeerScorer(graph).rank(...) -> OpenChannelRequest templates, best first
+"""
+import numpy as np
+import numpy.typing as npt
+import scipy.sparse as sp
+from concurrent.futures import ProcessPoolExecutor
+from bitcoin_lightning_node import OpenChannelRequest
+from graph import GraphTables, POLICY_KNOWN, POLICY_DISABLED
+from typing import Dict, List, Set
+
+DEFAULT_WEIGHTS = {
+    "capacity": 1.0, # log of total channel capacity
+    "degree": 1.0, # log of open channel count
+    "betweenness": 2.0, # sampled shortest-path betweenness
+    "inbound_ppm": 0.5, # median fee others charge to route into the node
+}
+
+class PeerScorer:
+    """
+    Score nodes with sparse-matrix math over a ChannelGraph or GraphSnapshot
+        features are scaled to [0, 1] and combined with `weights`
+        betweenness is approximated from `samples` BFS sources (Brandes),
+        spread over `max_workers` processes when given
+    """
+    def __init__(self, graph: GraphTables, weights: Dict[str, float] | None = None, samples: int = 256, max_workers: int | None = None, seed: int = 0) -> None:
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.samples = samples
+        self.max_workers = max_workers
+        self.seed = seed
+        with graph.lock:
+            self.pubkeys = list(graph.pubkeys)
+            self.addresses = list(graph.addresses)
+            is_open = np.asarray(graph.is_open, dtype=np.uint8).astype(bool)
+            self.node1 = np.asarray(graph.node1, dtype=np.uint32)[is_open].astype(np.int64)
+            self.node2 = np.asarray(graph.node2, dtype=np.uint32)[is_open].astype(np.int64)
+            self.capacity = np.asarray(graph.capacity, dtype=np.int64)[is_open].astype(np.float64)
+            # policy slot 2e is node1's policy, i.e. what node1 charges to forward into node2
+            slots = np.flatnonzero(is_open)
+            ppm = np.asarray(graph.ppm_fee, dtype=np.int64)
+            flags = np.asarray(graph.policy_flags, dtype=np.uint8)
+            self.ppm_into_node2 = ppm[2 * slots].astype(np.float64)
+            self.ppm_into_node1 = ppm[2 * slots + 1].astype(np.float64)
+            self.usable_into_node2 = (flags[2 * slots] & (POLICY_KNOWN | POLICY_DISABLED)) == POLICY_KNOWN
+            self.usable_into_node1 = (flags[2 * slots + 1] & (POLICY_KNOWN | POLICY_DISABLED)) == POLICY_KNOWN
+        self.num_nodes = len(self.pubkeys)
+
+    def adjacency(self) -> sp.csr_matrix:
+        """symmetric 0/1 matrix, parallel channels collapse into one link"""
+        rows = np.concatenate([self.node1, self.node2])
+        cols = np.concatenate([self.node2, self.node1])
+        adj = sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(self.num_nodes, self.num_nodes))
+        adj.data[:] = 1
+        return adj
+
+    def degree(self) -> npt.NDArray[np.float64]:
+        return np.bincount(np.concatenate([self.node1, self.node2]), minlength=self.num_nodes).astype(np.float64)
+
+    def total_capacity(self) -> npt.NDArray[np.float64]:
+        return np.bincount(np.concatenate([self.node1, self.node2]), weights=np.concatenate([self.capacity, self.capacity]), minlength=self.num_nodes).astype(np.float64)
+
+    def inbound_median_ppm(self) -> npt.NDArray[np.float64]:
+        """median fee rate of the enabled policies pointing into each node, nan without any"""
+        targets = np.concatenate([self.node2[self.usable_into_node2], self.node1[self.usable_into_node1]])
+        fees = np.concatenate([self.ppm_into_node2[self.usable_into_node2], self.ppm_into_node1[self.usable_into_node1]])
+        order = np.lexsort((fees, targets))
+        fees = fees[order]
+        counts = np.bincount(targets, minlength=self.num_nodes)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        medians = np.full(self.num_nodes, np.nan)
+        has = counts > 0
+        lower = fees[starts[has] + (counts[has] - 1) // 2]
+        upper = fees[starts[has] + counts[has] // 2]
+        medians[has] = (lower + upper) / 2
+        return medians
+
+    @staticmethod
+    def brandes(adj: sp.csr_matrix, sources: npt.NDArray[np.int64]) -> npt.NDArray[np.float64]:
+        """summed pair dependencies of `sources`, one level-synchronous BFS per source"""
+        # adj is symmetric, so full sparse mat-vecs replace row/column slicing
+        n = adj.shape[0]
+        centrality = np.zeros(n)
+        frontier_sigma = np.zeros(n)
+        coef = np.zeros(n)
+        for source in sources:
+            dist = np.full(n, -1)
+            sigma = np.zeros(n)
+            dist[source] = 0
+            sigma[source] = 1
+            levels = [np.array([source])]
+            while True:
+                frontier = levels[-1]
+                frontier_sigma[:] = 0
+                frontier_sigma[frontier] = sigma[frontier]
+                paths = adj @ frontier_sigma
+                nxt = np.flatnonzero((paths > 0) & (dist < 0))
+                if len(nxt) == 0:
+                    break
+                dist[nxt] = len(levels)
+                sigma[nxt] = paths[nxt]
+                levels.append(nxt)
+            delta = np.zeros(n)
+            for depth in range(len(levels) - 2, -1, -1):
+                below = levels[depth + 1]
+                coef[:] = 0
+                coef[below] = (1 + delta[below]) / sigma[below]
+                level = levels[depth]
+                delta[level] = sigma[level] * (adj @ coef)[level]
+            delta[source] = 0
+            centrality += delta
+        return centrality
+
+    def betweenness(self) -> npt.NDArray[np.float64]:
+        adj = self.adjacency()
+        rng = np.random.default_rng(self.seed)
+        sources = rng.choice(self.num_nodes, size=min(self.samples, self.num_nodes), replace=False)
+        if self.max_workers is None or self.max_workers < 2:
+            centrality = self.brandes(adj, sources)
+        else:
+            chunks = np.array_split(sources, self.max_workers)
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                centrality = np.sum(list(pool.map(PeerScorer.brandes, [adj] * len(chunks), chunks)), axis=0)
+        # undirected graph counts every pair twice, scale the sample up to all sources
+        return centrality / 2 * self.num_nodes / max(len(sources), 1)
+
+    @staticmethod
+    def scale(values: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        values = np.nan_to_num(values, nan=0.0)
+        top = values.max() if len(values) else 0
+        return values / top if top > 0 else values
+
+    def score(self) -> npt.NDArray[np.float64]:
+        features = {
+            "capacity": self.scale(np.log1p(self.total_capacity())),
+            "degree": self.scale(np.log1p(self.degree())),
+            "betweenness": self.scale(self.betweenness()),
+            "inbound_ppm": self.scale(np.log1p(self.inbound_median_ppm())),
+        }
+        return sum(self.weights[name] * values for name, values in features.items()) # type: ignore
+
+    def rank(
+            self,
+            capacity: int,
+            vbyte_sats: int,
+            top_n: int = 20,
+            exclude: Set[str] | None = None,
+            base_fee: int = 0,
+            cltv_delta: int = 40,
+            min_htlc_sats: int = 1,
+    ) -> List[OpenChannelRequest]:
+        """
+        best `top_n` reachable nodes not in `exclude` (own node, existing peers) as OpenChannelRequests,
+            ppm_fee starts at the median fee others charge into that node
+        """
+        scores = self.score()
+        medians = np.nan_to_num(self.inbound_median_ppm(), nan=0.0)
+        exclude = exclude or set()
+        reqs = []
+        for node_id in np.argsort(-scores, kind='stable'):
+            pubkey = self.pubkeys[node_id]
+            if pubkey in exclude or not self.addresses[node_id]:
+                continue
+            reqs.append(OpenChannelRequest(
+                peer_pubkey=pubkey,
+                peer_host=self.addresses[node_id],
+                capacity=capacity,
+                base_fee=base_fee,
+                ppm_fee=int(medians[node_id]),
+                cltv_delta=cltv_delta,
+                min_htlc_sats=min_htlc_sats,
+                vbyte_sats=vbyte_sats
+            ))
+            if len(reqs) >= top_n:
+                break
+        return reqs
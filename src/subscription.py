@@ -0,0 +1,89 @@
+"""
+subscription.py
+---
+Keep a gRPC server-streaming call open in the background
+usage: feed in-memory state from LND Subscribe* streams
+"""
+import time
+import threading
+import grpc
+from box import Box
+from typing import Any, Callable, Iterator
+from console import console
+from const import LOG_GAP, LOG_ERROR, LOG_INFO
+
+class Subscription:
+    """
+    Run a server-streaming call on a daemon thread and hand each message to `on_event`
+        `on_resync` runs after every (re)connect so state missed while disconnected is rebuilt
+        the stream is opened before resyncing so no event can fall between the two
+        any error, including one raised by a handler, reconnects after `retry_secs`,
+        doubled after each failure up to `max_retry_secs`, reset once a stream stayed up that long
+    """
+    def __init__(
+            self,
+            name: str,
+            open_stream: Callable[[], Iterator[Any]],
+            on_event: Callable[[Any], None],
+            on_resync: Callable[[], None],
+            retry_secs: float = 5,
+            max_retry_secs: float = 300,
+    ) -> None:
+        self.name = name
+        self.open_stream = open_stream
+        self.on_event = on_event
+        self.on_resync = on_resync
+        self.retry_secs = retry_secs
+        self.max_retry_secs = max_retry_secs
+        self.stream: Any = None
+        self.is_synced = threading.Event()
+        self.is_stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self.log = console.log
+        self.logs = Box({
+            "subscribe": {
+                "ok": LOG_GAP.join(["{}", "subscribe", "synced"]),
+                "err": LOG_GAP.join(["{}", "subscribe", "{}, retrying in {}s"])
+            }
+        })
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.is_stopped.set()
+        if self.stream is not None:
+            self.stream.cancel()
+
+    def wait_synced(self, timeout: float | None = None) -> bool:
+        return self.is_synced.wait(timeout)
+
+    def run(self) -> None:
+        delay = self.retry_secs
+        while not self.is_stopped.is_set():
+            synced_at = None
+            try:
+                self.stream = self.open_stream()
+                self.on_resync()
+                self.is_synced.set()
+                synced_at = time.monotonic()
+                self.log(LOG_INFO, self.logs.subscribe.ok.format(self.name))
+                for event in self.stream:
+                    self.on_event(event)
+            except grpc.RpcError as e:
+                if self.is_stopped.is_set():
+                    break
+                self.log(LOG_ERROR, self.logs.subscribe.err.format(self.name, e.details(), delay))
+            except Exception as e:
+                # a failing handler must not end the thread and freeze the state it feeds
+                if self.is_stopped.is_set():
+                    break
+                self.log(LOG_ERROR, self.logs.subscribe.err.format(self.name, repr(e), delay))
+                if self.stream is not None:
+                    self.stream.cancel()
+            finally:
+                self.is_synced.clear()
+            if synced_at is not None and time.monotonic() - synced_at > self.max_retry_secs:
+                delay = self.retry_secs
+            self.is_stopped.wait(delay)
+            delay = min(2 * delay, self.max_retry_secs)
\ No newline at end of file
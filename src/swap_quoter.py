@@ -0,0 +1,111 @@
+"""
+swap_quoter.py
+---
+Rank trusted swap services by what a liquidity round trip through them costs
+usage: await SwapQuoter([async_kraken, async_nicehash, async_wos]).quote(sats) -> VenueQuotes, cheapest first
+"""
+import time
+import asyncio
+from box import Box
+from trusted_swap_service import AsyncTrustedSwapService
+from ttl_cache import TtlCache
+from console import console
+from const import LOG_GAP, LOG_ERROR, LOG_INFO
+from typing import Awaitable, List, TypeVar
+from result import Result, Ok, Err
+
+T = TypeVar('T')
+
+class VenueQuote:
+    """
+    Type used in SwapQuoter.quote(), cost of paying `sats` into a service over lightning and withdrawing them onchain
+    """
+    def __init__(
+            self,
+            alias: str,
+            sats: int,
+            balance_sats: int,
+            onchain_fee_sats: int,
+            lightning_fee_sats: int,
+            quoted_at: float,
+    ) -> None:
+        self.alias = alias
+        self.sats = sats
+        self.balance_sats = balance_sats
+        self.onchain_fee_sats = onchain_fee_sats
+        self.lightning_fee_sats = lightning_fee_sats
+        self.quoted_at = quoted_at
+
+    def cost_sats(self) -> int:
+        return self.onchain_fee_sats + self.lightning_fee_sats
+
+    def cost_per_sat(self) -> float:
+        return self.cost_sats() / self.sats if self.sats else float('inf')
+
+    def __str__(self) -> str:
+        return f"VenueQuote(alias={self.alias}, sats={self.sats}, balance_sats={self.balance_sats}, onchain_fee_sats={self.onchain_fee_sats}, lightning_fee_sats={self.lightning_fee_sats}, cost_per_sat={self.cost_per_sat():.6f})"
+
+class SwapQuoter:
+    """
+    Ask every service for its balance and withdrawal fee at once with asyncio.gather,
+        every request goes through the services' shared AsyncHttpTransport, so a quote
+        takes about one round trip of the slowest service and no threads are involved
+        quotes are cached per (position in `services`, sats) for `ttl_secs`,
+        aliases only hold a key prefix and can collide
+        `lightning_fee_ppm` estimates the routing fee of paying the deposit invoice
+        a service that errors (or raises) is logged and left out of the ranking
+    """
+    def __init__(self, services: List[AsyncTrustedSwapService], ttl_secs: float = 30, lightning_fee_ppm: int = 0) -> None:
+        self.services = services
+        self.lightning_fee_ppm = lightning_fee_ppm
+        self.cache: TtlCache[VenueQuote] = TtlCache(max_size=1000, ttl_secs=ttl_secs)
+        self.log = console.log
+        self.logs = Box({
+            "quote": {
+                "ok": LOG_GAP.join(["{}", "quote", "venue: {}, sats: {}, cost_sats: {}, balance_sats: {}"]),
+                "err": LOG_GAP.join(["{}", "quote", "venue: {}, {}"])
+            }
+        })
+
+    @staticmethod
+    async def call_service(call: Awaitable[Result[T, str]]) -> Result[T, str]:
+        try:
+            return await call
+        except Exception as e:
+            return Err(str(e) or type(e).__name__)
+
+    async def quote_service(self, i: int, service: AsyncTrustedSwapService, sats: int) -> VenueQuote | None:
+        cached = self.cache.get((i, sats))
+        if cached is not None:
+            return cached
+        balance, fee = await asyncio.gather(
+            self.call_service(service.get_balance()),
+            self.call_service(service.get_onchain_fee(sats))
+        )
+        alias: str = getattr(service, 'alias', f"service-{i}")
+        if isinstance(balance, Err) or isinstance(fee, Err):
+            error = balance.unwrap_err() if isinstance(balance, Err) else fee.unwrap_err()
+            self.log(LOG_ERROR, self.logs.quote.err.format("quoter", alias, error))
+            return None
+        quote = VenueQuote(
+            alias=alias,
+            sats=sats,
+            balance_sats=balance.unwrap(),
+            onchain_fee_sats=fee.unwrap(),
+            lightning_fee_sats=-(-sats * self.lightning_fee_ppm // 1_000_000),
+            quoted_at=time.time()
+        )
+        self.cache.put((i, sats), quote)
+        self.log(LOG_INFO, self.logs.quote.ok.format("quoter", quote.alias, sats, quote.cost_sats(), quote.balance_sats))
+        return quote
+
+    async def quote(self, sats: int) -> List[VenueQuote]:
+        """quotes of every reachable service, cheapest cost per sat first, larger balance breaks ties"""
+        quotes = await asyncio.gather(*[self.quote_service(i, service, sats) for i, service in enumerate(self.services)])
+        return sorted([quote for quote in quotes if quote is not None], key=lambda quote: (quote.cost_per_sat(), -quote.balance_sats))
+
+    async def best(self, sats: int) -> Result[VenueQuote, str]:
+        quotes = await self.quote(sats)
+        if not quotes:
+            return Err("no service could be quoted")
+        return Ok(quotes[0])
\ No newline at end of file
@@ -4,49 +4,160 @@ trusted_swap_service.py
 A trusted custodial service that supports send/recieve on both onchain and lightning
 usage: as a base class for wallet/exchange API wrappers
 """
+import asyncio
+import threading
+import aiohttp
+import requests # type: ignore
+from requests.adapters import HTTPAdapter # type: ignore
 from box import Box
 from result import Result
 from console import console
 from const import LOG_GAP
+from typing import Any, Dict, Tuple
+
+POOL_HOSTS = 8 # hosts with a connection pool kept at once
+POOL_MAXSIZE = 10 # keep-alive connections per host
+TIMEOUT_SECS = (5.0, 30.0) # connect, read
+ASYNC_POOL_LIMIT = 100 # connections across all hosts for AsyncHttpTransport
+
+SERVICE_LOGS: Dict[str, Dict[str, str]] = { # log formats shared by every sync and async service
+    "api_request": { # A trusted swap service usually has a dedicated method for making requests
+        "ok": LOG_GAP.join(["{}", "api_request", "response_code: {}, url: {}, body: {}, response: {}"]),
+        "err": LOG_GAP.join(["{}", "api_request", "response_code: {}, url: {}, body: {}, response: {}"]),
+    },
+    "get_address": {
+        "ok": LOG_GAP.join(["{}", "get_address", "trusted_deposit_address: {}"]),
+        "err": LOG_GAP.join(["{}", "get_address", "{}"])
+    },
+    "send_onchain": {
+        "ok": LOG_GAP.join(["{}", "send_onchain", "sats: {}, fee: {}"]),
+        "err": LOG_GAP.join(["{}", "send_onchain", "{}"])
+    },
+    "get_balance": {
+        "ok": LOG_GAP.join(["{}", "get_balance", "trusted_balance: {}"]),
+        "err": LOG_GAP.join(["{}", "get_balance", "{}"])
+    },
+    "pay_invoice": {
+        "ok": LOG_GAP.join(["{}", "pay_invoice", "invoice: {} sats: {}, fee: {}"]),
+        "err": LOG_GAP.join(["{}", "pay_invoice", "{}"])
+    },
+    "get_invoice": {
+        "ok": LOG_GAP.join(["{}", "get_invoice", "invoice: {}, sats: {}"]),
+        "err": LOG_GAP.join(["{}", "get_invoice", "{}"])
+    }, 
+    "get_onchain_fee": {
+        "ok": LOG_GAP.join(["{}", "get_onchain_fee", "sats: {}, fee: {}"]),
+        "err": LOG_GAP.join(["{}", "get_onchain_fee", "{}"])
+    },
+}
+
+class HttpTransport:
+    """
+    Keep-alive connection pooling for every API wrapper
+        one requests.Session holds a pool per host, so repeated calls skip the TCP+TLS handshake
+        `host_pool_sizes` overrides POOL_MAXSIZE for hosts hit concurrently, e.g. {"https://api.kraken.com": 32}
+        headers are passed per request, the session itself carries no credentials
+    """
+    shared_transport: 'HttpTransport | None' = None
+    shared_lock = threading.Lock()
+
+    def __init__(
+            self,
+            pool_maxsize: int = POOL_MAXSIZE,
+            timeout: float | Tuple[float, float] = TIMEOUT_SECS,
+            host_pool_sizes: Dict[str, int] | None = None,
+    ) -> None:
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        for base_url, size in (host_pool_sizes or {}).items():
+            self.session.mount(base_url, HTTPAdapter(pool_connections=1, pool_maxsize=size))
+
+    @staticmethod
+    def shared() -> 'HttpTransport':
+        """process-wide transport used by services constructed without one"""
+        with HttpTransport.shared_lock:
+            if HttpTransport.shared_transport is None:
+                HttpTransport.shared_transport = HttpTransport()
+            return HttpTransport.shared_transport
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+class AsyncHttpTransport:
+    """
+    aiohttp counterpart of HttpTransport, one connection pool for every async service
+        an aiohttp ClientSession is bound to the loop it was created on, so one is kept per
+        running event loop, a new asyncio.run() per cycle gets a fresh session
+        sessions of closed loops are dropped on the next use
+    """
+    shared_transport: 'AsyncHttpTransport | None' = None
+    shared_lock = threading.Lock()
+
+    def __init__(
+            self,
+            pool_maxsize: int = POOL_MAXSIZE,
+            timeout: Tuple[float, float] = TIMEOUT_SECS,
+    ) -> None:
+        self.pool_maxsize = pool_maxsize
+        self.timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+        self.sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def shared() -> 'AsyncHttpTransport':
+        """process-wide transport used by async services constructed without one"""
+        with AsyncHttpTransport.shared_lock:
+            if AsyncHttpTransport.shared_transport is None:
+                AsyncHttpTransport.shared_transport = AsyncHttpTransport()
+            return AsyncHttpTransport.shared_transport
+
+    def get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            for closed_loop in [other for other in self.sessions if other.is_closed()]:
+                del self.sessions[closed_loop]
+            session = self.sessions.get(loop)
+            if session is None or session.closed:
+                connector = aiohttp.TCPConnector(limit=ASYNC_POOL_LIMIT, limit_per_host=self.pool_maxsize)
+                session = self.sessions[loop] = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            return session
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> Tuple[int, Any]:
+        """(status, decoded json body), the body is read before the connection goes back to the pool"""
+        async with self.get_session().request(method, url, **kwargs) as res:
+            return res.status, await res.json(content_type=None)
+
+    async def close(self) -> None:
+        """close the session of the running loop, call before the loop ends"""
+        with self.lock:
+            session = self.sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
 
 class TrustedSwapService:
     """
     Extend with exchange/wallet APIs 
         to programatically give trusted nodes your sats
         and to automate widthdraws back to your node
+        all http goes through `transport`, by default one pooled HttpTransport shared by every service
     """
-    def __init__(self) -> None:
+    def __init__(self, transport: HttpTransport | None = None) -> None:
+        self.transport = transport or HttpTransport.shared()
         self.log = console.log
-        self.logs = Box({
-            "api_request": { # A trusted swap service usually has a dedicated method for making requests
-                "ok": LOG_GAP.join(["{}", "api_request", "response_code: {}, url: {}, body: {}, response: {}"]),
-                "err": LOG_GAP.join(["{}", "api_request", "response_code: {}, url: {}, body: {}, response: {}"]),
-            },
-            "get_address": {
-                "ok": LOG_GAP.join(["{}", "get_address", "trusted_deposit_address: {}"]),
-                "err": LOG_GAP.join(["{}", "get_address", "{}"])
-            },
-            "send_onchain": {
-                "ok": LOG_GAP.join(["{}", "send_onchain", "sats: {}, fee: {}"]),
-                "err": LOG_GAP.join(["{}", "send_onchain", "{}"])
-            },
-            "get_balance": {
-                "ok": LOG_GAP.join(["{}", "get_balance", "trusted_balance: {}"]),
-                "err": LOG_GAP.join(["{}", "get_balance", "{}"])
-            },
-            "pay_invoice": {
-                "ok": LOG_GAP.join(["{}", "pay_invoice", "invoice: {} sats: {}, fee: {}"]),
-                "err": LOG_GAP.join(["{}", "pay_invoice", "{}"])
-            },
-            "get_invoice": {
-                "ok": LOG_GAP.join(["{}", "get_invoice", "invoice: {}, sats: {}"]),
-                "err": LOG_GAP.join(["{}", "get_invoice", "{}"])
-            }, 
-            "get_onchain_fee": {
-                "ok": LOG_GAP.join(["{}", "get_onchain_fee", "sats: {}, fee: {}"]),
-                "err": LOG_GAP.join(["{}", "get_onchain_fee", "{}"])
-            },
-        })
+        self.logs = Box(SERVICE_LOGS)
 
     def get_address(self) -> Result[str, str]:
         # returns onchain address string to deposit into the third-party wallet/account balance
@@ -69,6 +180,35 @@ class TrustedSwapService:
         # returns the total fee in satoshis to widthdraw `sats` from balance
         raise NotImplementedError
     
-    def pay_invoice(self, sats: int, invoice: str) -> Result[str, str]:
+    def pay_invoice(self, sats: int, invoice: str) -> Result[int, str]:
         # returns the total fees to pay the invoice
         raise NotImplementedError
+
+class AsyncTrustedSwapService:
+    """
+    Extend with asyncio exchange/wallet APIs
+        same surface as TrustedSwapService but every call is a coroutine,
+        so one cycle can query every service in about one round trip
+    """
+    def __init__(self, transport: AsyncHttpTransport | None = None) -> None:
+        self.transport = transport or AsyncHttpTransport.shared()
+        self.log = console.log
+        self.logs = Box(SERVICE_LOGS)
+
+    async def get_address(self) -> Result[str, str]:
+        raise NotImplementedError
+
+    async def send_onchain(self, sats: int, fee: int) -> Result[None, str]:
+        raise NotImplementedError
+
+    async def get_balance(self) -> Result[int, str]:
+        raise NotImplementedError
+
+    async def get_invoice(self, sats: int) -> Result[str, str]:
+        raise NotImplementedError
+
+    async def get_onchain_fee(self, sats: int) -> Result[int, str]:
+        raise NotImplementedError
+
+    async def pay_invoice(self, sats: int, invoice: str) -> Result[int, str]:
+        raise NotImplementedError
\ No newline at end of file
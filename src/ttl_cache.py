@@ -0,0 +1,61 @@
+"""
+ttl_cache.py
+---
+Bounded, thread-safe key/value cache with per-entry expiry
+usage: memoize lookups whose answers are stable for a while (decoded invoices, node aliases)
+"""
+import time
+import threading
+from collections import OrderedDict
+from typing import Generic, Hashable, Tuple, TypeVar
+
+V = TypeVar('V')
+
+class TtlCache(Generic[V]):
+    """
+    Least-recently-used eviction once `max_size` entries are held,
+        every entry also expires at its own wall-clock time (default: now + `ttl_secs`)
+        `hits` and `misses` count lookups for monitoring
+    """
+    def __init__(self, max_size: int = 10_000, ttl_secs: float = 3600) -> None:
+        self.max_size = max_size
+        self.ttl_secs = ttl_secs
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[Hashable, Tuple[float, V]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> V | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: V, expires_at: float | None = None) -> None:
+        if expires_at is None:
+            expires_at = time.time() + self.ttl_secs
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __str__(self) -> str:
+        return f"TtlCache(size={len(self.entries)}, max_size={self.max_size}, hits={self.hits}, misses={self.misses})"
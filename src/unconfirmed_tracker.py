@@ -0,0 +1,103 @@
+"""
+unconfirmed_tracker.py
+---
+Incremental unconfirmed wallet balance for an LND node
+usage: Lnd.get_unconfirmed_balance() reads from it, Lnd.use_unconfirmed_tracker() makes it event driven
+"""
+import threading
+from grpc_generated import lightning_pb2 as ln
+from subscription import Subscription
+from typing import Dict, List, TYPE_CHECKING
+from result import Result, Ok
+if TYPE_CHECKING:
+    from lnd import Lnd
+    from async_lnd import AsyncLnd
+
+class UnconfirmedBalanceTracker:
+    """
+    Remember the chain tip of the last scan and the set of unconfirmed transactions
+        a refresh only asks GetTransactions for heights at or past the last scanned tip
+        (unconfirmed transactions are always included with end_height=-1)
+        once started, SubscribeTransactions keeps the set current and reads are constant-time
+        events that arrive while a scan is in flight are replayed over its result
+        AsyncLnd awaits its own scans between begin_scan() and apply_scan()
+    """
+    def __init__(self, node: 'Lnd | AsyncLnd') -> None:
+        self.node = node
+        self.lock = threading.Lock()
+        self.scanned_height = 0
+        self.unconfirmed: Dict[str, int] = {} # tx_hash -> amount
+        self.balance = 0
+        self.scans_in_flight = 0
+        self.missed: List[ln.Transaction] = [] # events seen while a scan is in flight
+        self.subscription: Subscription | None = None
+
+    def start(self, timeout: float | None = None) -> bool:
+        self.subscription = Subscription(
+            f"{self.node.alias}-transactions",
+            lambda: self.node.stub.SubscribeTransactions(ln.GetTransactionsRequest()),
+            self.on_event,
+            self.refresh
+        )
+        self.subscription.start()
+        return self.subscription.wait_synced(timeout)
+
+    def stop(self) -> None:
+        if self.subscription is not None:
+            self.subscription.stop()
+
+    def refresh(self) -> None:
+        start_height = self.begin_scan()
+        try:
+            tip_height = self.node.stub.GetInfo(ln.GetInfoRequest()).block_height
+            txs = self.node.stub.GetTransactions(ln.GetTransactionsRequest(
+                start_height=start_height,
+                end_height=-1
+            )).transactions
+        except BaseException:
+            self.end_scan()
+            raise
+        self.apply_scan(txs, tip_height)
+
+    def begin_scan(self) -> int:
+        """start height for the next GetTransactions, events from now on are kept for apply_scan()"""
+        with self.lock:
+            self.scans_in_flight += 1
+            return self.scanned_height
+
+    def end_scan(self) -> None:
+        with self.lock:
+            self.scans_in_flight -= 1
+            if self.scans_in_flight == 0:
+                self.missed = []
+
+    def apply_scan(self, txs: List[ln.Transaction], tip_height: int) -> None:
+        """apply a GetTransactions(start_height=begin_scan(), end_height=-1) response taken at chain tip `tip_height`"""
+        with self.lock:
+            self.unconfirmed = {tx.tx_hash: tx.amount for tx in txs if tx.num_confirmations == 0}
+            self.balance = sum(self.unconfirmed.values())
+            self.scanned_height = max(self.scanned_height, tip_height)
+            # the scan may predate events already applied to the state it replaces
+            for tx in self.missed:
+                self.apply_event(tx)
+            self.scans_in_flight -= 1
+            if self.scans_in_flight == 0:
+                self.missed = []
+
+    def apply_event(self, tx: ln.Transaction) -> None:
+        if tx.num_confirmations == 0:
+            self.balance += tx.amount - self.unconfirmed.get(tx.tx_hash, 0)
+            self.unconfirmed[tx.tx_hash] = tx.amount
+        else:
+            self.balance -= self.unconfirmed.pop(tx.tx_hash, 0)
+
+    def on_event(self, tx: ln.Transaction) -> None:
+        with self.lock:
+            self.apply_event(tx)
+            if self.scans_in_flight:
+                self.missed.append(tx)
+
+    def get_unconfirmed_balance(self) -> Result[int, str]:
+        if self.subscription is None or not self.subscription.is_synced.is_set():
+            self.refresh()
+        return Ok(self.balance)
@@ -4,82 +4,89 @@ wos.py
 An implementation of WoS API as a TrustedSwapService
 usage: add your wos credentials
 """
-import requests # type: ignore
-import time
 import hmac
 import json
 import hashlib
-from trusted_swap_service import TrustedSwapService
+from trusted_swap_service import TrustedSwapService, HttpTransport
+from nonce_source import NonceSource
 from const import COIN_SATS, SAT_MSATS, LOG_INFO
 from box import Box
+from typing import Any, Dict
 from result import Result, Ok, Err
 
 WOS_API_URL = "https://www.livingroomofsatoshi.com/"
 
 class WosCreds:
-    def __init__(self, api_key: str, api_secret: str, onchain_address: str, lightning_address: str, external_onchain_address: str):
+    def __init__(self, api_key: str, api_secret: str, onchain_address: str, lightning_address: str, external_onchain_address: str, nonce_path: str | None = None):
         self.api_key = api_key
         self.api_secret = api_secret
         self.onchain_address = onchain_address
         self.lightning_address = lightning_address
         self.external_onchain_address = external_onchain_address
+        self.nonce_path = nonce_path # optional file keeping nonces increasing across restarts
     
     def __str__(self) -> str:
-        return f"WosCreds(api_key={self.api_key}, api_secret={self.api_secret}, onchain_address={self.onchain_address}, lightning_address={self.lightning_address}, external_onchain_address={self.external_onchain_address})"
+        return f"WosCreds(api_key={self.api_key}, api_secret={self.api_secret}, onchain_address={self.onchain_address}, lightning_address={self.lightning_address}, external_onchain_address={self.external_onchain_address}, nonce_path={self.nonce_path})"
+
+class WosSigner:
+    """
+    Signed-request headers for one credential, the hmac is keyed once
+        and copied per request, so signing is one update of `/ext nonce api_token params`
+        nonces come from the credential's shared NonceSource
+    """
+    def __init__(self, creds: WosCreds) -> None:
+        self.api_token = creds.api_key
+        self.mac = hmac.new(creds.api_secret.encode("utf-8"), digestmod=hashlib.sha256)
+        self.nonce_source = NonceSource.shared("wos", creds.api_key, creds.nonce_path)
+
+    def sign(self, ext: str, nonce: str, params: str) -> str:
+        mac = self.mac.copy()
+        mac.update(f"/{ext}{nonce}{self.api_token}{params}".encode("utf-8"))
+        return mac.hexdigest()
+
+    def headers(self, ext: str, params: str) -> Dict[str, str]:
+        nonce = str(self.nonce_source.next())
+        return {
+            'signature': self.sign(ext, nonce, params),
+            'nonce': nonce,
+            'api-token': self.api_token,
+        }
 
 class Wos(TrustedSwapService):
-    def __init__(self, creds: WosCreds = WosCreds("", "", "", "", "")) -> None:
-        super().__init__() # init logger from parent class
-        self.session = requests.Session()
+    def __init__(self, creds: WosCreds = WosCreds("", "", "", "", ""), transport: HttpTransport | None = None) -> None:
+        super().__init__(transport) # init logger and http transport from parent class
         self.creds = creds
         self.alias = f"WOS-{creds.api_key[:5]}"
-        self.session.headers.update({"api-token": self.creds.api_key})
+        self.signer = WosSigner(creds)
  
     def register(self) -> WosCreds:
         ext = "api/v1/wallet/account"
         data = {"referrer": "walletofsatoshi"}
-        json = requests.post(WOS_API_URL + ext, json=data).json()
+        json = self.transport.post(WOS_API_URL + ext, json=data).json()
         new_creds = WosCreds(api_key=json['apiSecret'], api_secret=json['apiToken'], onchain_address=json['btcDepositAddress'], lightning_address=json['lightningAddress'], external_onchain_address="")
         self.log(LOG_INFO, new_creds)
         return new_creds
 
     def wos_request(self, method: str, ext: str, data_str: str = "", sign: bool = False) -> Box:
         path_url = WOS_API_URL + ext
+        # headers go with the request, the transport's session is shared with other services
+        headers = {"api-token": self.creds.api_key}
         if sign and data_str:
-            self.sign_session(ext, data_str)
-        args = {'url': path_url}
+            headers.update(self.signer.headers(ext, data_str))
+        args: Dict[str, Any] = {'url': path_url, 'headers': headers}
         if data_str and method == "GET":
             args['params'] = json.loads(data_str)
         if data_str and method == "POST":
-            args['data'] = data_str.encode("utf-8") # type: ignore
+            args['data'] = data_str.encode("utf-8")
         if method == "GET":
-            res = self.session.get(**args)
+            res = self.transport.get(**args)
         else: 
-            res = self.session.post(**args)
-        self.unsign_session()
+            res = self.transport.post(**args)
         if res.status_code != 200:
             # TODO general wos errors
             return Err(res.json)
         return Box(res.json())
 
-    def sign_session(self, ext: str, params: str) -> None:
-        nonce = str(int(time.time() * 1000))
-        api_token = self.creds.api_key
-        api_secret = self.creds.api_secret
-        m = f"/{ext}{nonce}{api_token}{params}"
-        hmac_key = api_secret.encode("utf-8")
-        signature = hmac.new(hmac_key, m.encode("utf-8"),
-                             digestmod=hashlib.sha256).hexdigest()
-        self.session.headers.update({
-            'signature': signature,
-            'nonce': nonce,
-            'api-token': api_token,
-        })
-
-    def unsign_session(self) -> None:
-        self.session.headers.pop("signature", None)
-        self.session.headers.pop("nonce", None)
-
     def get_address(self) -> Result[str, str]:
         """TrustedSwapService"""
         addr = str(self.creds.onchain_address)
@@ -97,8 +104,8 @@ class Wos(TrustedSwapService):
     def get_invoice(self, sats: int) -> Result[str, str]:
         """TrustedSwapService"""
         user, url = self.creds.lightning_address.split('@')
-        res = self.session.get(f"https://{url}/.well-known/lnurlp/{user}").json()
-        res2 = self.session.get(f"{res['callback']}?amount={sats * SAT_MSATS}").json()
+        res = self.transport.get(f"https://{url}/.well-known/lnurlp/{user}").json()
+        res2 = self.transport.get(f"{res['callback']}?amount={sats * SAT_MSATS}").json()
         # TODO: check errors
         self.log(LOG_INFO, self.logs.get_invoice.ok.format(self.alias, res2['pr'], sats))
         return Ok(res2['pr'])
@@ -133,7 +140,7 @@ class Wos(TrustedSwapService):
         self.log(LOG_INFO, self.logs.send_onchain.ok.format(self.alias, sats, fee))
         return Ok(None)
     
-    def pay_invoice(self, sats: int, invoice: str) -> Result[str, str]:
+    def pay_invoice(self, sats: int, invoice: str) -> Result[int, str]:
         """TrustedSwapService"""
         data_str = '{{"address":"{}","currency":"LIGHTNING","amount":{:.7e},"sendMaxLightning":false,"description":null}}'.format(invoice, 1000/COIN_SATS)
         res = self.wos_request(
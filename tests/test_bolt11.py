@@ -0,0 +1,44 @@
+from bolt11 import Bolt11
+from result import Ok, Err
+
+# examples from the BOLT11 spec, all signed by this key
+SPEC_PAYEE = "03e7156ae33b0a208d0744199163177e909e80176e55d97a2f221ede0f934dd9ad"
+SPEC_PAYMENT_HASH = "0001020304050607080900010203040506070809000102030405060708090102"
+DONATION = "lnbc1pvjluezsp5zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zygspp5qqqsyqcyq5rqwzqfqqqsyqcyq5rqwzqfqqqsyqcyq5rqwzqfqypqdpl2pkx2ctnv5sxxmmwwd5kgetjypeh2ursdae8g6twvus8g6rfwvs8qun0dfjkxaq9qrsgq357wnc5r2ueh7ck6q93dj32dlqnls087fxdwk8qakdyafkq3yap9us6v52vjjsrvywa6rt52cm9r9zqt8r2t7mlcwspyetp5h2tztugp9lfyql"
+DONATION_NO_SECRET = "lnbc1pvjluezpp5qqqsyqcyq5rqwzqfqqqsyqcyq5rqwzqfqqqsyqcyq5rqwzqfqypqdpl2pkx2ctnv5sxxmmwwd5kgetjypeh2ursdae8g6twvus8g6rfwvs8qun0dfjkxaq8rkx3yf5tcsyz3d73gafnh3cax9rn449d9p5uxz9ezhhypd0elx87sjle52x86fux2ypatgddc6k63n7erqz25le42c4u4ecky03ylcqca784w"
+COFFEE = "lnbc2500u1pvjluezpp5qqqsyqcyq5rqwzqfqqqsyqcyq5rqwzqfqqqsyqcyq5rqwzqfqypqdq5xysxxatsyp3k7enxv4jsxqzpuaztrnwngzn3kdzw5hydlzf03qdgm2hdq27cqv3agm2awhz5se903vruatfhq77w3ls4evs3ch9zw97j25emudupq63nyw24cg27h2rspfj9srp"
+
+def test_donation() -> None:
+    for invoice in [DONATION, DONATION_NO_SECRET]:
+        decoded = Bolt11.decode(invoice).unwrap()
+        assert decoded.dest_pubkey == SPEC_PAYEE
+        assert decoded.payment_hash == SPEC_PAYMENT_HASH
+        assert decoded.amount_sats == 0
+        assert decoded.description == "Please consider supporting this project"
+        assert decoded.timestamp == 1496314658
+        assert decoded.expiry == 3600
+        assert decoded.route_hints == []
+
+def test_amount_and_expiry() -> None:
+    decoded = Bolt11.decode(COFFEE).unwrap()
+    assert decoded.dest_pubkey == SPEC_PAYEE
+    assert decoded.amount_sats == 250_000
+    assert decoded.description == "1 cup coffee"
+    assert decoded.expiry == 60
+
+def test_uppercase() -> None:
+    assert Bolt11.decode(COFFEE.upper()).unwrap().dest_pubkey == SPEC_PAYEE
+
+def test_invalid() -> None:
+    # flip one data character, the checksum no longer matches
+    tampered = COFFEE[:30] + ('q' if COFFEE[30] != 'q' else 'p') + COFFEE[31:]
+    for invoice in [tampered, COFFEE[:-1], "lnbc1", "", COFFEE[:20] + COFFEE[20:].upper()]:
+        assert isinstance(Bolt11.decode(invoice), Err), invoice
+
+def test_decode_many() -> None:
+    invoices = [DONATION, COFFEE, "junk"] * 3
+    # DecodedInvoice has no __eq__, compare the fields
+    expected = [vars(res.unwrap()) if isinstance(res, Ok) else res for res in map(Bolt11.decode, invoices)]
+    for max_workers in [None, 2]:
+        decoded = Bolt11.decode_many(invoices, max_workers=max_workers)
+        assert [vars(res.unwrap()) if isinstance(res, Ok) else res for res in decoded] == expected
\ No newline at end of file
@@ -0,0 +1,85 @@
+import threading
+from grpc_generated import lightning_pb2 as ln
+from lnd import Lnd, LndCreds
+from channel_cache import ChannelCache
+from typing import List
+
+def channel(chan_id: int) -> ln.Channel:
+    return ln.Channel(chan_id=chan_id, remote_pubkey=f"02{chan_id:064x}", channel_point=f"{chan_id:064x}:0", capacity=1_000_000, local_balance=500_000)
+
+def pending_channel(chan_id: int) -> ln.PendingChannelsResponse.PendingOpenChannel:
+    return ln.PendingChannelsResponse.PendingOpenChannel(channel=ln.PendingChannelsResponse.PendingChannel(remote_node_pub=f"02{chan_id:064x}", channel_point=f"{chan_id:064x}:0", capacity=1_000_000))
+
+def opened(chan_id: int) -> ln.ChannelEventUpdate:
+    return ln.ChannelEventUpdate(type=ln.ChannelEventUpdate.OPEN_CHANNEL, open_channel=channel(chan_id))
+
+def closed(chan_id: int) -> ln.ChannelEventUpdate:
+    return ln.ChannelEventUpdate(type=ln.ChannelEventUpdate.CLOSED_CHANNEL, closed_channel=ln.ChannelCloseSummary(chan_id=chan_id, channel_point=f"{chan_id:064x}:0"))
+
+class FakeStub:
+    """
+    LightningStub answering ListChannels and PendingChannels, ListChannels can be held until released
+    """
+    def __init__(self, channels: List[ln.Channel], pending: List[ln.PendingChannelsResponse.PendingOpenChannel]) -> None:
+        self.channels = channels
+        self.pending = pending
+        self.list_calls = 0
+        self.listed = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def ListChannels(self, req: ln.ListChannelsRequest) -> ln.ListChannelsResponse:
+        self.list_calls += 1
+        res = ln.ListChannelsResponse(channels=self.channels)
+        self.listed.set()
+        self.release.wait()
+        return res
+
+    def PendingChannels(self, req: ln.PendingChannelsRequest) -> ln.PendingChannelsResponse:
+        return ln.PendingChannelsResponse(pending_open_channels=self.pending)
+
+def make_cache(stub: FakeStub) -> ChannelCache:
+    node = Lnd(LndCreds())
+    node.stubs = (stub, None) # type: ignore
+    return ChannelCache(node, max_age_secs=None)
+
+def test_first_read_loads() -> None:
+    stub = FakeStub([channel(1), channel(2)], [pending_channel(3)])
+    cache = make_cache(stub)
+    assert sorted(int(chan.channel_id) for chan in cache.get_opened_channels().unwrap()) == [1, 2]
+    assert [chan.channel_point for chan in cache.get_pending_open_channels().unwrap()] == [f"{3:064x}:0"]
+    # served from memory until the stream reconnects
+    cache.get_opened_channels()
+    assert stub.list_calls == 1
+
+def test_events() -> None:
+    stub = FakeStub([channel(1), channel(2)], [pending_channel(3), pending_channel(4)])
+    cache = make_cache(stub)
+    cache.resync()
+    stub.pending = [pending_channel(4)]
+    cache.on_event(opened(3))
+    cache.on_event(closed(1))
+    # a funding that never confirmed closes out of the pending set
+    cache.on_event(closed(4))
+    assert cache.get_by_chan_id(1) is None
+    assert cache.get_by_channel_point(f"{3:064x}:0") is not None
+    assert [chan.channel_point for chan in cache.get_by_peer(f"02{3:064x}")] == [f"{3:064x}:0"]
+    assert cache.get_by_peer(f"02{1:064x}") == []
+    assert cache.get_pending_open_channels().unwrap() == []
+
+def test_events_during_resync_are_replayed() -> None:
+    stub = FakeStub([channel(1), channel(2)], [])
+    cache = make_cache(stub)
+    cache.resync()
+    # the next ListChannels answer predates the events below
+    stub.listed.clear()
+    stub.release.clear()
+    thread = threading.Thread(target=cache.resync)
+    thread.start()
+    stub.listed.wait()
+    cache.on_event(closed(1))
+    cache.on_event(opened(5))
+    stub.release.set()
+    thread.join()
+    assert sorted(int(chan.channel_id) for chan in cache.get_opened_channels().unwrap()) == [2, 5]
+    assert cache.missed == []
\ No newline at end of file
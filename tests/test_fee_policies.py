@@ -0,0 +1,111 @@
+import threading
+import grpc
+from grpc_generated import lightning_pb2 as ln
+from lnd import Lnd, LndCreds
+from bitcoin_lightning_node import ChannelFeePolicy
+from result import Ok, Err
+from typing import Any, Dict, List, Sequence, Tuple
+
+OWN = "02" + "aa" * 32
+PEER = "03" + "bb" * 32
+
+class FakeRpcError(grpc.RpcError):
+    def details(self) -> str:
+        return "unavailable"
+
+class FakeStub:
+    """
+    LightningStub serving FeeReport, GetNodeInfo and GetChanInfo from `policies`, recording every UpdateChannelPolicy
+    """
+    def __init__(self, policies: Dict[str, Tuple[int, int, int]], private: Sequence[str] = (), failing: Sequence[str] = ()) -> None:
+        self.policies = policies
+        self.private = private
+        self.failing = failing
+        self.updates: List[ln.PolicyUpdateRequest] = []
+        self.lock = threading.Lock()
+        self.is_down = False
+
+    def edge(self, chan_id: int, channel_point: str) -> ln.ChannelEdge:
+        base_fee, ppm_fee, cltv_delta = self.policies[channel_point]
+        own = ln.RoutingPolicy(fee_base_msat=base_fee, fee_rate_milli_msat=ppm_fee, time_lock_delta=cltv_delta)
+        # alternate sides so both lookups are exercised
+        if chan_id % 2:
+            return ln.ChannelEdge(channel_id=chan_id, chan_point=channel_point, node1_pub=OWN, node2_pub=PEER, node1_policy=own)
+        return ln.ChannelEdge(channel_id=chan_id, chan_point=channel_point, node1_pub=PEER, node2_pub=OWN, node2_policy=own)
+
+    def FeeReport(self, req: ln.FeeReportRequest) -> ln.FeeReportResponse:
+        if self.is_down:
+            raise FakeRpcError()
+        return ln.FeeReportResponse(channel_fees=[
+            ln.ChannelFeeReport(chan_id=i, channel_point=channel_point, base_fee_msat=base_fee, fee_per_mil=ppm_fee)
+            for i, (channel_point, (base_fee, ppm_fee, _)) in enumerate(self.policies.items())
+        ])
+
+    def GetNodeInfo(self, req: ln.NodeInfoRequest) -> ln.NodeInfo:
+        assert req.pub_key == OWN
+        return ln.NodeInfo(channels=[self.edge(i, channel_point) for i, channel_point in enumerate(self.policies) if channel_point not in self.private])
+
+    def GetChanInfo(self, req: ln.ChanInfoRequest) -> ln.ChannelEdge:
+        return self.edge(req.chan_id, list(self.policies)[req.chan_id])
+
+    def UpdateChannelPolicy(self, req: ln.PolicyUpdateRequest) -> ln.PolicyUpdateResponse:
+        with self.lock:
+            self.updates.append(req)
+        channel_point = f"{req.chan_point.funding_txid_str}:{req.chan_point.output_index}"
+        if channel_point in self.failing:
+            txid, output_index = channel_point.split(':')
+            return ln.PolicyUpdateResponse(failed_updates=[ln.FailedUpdate(outpoint=ln.OutPoint(txid_str=txid, output_index=int(output_index)), update_error="channel not found")])
+        return ln.PolicyUpdateResponse()
+
+def make_node(**stub_args: Any) -> Tuple[Lnd, FakeStub]:
+    policies = {f"{i:064x}:{i % 2}": (1000, 100 * (i + 1), 40) for i in range(4)}
+    stub = FakeStub(policies, **stub_args)
+    node = Lnd(LndCreds())
+    node.stubs = (stub, None) # type: ignore
+    node.cached_pubkey = OWN
+    node.log = lambda *args: None # type: ignore
+    return node, stub
+
+def test_get_fee_policies() -> None:
+    node, stub = make_node(private=[f"{1:064x}:1"])
+    assert node.get_fee_policies() == Ok(stub.policies)
+    stub.is_down = True
+    assert node.get_fee_policies() == Err("unavailable")
+
+def test_unchanged() -> None:
+    node, stub = make_node()
+    policies = [ChannelFeePolicy(channel_point, base_fee, ppm_fee) for channel_point, (base_fee, ppm_fee, _) in stub.policies.items()]
+    assert node.update_fee_policies(policies) == Ok(0)
+    assert stub.updates == []
+
+def test_changed_channels_only() -> None:
+    node, stub = make_node()
+    channel_points = list(stub.policies)
+    res = node.update_fee_policies([
+        ChannelFeePolicy(channel_points[0], 1000, 100), # unchanged
+        ChannelFeePolicy(channel_points[1], 1000, 555), # keeps its cltv_delta
+        ChannelFeePolicy(channel_points[2], 0, 300, 80),
+    ])
+    assert res == Ok(2)
+    sent = {f"{req.chan_point.funding_txid_str}:{req.chan_point.output_index}": (req.base_fee_msat, req.fee_rate_ppm, req.time_lock_delta) for req in stub.updates}
+    assert sent == {channel_points[1]: (1000, 555, 40), channel_points[2]: (0, 300, 80)}
+
+def test_global_update() -> None:
+    node, stub = make_node()
+    assert node.update_fee_policies([ChannelFeePolicy(channel_point, 0, 250) for channel_point in stub.policies]) == Ok(4)
+    assert len(stub.updates) == 1
+    assert getattr(stub.updates[0], 'global') and stub.updates[0].fee_rate_ppm == 250
+
+def test_unknown_channel() -> None:
+    node, stub = make_node()
+    res = node.update_fee_policies([ChannelFeePolicy(f"{99:064x}:0", 0, 1)])
+    assert isinstance(res, Err) and "unknown channels" in res.unwrap_err()
+    assert stub.updates == []
+
+def test_partial_failure() -> None:
+    failing = f"{3:064x}:1"
+    node, stub = make_node(failing=[failing])
+    channel_points = list(stub.policies)
+    res = node.update_fee_policies([ChannelFeePolicy(channel_points[0], 0, 1), ChannelFeePolicy(failing, 0, 1)])
+    assert isinstance(res, Err)
+    assert f"failed updates: ['{failing}: channel not found'], applied: ['{channel_points[0]}']" == res.unwrap_err()
\ No newline at end of file
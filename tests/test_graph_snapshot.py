@@ -0,0 +1,78 @@
+import struct
+import random
+import pytest
+from pathlib import Path
+from grpc_generated import lightning_pb2 as ln
+from graph import ChannelGraph
+from graph_snapshot import GraphSnapshot, HEADER, SECTION_TABLE
+from typing import Dict, List
+
+def make_graph(num_nodes: int = 50, num_edges: int = 200) -> ChannelGraph:
+    rnd = random.Random(1)
+    pubkeys = ['02%064x' % rnd.getrandbits(256) for _ in range(num_nodes)]
+    nodes = [ln.LightningNode(pub_key=pubkey, alias=f"node-{i}", addresses=[ln.NodeAddress(network='tcp', addr=f"10.0.0.{i}:9735")]) for i, pubkey in enumerate(pubkeys)]
+    edges = []
+    for chan_id in range(1, num_edges + 1):
+        a, b = sorted(rnd.sample(pubkeys, 2))
+        policies = [ln.RoutingPolicy(time_lock_delta=40, min_htlc=1000, fee_base_msat=1000, fee_rate_milli_msat=rnd.randint(0, 2000), max_htlc_msat=10**9, disabled=rnd.random() < 0.1) for _ in range(2)]
+        edges.append(ln.ChannelEdge(channel_id=chan_id, node1_pub=a, node2_pub=b, capacity=rnd.randint(20_000, 10**8), node1_policy=policies[0], node2_policy=policies[1] if chan_id % 5 else None))
+    graph = ChannelGraph()
+    graph.load(ln.ChannelGraph(nodes=nodes, edges=edges))
+    return graph
+
+def channels(graph: ChannelGraph | GraphSnapshot, pubkey: str) -> List[str]:
+    return sorted(str(chan) for chan in graph.get_channels(pubkey))
+
+def test_round_trip(tmp_path: Path) -> None:
+    graph = make_graph()
+    path = str(tmp_path / "graph.snap")
+    graph.save(path)
+    snapshot = GraphSnapshot(path)
+    try:
+        assert snapshot.num_nodes == len(graph.pubkeys)
+        assert snapshot.num_edges == len(graph.chan_ids)
+        assert sorted(snapshot.pubkeys) == sorted(graph.pubkeys)
+        for pubkey in graph.pubkeys:
+            assert channels(snapshot, pubkey) == channels(graph, pubkey)
+            assert snapshot.get_alias(pubkey) == graph.get_alias(pubkey)
+            assert snapshot.get_address(pubkey) == graph.get_address(pubkey)
+        assert snapshot.find_node('02' + '00' * 32) is None
+        assert snapshot.find_node('not hex') is None
+        copy = snapshot.to_channel_graph()
+    finally:
+        snapshot.close()
+    restored = ChannelGraph()
+    assert restored.restore(path)
+    for pubkey in graph.pubkeys:
+        assert channels(copy, pubkey) == channels(graph, pubkey)
+        assert channels(restored, pubkey) == channels(graph, pubkey)
+
+def corruptions(data: bytes) -> Dict[str, bytes]:
+    table = list(SECTION_TABLE.unpack_from(data, HEADER.size))
+    past_end = list(table)
+    past_end[1] = len(data) # pubkeys section runs past the end of the file
+    misaligned = list(table)
+    misaligned[2 * 7] += 1 # chan_ids no longer on an 8 byte boundary
+    return {
+        "empty": b'',
+        "junk": b'junk' * 100,
+        "truncated": data[:len(data) // 2],
+        "magic": b'NOTGRAPH' + data[8:],
+        "version": data[:8] + struct.pack('<I', 99) + data[12:],
+        "past_end": data[:HEADER.size] + SECTION_TABLE.pack(*past_end) + data[HEADER.size + SECTION_TABLE.size:],
+        "misaligned": data[:HEADER.size] + SECTION_TABLE.pack(*misaligned) + data[HEADER.size + SECTION_TABLE.size:],
+    }
+
+def test_corrupt(tmp_path: Path) -> None:
+    path = str(tmp_path / "graph.snap")
+    make_graph().save(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    for name, corrupt in corruptions(data).items():
+        bad_path = str(tmp_path / f"{name}.snap")
+        with open(bad_path, 'wb') as f:
+            f.write(corrupt)
+        with pytest.raises(ValueError):
+            GraphSnapshot(bad_path)
+        assert not ChannelGraph().restore(bad_path), name
+    assert not ChannelGraph().restore(str(tmp_path / "missing.snap"))
\ No newline at end of file
@@ -0,0 +1,113 @@
+import time
+import asyncio
+import threading
+from pathlib import Path
+import pytest
+from nonce_source import NonceSource, RESERVE_MS
+from typing import List
+
+def test_threads() -> None:
+    source = NonceSource()
+    taken: List[List[int]] = [[] for _ in range(8)]
+    def take(nonces: List[int]) -> None:
+        for _ in range(2000):
+            nonces.append(source.next())
+    threads = [threading.Thread(target=take, args=(nonces,)) for nonces in taken]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for nonces in taken:
+        assert all(a < b for a, b in zip(nonces, nonces[1:]))
+    assert len(set(sum(taken, []))) == 8 * 2000
+
+def test_restart(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = str(tmp_path / "nonce")
+    source = NonceSource(path)
+    first = source.next()
+    last = max(source.next() for _ in range(100))
+    # a high-water mark reserved ahead is persisted, not every nonce
+    assert int(Path(path).read_text()) == first + RESERVE_MS > last
+    # clock stepped back an hour, then a restart
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now - 3600)
+    assert source.next() > last
+    restarted = NonceSource(path)
+    assert restarted.next() > last
+    # nonces past the reserve move the mark again before they are handed out
+    restarted.last = restarted.reserved
+    beyond = restarted.next()
+    assert NonceSource(path).next() > beyond
+
+def test_unreadable_file(tmp_path: Path) -> None:
+    path = tmp_path / "nonce"
+    path.write_text("junk")
+    before = int(time.time() * 1000)
+    assert NonceSource(str(path)).next() >= before
+
+def test_shared() -> None:
+    source = NonceSource.shared("test", "shared-key")
+    assert NonceSource.shared("test", "shared-key") is source
+    assert NonceSource.shared("test", "other-key") is not source
+    assert NonceSource.shared("other", "shared-key") is not source
+
+def test_dispatch() -> None:
+    source = NonceSource()
+    with source.dispatch():
+        assert source.dispatch_lock.locked()
+    with source.dispatch(is_serialized=False):
+        assert not source.dispatch_lock.locked()
+    assert not source.dispatch_lock.locked()
+
+def test_async_dispatch_shares_the_lock() -> None:
+    source = NonceSource()
+    async def main() -> List[str]:
+        events: List[str] = []
+        held = threading.Event()
+        release = threading.Event()
+        def hold() -> None:
+            with source.dispatch():
+                held.set()
+                release.wait()
+                events.append("thread released")
+        thread = threading.Thread(target=hold)
+        thread.start()
+        held.wait()
+        async def send() -> None:
+            async with source.async_dispatch():
+                events.append("task sent")
+        task = asyncio.create_task(send())
+        # the loop keeps running while the task waits for the thread's lock
+        await asyncio.sleep(0.05)
+        events.append("loop ran")
+        release.set()
+        await task
+        thread.join()
+        return events
+    assert asyncio.run(main()) == ["loop ran", "thread released", "task sent"]
+    assert not source.dispatch_lock.locked()
+
+def test_async_dispatch_cancelled() -> None:
+    source = NonceSource()
+    async def main() -> None:
+        source.dispatch_lock.acquire()
+        async def send() -> None:
+            async with source.async_dispatch():
+                pass
+        task = asyncio.create_task(send())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        source.dispatch_lock.release()
+        # the executor takes the lock after the cancel and hands it back
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if not source.dispatch_lock.locked():
+                break
+        async with source.async_dispatch(): # would hang if the lock leaked
+            pass
+        async with source.async_dispatch(is_serialized=False):
+            assert not source.dispatch_lock.locked()
+    asyncio.run(asyncio.wait_for(main(), timeout=5))
+    assert not source.dispatch_lock.locked()
\ No newline at end of file
@@ -0,0 +1,64 @@
+import threading
+from grpc_generated import lightning_pb2 as ln
+from lnd import Lnd, LndCreds
+from peer_index import PeerIndex
+from result import Result, Ok, Err
+from typing import Any, List, Sequence
+
+class FakeStub:
+    """
+    LightningStub answering ListPeers from `peers`
+    """
+    def __init__(self, peers: List[str]) -> None:
+        self.peers = peers
+        self.list_calls = 0
+
+    def ListPeers(self, req: ln.ListPeersRequest) -> ln.ListPeersResponse:
+        self.list_calls += 1
+        return ln.ListPeersResponse(peers=[ln.Peer(pub_key=pubkey) for pubkey in self.peers])
+
+class FakeNode(Lnd):
+    """
+    Lnd whose add_peer only records the call, peers listed in `refusing` fail and `known` ones are already connected
+    """
+    def __init__(self, stub: FakeStub, refusing: Sequence[str] = (), known: Sequence[str] = ()) -> None:
+        super().__init__(LndCreds())
+        self.stubs = (stub, None) # type: ignore
+        self.refusing = refusing
+        self.known = known
+        self.added: List[str] = []
+        self.added_lock = threading.Lock()
+
+    def add_peer(self, pubkey: str, address: str) -> Result[Any, str]:
+        with self.added_lock:
+            self.added.append(pubkey)
+        if pubkey in self.refusing:
+            return Err("connection refused")
+        if pubkey in self.known:
+            return Err(f"already connected to peer: {pubkey}")
+        return Ok(ln.ConnectPeerResponse())
+
+def test_unsynced_lookups_list_peers() -> None:
+    stub = FakeStub(["a", "b"])
+    index = PeerIndex(FakeNode(stub))
+    assert index.is_peer_with("a")
+    assert not index.is_peer_with("c")
+    assert stub.list_calls == 2
+
+def test_events() -> None:
+    index = PeerIndex(FakeNode(FakeStub(["a"])))
+    index.resync()
+    index.on_event(ln.PeerEvent(pub_key="b", type=ln.PeerEvent.PEER_ONLINE))
+    index.on_event(ln.PeerEvent(pub_key="a", type=ln.PeerEvent.PEER_OFFLINE))
+    assert index.peers == {"b"}
+
+def test_ensure_peers() -> None:
+    stub = FakeStub(["a"])
+    node = FakeNode(stub, refusing=["c"], known=["d"])
+    index = PeerIndex(node)
+    results = index.ensure_peers({"a": "host-a", "b": "host-b", "c": "host-c", "d": "host-d"})
+    assert results == {"a": Ok(None), "b": Ok(None), "c": Err("connection refused"), "d": Ok(None)}
+    # one ListPeers for the whole batch, connected peers are skipped
+    assert stub.list_calls == 1
+    assert sorted(node.added) == ["b", "c", "d"]
+    assert index.peers == {"a", "b", "d"}
\ No newline at end of file
@@ -0,0 +1,60 @@
+import hmac
+import base64
+import hashlib
+import random
+import urllib.parse
+from kraken import KrakenCreds, KrakenSigner
+from nicehash import NicehashCreds, NicehashSigner
+from wos import WosCreds, WosSigner
+from typing import Any, Dict
+
+# signing as it was done per call before the signers, see bench/bench_signers.py
+def kraken_signature(urlpath: str, data: Dict[str, Any], secret: str) -> str:
+    postdata = urllib.parse.urlencode(data)
+    encoded = (str(data['nonce']) + postdata).encode()
+    message = urlpath.encode() + hashlib.sha256(encoded).digest()
+    mac = hmac.new(base64.b64decode(secret), message, hashlib.sha512)
+    return base64.b64encode(mac.digest()).decode()
+
+def nicehash_signature(creds: NicehashCreds, xtime: str, xnonce: str, method: str, path: str, query: str, body_json: str | None) -> str:
+    message = '\x00'.join([creds.api_key, xtime, xnonce, '', creds.org_id, '', method, path, query])
+    if body_json:
+        message += '\x00' + body_json
+    return creds.api_key + ":" + hmac.new(creds.api_secret.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+def wos_signature(creds: WosCreds, ext: str, nonce: str, params: str) -> str:
+    m = f"/{ext}{nonce}{creds.api_key}{params}"
+    return hmac.new(creds.api_secret.encode("utf-8"), m.encode("utf-8"), digestmod=hashlib.sha256).hexdigest()
+
+def test_kraken_documented_example() -> None:
+    # https://docs.kraken.com/rest/#section/Authentication/Headers-and-Signature
+    creds = KrakenCreds("key", "kQH5HW/8p1uGOVjbgWA7FunAmGO8lsSUXNsu3eow76sz84Q18fWxnyRzBHCd3pd5nE9qa99HAZtuZuj6F1huXg==", "funding")
+    postdata = "nonce=1616492376594&ordertype=limit&pair=XBTUSD&price=37500&type=buy&volume=1.25"
+    assert KrakenSigner(creds).sign("/0/private/AddOrder", "1616492376594", postdata) == "4/dpxb3iT4tp/ZCVEwSnEsLxx0bqyhLpdfOpc6fn7OR8+UClSV5n9E6aSS8MPtnRfp32bAb0nmbRn6H8ndwLUQ=="
+
+def test_kraken() -> None:
+    rnd = random.Random(1)
+    creds = KrakenCreds("kraken-key", base64.b64encode(rnd.randbytes(64)).decode(), "funding")
+    signer = KrakenSigner(creds)
+    # alternate paths, every cached per-path hmac must stay unmodified
+    for i in range(20):
+        uri_path = ["/0/private/Balance", "/0/private/WithdrawInfo", "/0/private/Withdraw"][i % 3]
+        data = {"nonce": str(1_700_000_000_000 + i), "asset": "XBT", "amount": rnd.random()}
+        assert signer.sign(uri_path, data["nonce"], urllib.parse.urlencode(data)) == kraken_signature(uri_path, data, creds.api_secret)
+
+def test_nicehash() -> None:
+    creds = NicehashCreds("d3f1a3c0-nicehash-key", "8c2b0e4e-nicehash-secret", "org-1234-5678", "funding")
+    signer = NicehashSigner(creds)
+    for body_json in ['{"currency": "BTC", "amount": 0.01}', '', None]:
+        args = ("1700000000000", "0b0c4e9e-1b2a-4c1e-9f64-7d2f0e8a3b11", "POST", "/main/api/v2/accounting/withdrawal", "", body_json)
+        assert signer.auth_prefix + signer.sign(*args) == nicehash_signature(creds, *args)
+    headers = signer.headers("GET", "/main/api/v2/accounting/account2/BTC", "extendedResponse=true", None)
+    assert headers['X-Auth'] == nicehash_signature(creds, headers['X-Time'], headers['X-Nonce'], "GET", "/main/api/v2/accounting/account2/BTC", "extendedResponse=true", None)
+
+def test_wos() -> None:
+    creds = WosCreds("wos-api-token", "wos-api-secret", "", "", "")
+    signer = WosSigner(creds)
+    for params in ['{"address":"bc1q","currency":"BTC","amount":1.0000000e-02}', '']:
+        assert signer.sign("api/v1/wallet/payment", "1700000000000", params) == wos_signature(creds, "api/v1/wallet/payment", "1700000000000", params)
+    headers = signer.headers("api/v1/wallet/payment", "{}")
+    assert headers['signature'] == wos_signature(creds, "api/v1/wallet/payment", headers['nonce'], "{}")
\ No newline at end of file
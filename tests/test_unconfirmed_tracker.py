@@ -0,0 +1,75 @@
+import threading
+from grpc_generated import lightning_pb2 as ln
+from lnd import Lnd, LndCreds
+from unconfirmed_tracker import UnconfirmedBalanceTracker
+from result import Ok
+from typing import List
+
+def tx(tx_hash: str, amount: int, num_confirmations: int = 0, block_height: int = 0) -> ln.Transaction:
+    return ln.Transaction(tx_hash=tx_hash, amount=amount, num_confirmations=num_confirmations, block_height=block_height)
+
+class FakeStub:
+    """
+    LightningStub answering GetInfo and GetTransactions from `txs`, GetTransactions can be held until released
+    """
+    def __init__(self, txs: List[ln.Transaction], block_height: int) -> None:
+        self.txs = txs
+        self.block_height = block_height
+        self.start_heights: List[int] = []
+        self.listed = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def GetInfo(self, req: ln.GetInfoRequest) -> ln.GetInfoResponse:
+        return ln.GetInfoResponse(block_height=self.block_height)
+
+    def GetTransactions(self, req: ln.GetTransactionsRequest) -> ln.TransactionDetails:
+        assert req.end_height == -1
+        self.start_heights.append(req.start_height)
+        # unconfirmed transactions are always returned, confirmed ones from start_height on
+        res = ln.TransactionDetails(transactions=[t for t in self.txs if t.num_confirmations == 0 or t.block_height >= req.start_height])
+        self.listed.set()
+        self.release.wait()
+        return res
+
+def make_tracker(stub: FakeStub) -> UnconfirmedBalanceTracker:
+    node = Lnd(LndCreds())
+    node.stubs = (stub, None) # type: ignore
+    return UnconfirmedBalanceTracker(node)
+
+def test_scans_from_last_tip() -> None:
+    stub = FakeStub([tx("a", 1000, 3, 100), tx("b", 2000), tx("c", -500)], block_height=102)
+    tracker = make_tracker(stub)
+    assert tracker.get_unconfirmed_balance() == Ok(1500)
+    stub.txs = [tx("a", 1000, 4, 100), tx("b", 2000, 1, 103)]
+    stub.block_height = 103
+    assert tracker.get_unconfirmed_balance() == Ok(0)
+    assert stub.start_heights == [0, 102]
+
+def test_events() -> None:
+    tracker = make_tracker(FakeStub([tx("a", 1000)], block_height=100))
+    tracker.refresh()
+    tracker.on_event(tx("b", 250))
+    tracker.on_event(tx("a", 1000, 1, 101))
+    # an unconfirmed transaction seen twice counts once
+    tracker.on_event(tx("b", 250))
+    assert tracker.balance == 250
+    assert tracker.unconfirmed == {"b": 250}
+
+def test_events_during_scan_are_replayed() -> None:
+    stub = FakeStub([tx("a", 1000)], block_height=100)
+    tracker = make_tracker(stub)
+    tracker.refresh()
+    # the next scan answer predates the events below
+    stub.listed.clear()
+    stub.release.clear()
+    thread = threading.Thread(target=tracker.refresh)
+    thread.start()
+    stub.listed.wait()
+    tracker.on_event(tx("a", 1000, 1, 101))
+    tracker.on_event(tx("b", 700))
+    stub.release.set()
+    thread.join()
+    assert tracker.unconfirmed == {"b": 700}
+    assert tracker.balance == 700
+    assert tracker.missed == []
\ No newline at end of file